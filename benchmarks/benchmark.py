@@ -0,0 +1,296 @@
+import argparse, gc, json, os, platform, random, sys, time, tracemalloc
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, '..', 'src'))
+
+from component_ratio_method import Component_Ratio_Method, np
+from tree_list import Threaded_Tree_List_Pipeline, Tree_List_Pipeline
+
+FIXTURE_DB = os.path.join(BENCHMARK_DIR, 'fixtures', 'coefficients.db')
+
+# region families -> rgn_config_ids in the fixture database
+REGION_FAMILIES = {
+    'S24': ['S24'],
+    'S33': ['S33'],
+    'S23L*': ['S23LCS', 'S23LLS', 'S23LPS'],
+    'S22L*': ['S22LAZN', 'S22LID'],
+    'S26L*': ['S26LCA', 'S26LWOR', 'S26LEWA'],
+}
+
+
+def _usableSpecies(crm, region_id):
+
+    # species in the region whose equation returns a volume for ordinary tree inputs
+    crm.preloadCoefficients([region_id])
+    usable = []
+    for species_cd in sorted(crm._grossVolTables[region_id]):
+        try:
+            species = crm._getSpeciesData(species_cd)
+            volume = crm.getVOLCFGRS(species, region_id, dbh=12.0, height=70.0, basal_area=120.0,
+                                     site_index=65.0, stem_count=1, drc=8.0, bole_hgt=30.0)
+            crm._calcTotalAGBioMassJenkins(species, 12.0)
+        except Exception:
+            continue
+        if isinstance(volume, float):
+            usable.append(species_cd)
+    return usable
+
+
+def buildTrees(crm, region_ids, count, seed):
+    rng = random.Random(seed)
+    choices = [(region_id, species_cd) for region_id in region_ids for species_cd in _usableSpecies(crm, region_id)]
+    if not choices:
+        raise Exception('No usable species for regions {0}.'.format(region_ids))
+
+    trees = []
+    for _ in range(count):
+        region_id, species_cd = rng.choice(choices)
+        trees.append({
+            'species_cd': species_cd,
+            'region': region_id,
+            'dbh': rng.uniform(5.1, 30.0),
+            'height': rng.uniform(30.0, 110.0),
+            'site_index': rng.uniform(40.0, 90.0),
+            'basal_area': rng.uniform(60.0, 200.0),
+            'drc': rng.uniform(4.0, 20.0),
+            'bole_hgt': rng.uniform(10.0, 50.0),
+            'stem_count': 1,
+        })
+    return trees
+
+
+def _scalarVolume(crm, trees, chunk_size):
+    for tree in trees:
+        species = crm._getSpeciesData(tree['species_cd'])
+        crm.getVOLCFGRS(species, tree['region'], dbh=tree['dbh'], height=tree['height'],
+                        basal_area=tree['basal_area'], site_index=tree['site_index'],
+                        stem_count=tree['stem_count'], drc=tree['drc'], bole_hgt=tree['bole_hgt'])
+        yield 1
+
+
+def _scalarBiomass(crm, trees, chunk_size):
+    for tree in trees:
+        species = crm._getSpeciesData(tree['species_cd'])
+        dbh = tree['dbh']
+        crm._calcTotalAGBioMassJenkins(species, dbh)
+        crm._calcBoleBiomassJenkinsLbs(species, dbh)
+        crm._calcFoliageBiomassJenkinsLbs(species, dbh)
+        crm._calcRootBiomassJenkinsLbs(species, dbh)
+        yield 1
+
+
+def _scalarComponents(crm, trees, chunk_size):
+    for tree in trees:
+        crm._calcJenkinsComponentsLbs(crm._getSpeciesData(tree['species_cd']), tree['dbh'])
+        yield 1
+
+
+def _scalarComponentsUnvalidated(crm, trees, chunk_size):
+
+    # validates each chunk once and runs the calculations without their per call checks
+    crm.validate = False
+    try:
+        for start in range(0, len(trees), chunk_size):
+            chunk = trees[start:start + chunk_size]
+            failed = set(failure['row'] for failure in crm.validateTrees(chunk))
+            for row, tree in enumerate(chunk):
+                if row not in failed:
+                    crm._calcJenkinsComponentsLbs(crm._getSpeciesData(tree['species_cd']), tree['dbh'])
+            yield len(chunk)
+    finally:
+        crm.validate = True
+
+
+def _batchBiomass(crm, trees, chunk_size):
+    for start in range(0, len(trees), chunk_size):
+        chunk = trees[start:start + chunk_size]
+        crm.getJenkinsBiomassBatch([tree['species_cd'] for tree in chunk], [tree['dbh'] for tree in chunk])
+        yield len(chunk)
+
+
+def _batchVolume(crm, trees, chunk_size):
+    for start in range(0, len(trees), chunk_size):
+        chunk = trees[start:start + chunk_size]
+        crm.getVOLCFGRSBatch([tree['species_cd'] for tree in chunk], [tree['region'] for tree in chunk],
+                             dbh=[tree['dbh'] for tree in chunk],
+                             height=[tree['height'] for tree in chunk],
+                             basal_area=[tree['basal_area'] for tree in chunk],
+                             site_index=[tree['site_index'] for tree in chunk],
+                             stem_count=[tree['stem_count'] for tree in chunk],
+                             drc=[tree['drc'] for tree in chunk],
+                             bole_hgt=[tree['bole_hgt'] for tree in chunk])
+        yield len(chunk)
+
+
+def _batchComponentRatio(crm, trees, chunk_size):
+    for start in range(0, len(trees), chunk_size):
+        chunk = trees[start:start + chunk_size]
+        crm.getComponentRatioBatch([tree['species_cd'] for tree in chunk], [tree['region'] for tree in chunk],
+                                   dbh=[tree['dbh'] for tree in chunk],
+                                   height=[tree['height'] for tree in chunk],
+                                   basal_area=[tree['basal_area'] for tree in chunk],
+                                   site_index=[tree['site_index'] for tree in chunk],
+                                   stem_count=[tree['stem_count'] for tree in chunk],
+                                   drc=[tree['drc'] for tree in chunk],
+                                   bole_hgt=[tree['bole_hgt'] for tree in chunk])
+        yield len(chunk)
+
+
+def _pipeline(crm, trees, chunk_size):
+    pipeline = Tree_List_Pipeline(crm, chunk_size)
+    for start in range(0, len(trees), chunk_size):
+        chunk = trees[start:start + chunk_size]
+        pipeline.processChunk(chunk)
+        yield len(chunk)
+
+
+def _threadedPipeline(crm, trees, chunk_size):
+    pipeline = Threaded_Tree_List_Pipeline(crm, chunk_size=chunk_size)
+    try:
+        for start in range(0, len(trees), chunk_size):
+            chunk = trees[start:start + chunk_size]
+            pipeline.processChunk(chunk)
+            yield len(chunk)
+    finally:
+        pipeline.close()
+
+
+# name -> (generator yielding the number of trees done per timed step, needs numpy)
+SCENARIOS = [
+    ('scalar_volume', _scalarVolume, False),
+    ('scalar_biomass', _scalarBiomass, False),
+    ('scalar_components', _scalarComponents, False),
+    ('scalar_components_unvalidated', _scalarComponentsUnvalidated, False),
+    ('batch_volume', _batchVolume, True),
+    ('batch_biomass', _batchBiomass, True),
+    ('batch_component_ratio', _batchComponentRatio, True),
+    ('pipeline', _pipeline, False),
+    ('threaded_pipeline', _threadedPipeline, False),
+]
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def runScenario(crm, scenario, trees, chunk_size):
+    latencies = []
+    treeCount = 0
+
+    gc.collect()
+    steps = scenario(crm, trees, chunk_size)
+    start = time.perf_counter()
+    while True:
+        stepStart = time.perf_counter_ns()
+        try:
+            done = next(steps)
+        except StopIteration:
+            break
+        latencies.append((time.perf_counter_ns() - stepStart) / 1000.0)
+        treeCount += done
+    elapsed = time.perf_counter() - start
+
+    # peak memory is measured on a second pass so tracing does not skew the timings
+    gc.collect()
+    tracemalloc.start()
+    for _ in scenario(crm, trees, chunk_size):
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        'trees': treeCount,
+        'seconds': elapsed,
+        'trees_per_second': treeCount / elapsed if elapsed > 0 else None,
+        'calls': len(latencies),
+        'latency_us': {
+            'p50': _percentile(latencies, 0.50),
+            'p90': _percentile(latencies, 0.90),
+            'p99': _percentile(latencies, 0.99),
+            'max': latencies[-1] if latencies else None,
+        },
+        'peak_memory_bytes': peak,
+    }
+
+
+def measureStartup(db, trees):
+
+    # a new instance answering its first tree, the connection and coefficients load as that tree needs them
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    crm = Component_Ratio_Method(db)
+    constructed = time.perf_counter()
+
+    tree = trees[0]
+    species = crm._getSpeciesData(tree['species_cd'])
+    crm._calcJenkinsComponentsLbs(species, tree['dbh'])
+    crm.getVOLCFGRS(species, tree['region'], dbh=tree['dbh'], height=tree['height'],
+                    basal_area=tree['basal_area'], site_index=tree['site_index'],
+                    stem_count=tree['stem_count'], drc=tree['drc'], bole_hgt=tree['bole_hgt'])
+    firstTree = time.perf_counter()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    crm.close()
+
+    return {
+        'construct_seconds': constructed - start,
+        'first_tree_seconds': firstTree - start,
+        'peak_memory_bytes': peak,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks gross volume and Jenkins biomass throughput.')
+    parser.add_argument('--trees', type=int, default=20000, help='synthetic trees per region family')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='trees per batch call')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--db', default=FIXTURE_DB, help='coefficients database to benchmark against')
+    parser.add_argument('--families', nargs='*', default=list(REGION_FAMILIES), choices=list(REGION_FAMILIES))
+    parser.add_argument('--scenarios', nargs='*', default=[name for name, _, _ in SCENARIOS],
+                        choices=[name for name, _, _ in SCENARIOS])
+    parser.add_argument('--output', default='benchmark_results.json', help='JSON file to write, - for stdout')
+    args = parser.parse_args(argv)
+
+    crm = Component_Ratio_Method(args.db)
+
+    report = {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'numpy': None if np == None else np.__version__,
+        'database': os.path.abspath(args.db),
+        'seed': args.seed,
+        'trees_per_family': args.trees,
+        'chunk_size': args.chunk_size,
+        'families': {},
+    }
+
+    for family in args.families:
+        trees = buildTrees(crm, REGION_FAMILIES[family], args.trees, args.seed)
+        results = {'startup': measureStartup(args.db, trees)}
+        for name, scenario, needsNumpy in SCENARIOS:
+            if name not in args.scenarios:
+                continue
+            if needsNumpy and np == None:
+                results[name] = {'skipped': 'NumPy is not installed.'}
+                continue
+            results[name] = runScenario(crm, scenario, trees, args.chunk_size)
+        report['families'][family] = results
+
+    crm.close()
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output == '-':
+        print(output)
+    else:
+        with open(args.output, 'w') as outputFile:
+            outputFile.write(output + '\n')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,86 @@
+import os, sqlite3, sys
+
+# builds benchmarks/fixtures/coefficients.db from src/coefficients.db
+#
+# the fixture keeps the real species table and the real gross volume rows for a few regions
+# of each family, and adds Pacific Northwest (S26L*) regions that the bundled database does
+# not carry yet. The S26L* coefficients are synthetic form-factor values made up for timing
+# only, they are not FIA coefficients.
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DB = os.path.join(BENCHMARK_DIR, '..', 'src', 'coefficients.db')
+FIXTURE_DB = os.path.join(BENCHMARK_DIR, 'fixtures', 'coefficients.db')
+
+REAL_REGIONS = ['S24', 'S33', 'S23LCS', 'S23LLS', 'S23LPS', 'S22LAZN', 'S22LID']
+
+SYNTHETIC_COEFF_TBL_ID = 900
+SYNTHETIC_COEFF_TBL_NAME = 'BENCH_PNW_coefs'
+
+# gross_cf_spcd -> b0..b3 for Table 4 Rows 2 to 5
+SYNTHETIC_COEFFICIENTS = {
+    20: (None, 0.005454154, 0.40, -0.05),             # Table 4 Row 2
+    15: (None, 0.005454154, 0.42, -2.0, -0.0001),      # Table 4 Row 3
+    81: (None, 0.005454154, 0.42, -3.0),              # Table 4 Row 4
+    133: (-0.1424, 0.14819, 0.3333, -0.016712),        # Table 4 Row 5
+}
+
+# rgn_config_id -> species codes, each species uses its own code as gross_cf_spcd
+SYNTHETIC_CONFIG = {
+    'S26LCA': [15, 20, 81, 133],
+    'S26LWOR': [15, 20, 81, 133],
+    'S26LEWA': [81, 133],
+}
+
+
+def copyTable(source, fixture, table, where='', params=()):
+    createSql = source.execute("SELECT sql FROM sqlite_master WHERE name = ?", (table,)).fetchone()[0]
+    fixture.execute(createSql)
+
+    cursor = source.execute('SELECT * FROM {0} {1}'.format(table, where), params)
+    columns = [column[0] for column in cursor.description]
+    insertSql = 'INSERT INTO {0} ({1}) VALUES ({2})'.format(table, ', '.join(columns), ', '.join('?' * len(columns)))
+    fixture.executemany(insertSql, cursor.fetchall())
+
+
+def main():
+    if os.path.exists(FIXTURE_DB):
+        os.remove(FIXTURE_DB)
+
+    source = sqlite3.connect(SOURCE_DB)
+    fixture = sqlite3.connect(FIXTURE_DB)
+
+    regionFilter = 'WHERE rgn_config_id IN ({0})'.format(', '.join('?' * len(REAL_REGIONS)))
+    copyTable(source, fixture, 'species')
+    copyTable(source, fixture, 'lkup_coeff_tbl_name')
+    copyTable(source, fixture, 'config', regionFilter, REAL_REGIONS)
+    copyTable(source, fixture, 'gross_cubic_ft_coeff',
+              'WHERE EXISTS (SELECT 1 FROM config WHERE config.gross_coeff_tbl_id = gross_cubic_ft_coeff.coeff_tbl_id '
+              'AND config.gross_cf_spcd = gross_cubic_ft_coeff.species_cd AND config.rgn_config_id IN ({0}))'.format(
+                  ', '.join('?' * len(REAL_REGIONS))),
+              REAL_REGIONS)
+
+    fixture.execute('INSERT INTO lkup_coeff_tbl_name (id, type, value) VALUES (?, ?, ?)',
+                    (SYNTHETIC_COEFF_TBL_ID, 'gross', SYNTHETIC_COEFF_TBL_NAME))
+
+    for species_cd, coefficients in SYNTHETIC_COEFFICIENTS.items():
+        columns = ['b{0}'.format(idx) for idx in range(len(coefficients))]
+        fixture.execute('INSERT INTO gross_cubic_ft_coeff (coeff_tbl_id, species_cd, {0}) VALUES (?, ?, {1})'.format(
+                            ', '.join(columns), ', '.join('?' * len(columns))),
+                        (SYNTHETIC_COEFF_TBL_ID, species_cd) + coefficients)
+
+    for region_id, species_cds in SYNTHETIC_CONFIG.items():
+        for species_cd in species_cds:
+            fixture.execute('INSERT INTO config (rgn_config_id, species_cd, gross_cf_spcd, gross_coeff_tbl_id) '
+                            'VALUES (?, ?, ?, ?)', (region_id, species_cd, species_cd, SYNTHETIC_COEFF_TBL_ID))
+
+    viewSql = source.execute("SELECT sql FROM sqlite_master WHERE name = 'vw_gross_vol_coeff'").fetchone()[0]
+    fixture.execute(viewSql)
+
+    fixture.commit()
+    fixture.execute('VACUUM')
+    fixture.close()
+    source.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
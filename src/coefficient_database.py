@@ -0,0 +1,106 @@
+import contextlib, pathlib, sqlite3, threading
+
+
+class Coefficient_Database(object):
+
+    def __init__(self, db_path, pool_size=4):
+        if pool_size < 1:
+            raise Exception('Pool size must be > 0.')
+
+        self.db_path = db_path
+        self.pool_size = pool_size
+
+        # read only and immutable, SQLite skips locking and change detection so the file must not be
+        # written while it is open
+        self.uri = pathlib.Path(db_path).resolve().as_uri() + '?mode=ro&immutable=1'
+
+        # connections not handed out, opened only when every existing one is busy, the first one on the first query
+        self._idle = []
+        self._opened = 0
+        self._available = threading.Condition()
+
+        # set by close, connections handed out before it are closed when they come back
+        self._closed = False
+
+        # a missing file still fails at construction, without paying for a connection nobody may use
+        if not pathlib.Path(db_path).is_file():
+            raise ReferenceError('Cant connect to coefficients sqlite database.')
+
+
+    def _open(self):
+        try:
+            connection = sqlite3.connect(self.uri, uri=True, check_same_thread=False)
+            connection.execute('SELECT 1 FROM sqlite_master LIMIT 1')
+        except sqlite3.Error:
+            raise ReferenceError('Cant connect to coefficients sqlite database.')
+        return connection
+
+
+    @contextlib.contextmanager
+    def connection(self):
+
+        # one connection per thread at a time, waits when pool_size are already in use
+        with self._available:
+            while not self._closed and not self._idle and self._opened >= self.pool_size:
+                self._available.wait()
+
+            if self._closed:
+                raise ReferenceError('The coefficients database is closed.')
+
+            connection = self._idle.pop() if self._idle else None
+            if connection == None:
+                self._opened += 1
+
+        if connection == None:
+            try:
+                connection = self._open()
+            except:
+                with self._available:
+                    self._opened -= 1
+                    self._available.notify()
+                raise
+
+        try:
+            yield connection
+        finally:
+            with self._available:
+                if self._closed:
+                    connection.close()
+                    self._opened -= 1
+                else:
+                    self._idle.append(connection)
+                    self._available.notify()
+
+
+    def fetchAll(self, sql, params=(), row_factory=None):
+
+        # the SQL text never changes between calls so each connection's statement cache reuses the parsed statement
+        with self.connection() as connection:
+            cursor = connection.cursor()
+            cursor.row_factory = row_factory
+            try:
+                return cursor.execute(sql, params).fetchall()
+            finally:
+                cursor.close()
+
+
+    def fetchOne(self, sql, params=(), row_factory=None):
+        with self.connection() as connection:
+            cursor = connection.cursor()
+            cursor.row_factory = row_factory
+            try:
+                return cursor.execute(sql, params).fetchone()
+            finally:
+                cursor.close()
+
+
+    def close(self):
+
+        # idle connections close now, the ones in use when they are handed back
+        with self._available:
+            self._closed = True
+            self._available.notify_all()
+            for connection in self._idle:
+                connection.close()
+            self._opened -= len(self._idle)
+            self._idle = []
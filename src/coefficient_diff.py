@@ -0,0 +1,112 @@
+import sys
+
+from component_ratio_method import Component_Ratio_Method, SPECIES_COLUMNS, SPECIES_FLOAT_COLUMNS
+
+
+class Coefficient_Diff(object):
+
+    # compares two coefficient databases as the calculator reads them, so a change in config, gross_cubic_ft_coeff
+    # or the lookup tables behind vw_gross_vol_coeff shows up in the region tables it produces
+    def __init__(self, old_db_path, new_db_path):
+        old = Component_Ratio_Method(old_db_path)
+        new = Component_Ratio_Method(new_db_path)
+        try:
+            old.preloadCoefficients()
+            new.preloadCoefficients()
+
+            self.oldFingerprint = old.getCoefficientFingerprint()
+            self.newFingerprint = new.getCoefficientFingerprint()
+
+            # species rows added, removed or with any loaded column changed, these change every region
+            oldSpecies = self._speciesRows(old)
+            newSpecies = self._speciesRows(new)
+            self.changedSpecies = sorted(species_cd for species_cd in set(oldSpecies) | set(newSpecies)
+                                         if oldSpecies.get(species_cd) != newSpecies.get(species_cd))
+
+            # (species_cd, rgn_config_id) whose gross_cf_spcd changed or whose config row came or went,
+            # and those that kept their gross_cf_spcd but got different coefficients
+            self.changedConfig = []
+            self.changedCoefficients = []
+            for region_id in sorted(set(old._grossVolTables) | set(new._grossVolTables)):
+                oldTable = old._grossVolTables.get(region_id, {})
+                newTable = new._grossVolTables.get(region_id, {})
+                for species_cd in sorted(set(oldTable) | set(newTable)):
+                    oldEntry = oldTable.get(species_cd)
+                    newEntry = newTable.get(species_cd)
+                    if oldEntry == newEntry:
+                        continue
+                    if oldEntry == None or newEntry == None or oldEntry[0] != newEntry[0]:
+                        self.changedConfig.append((species_cd, region_id))
+                    else:
+                        self.changedCoefficients.append((species_cd, region_id))
+
+            # every region a changed species is configured in, in either database
+            self._speciesRegions = {}
+            for crm in [old, new]:
+                for region_id, table in crm._grossVolTables.items():
+                    for species_cd in table:
+                        self._speciesRegions.setdefault(species_cd, set()).add(region_id)
+
+        finally:
+            old.close()
+            new.close()
+
+        self._changedSpecies = frozenset(self.changedSpecies)
+        self._changedGrossVolume = frozenset(self.changedConfig + self.changedCoefficients)
+
+
+    def _speciesRows(self, crm):
+        columns = SPECIES_COLUMNS + SPECIES_FLOAT_COLUMNS
+        return dict((species_cd, tuple(species[column] for column in columns))
+                    for species_cd, species in crm._speciesCache.items())
+
+
+    def isEmpty(self):
+        return not self._changedSpecies and not self._changedGrossVolume
+
+
+    def affects(self, species_cd, region_id):
+        return species_cd in self._changedSpecies or (species_cd, region_id) in self._changedGrossVolume
+
+
+    def affectsTree(self, tree):
+
+        # trees with a species code that is not an int never matched a coefficient row, their error stands
+        return self.affects(tree.get('species_cd'), tree.get('region'))
+
+
+    def affectedKeys(self):
+
+        # (species_cd, rgn_config_id) whose results can differ, a changed species that is in no config
+        # row still changes its biomass everywhere and is listed with a region of None
+        keys = set(self._changedGrossVolume)
+        for species_cd in self._changedSpecies:
+            regions = self._speciesRegions.get(species_cd)
+            if not regions:
+                keys.add((species_cd, None))
+            for region_id in regions or []:
+                keys.add((species_cd, region_id))
+
+        return sorted(keys, key=lambda key: (key[0], key[1] or ''))
+
+
+    def getSummary(self):
+        return {
+            'old_fingerprint': self.oldFingerprint,
+            'new_fingerprint': self.newFingerprint,
+            'changed_species': len(self.changedSpecies),
+            'changed_config': len(self.changedConfig),
+            'changed_coefficients': len(self.changedCoefficients),
+            'affected_keys': len(self.affectedKeys())
+        }
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        sys.exit('usage: coefficient_diff.py OLD_COEFFICIENTS_DB NEW_COEFFICIENTS_DB')
+
+    diff = Coefficient_Diff(sys.argv[1], sys.argv[2])
+    for name, value in diff.getSummary().items():
+        print('{0}: {1}'.format(name, value))
+    for species_cd, region_id in diff.affectedKeys():
+        print('{0}\t{1}'.format(species_cd, region_id if region_id != None else '*'))
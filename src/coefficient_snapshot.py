@@ -0,0 +1,281 @@
+import bisect, collections.abc, math, mmap, numbers, os, struct, sys
+
+from component_ratio_method import (Component_Ratio_Method, GROSS_VOL_COEFFICIENT_COLUMNS,
+                                    SPECIES_COLUMNS, SPECIES_FLOAT_COLUMNS, coefficientFingerprint)
+
+# bump when the layout below changes, older snapshots are refused instead of misread
+SNAPSHOT_MAGIC = b'CRMSNAP\x00'
+SNAPSHOT_VERSION = 2
+
+# magic, version, number of sections, everything in the file is little endian
+HEADER = struct.Struct('<8sII')
+
+# section name, byte offset, byte size, record count
+SECTION = struct.Struct('<16sQQQ')
+
+# species columns that hold text, the rest of SPECIES_COLUMNS are integers
+SPECIES_TEXT_COLUMNS = ('common_name', 'genus', 'species', 'symbol', 'sftwd_hd')
+
+# stands in for NULL in integer columns, NaN does the same for floats
+NULL_INTEGER = -2 ** 63
+NULL_STRING = -1
+
+# text columns are (offset, length) into the strings section
+SPECIES_RECORD = struct.Struct('<' + ''.join('Ii' if column in SPECIES_TEXT_COLUMNS else 'q' for column in SPECIES_COLUMNS) +
+                               'd' * len(SPECIES_FLOAT_COLUMNS))
+
+# region name, first gross volume record, number of records
+REGION_RECORD = struct.Struct('<IiQQ')
+
+# gross_cf_spcd, has coefficients, b0..b19
+GROSS_VOL_RECORD = struct.Struct('<qB' + 'd' * len(GROSS_VOL_COEFFICIENT_COLUMNS))
+
+# the species and gross volume records are found through sorted int64 species_cd sections
+INDEX_FORMAT = 'q'
+
+
+class Snapshot_Gross_Vol_Table(collections.abc.Mapping):
+
+    # one region of a snapshot, {species_cd: (gross_cf_spcd, coefficients)} decoded as species are looked up
+    def __init__(self, snapshot, first, count):
+        self._snapshot = snapshot
+        self._first = first
+        self._count = count
+        self._entries = {}
+
+
+    def __getitem__(self, species_cd):
+        entry = self._entries.get(species_cd)
+        if entry == None:
+            entry = self._snapshot._readGrossVolEntry(self._first, self._count, species_cd)
+            self._entries[species_cd] = entry
+        return entry
+
+
+    def __iter__(self):
+        return iter(self._snapshot._grossVolIndex[self._first:self._first + self._count].tolist())
+
+
+    def __len__(self):
+        return self._count
+
+
+class Coefficient_Snapshot(object):
+
+    def __init__(self, path, db_path=None):
+        self.path = path
+
+        if sys.byteorder != 'little':
+            raise Exception('Coefficient snapshots can only be read on little endian machines.')
+
+        # the file is mapped read only, processes opening the same snapshot share its pages
+        with open(path, 'rb') as snapshotFile:
+            self._mmap = mmap.mmap(snapshotFile.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mmap.size() < HEADER.size:
+            self._mmap.close()
+            raise Exception('{0} is not a coefficient snapshot.'.format(path))
+
+        magic, version, sectionCount = HEADER.unpack_from(self._mmap, 0)
+        if magic != SNAPSHOT_MAGIC:
+            self._mmap.close()
+            raise Exception('{0} is not a coefficient snapshot.'.format(path))
+        if version != SNAPSHOT_VERSION:
+            self._mmap.close()
+            raise Exception('Snapshot version {0} is not supported, expected {1}.'.format(version, SNAPSHOT_VERSION))
+
+        self._sections = {}
+        for idx in range(sectionCount):
+            name, offset, size, count = SECTION.unpack_from(self._mmap, HEADER.size + idx * SECTION.size)
+            self._sections[name.rstrip(b'\x00').decode('ascii')] = (offset, size, count)
+
+        # views straight onto the mapped file, nothing is copied or parsed
+        self._speciesIndex = self._view('species_index').cast(INDEX_FORMAT)
+        self._grossVolIndex = self._view('gross_vol_index').cast(INDEX_FORMAT)
+
+        # Component_Ratio_Method.getCoefficientFingerprint of the database the snapshot was exported from,
+        # a snapshot older than the database it is opened for is refused
+        self.sourceFingerprint = bytes(self._view('source')).decode('ascii')
+        if db_path != None and coefficientFingerprint(db_path) != self.sourceFingerprint:
+            self.close()
+            raise Exception('{0} was not exported from {1}, export the snapshot again.'.format(path, db_path))
+
+        # the region list is the only thing read up front
+        self._regions = {}
+        for nameOffset, nameLength, first, count in struct.iter_unpack(REGION_RECORD.format, self._view('regions')):
+            self._regions[self._string(nameOffset, nameLength)] = (first, count)
+
+
+    def close(self):
+        self._speciesIndex.release()
+        self._grossVolIndex.release()
+        self._mmap.close()
+
+
+    def _view(self, name):
+        offset, size, count = self._sections[name]
+        return memoryview(self._mmap)[offset:offset + size]
+
+
+    def _string(self, offset, length):
+        if length == NULL_STRING:
+            return None
+
+        start = self._sections['strings'][0] + offset
+        return self._mmap[start:start + length].decode('utf-8')
+
+
+    def _decodeSpecies(self, values):
+
+        # a row in SPECIES_COLUMNS + SPECIES_FLOAT_COLUMNS order, the same as the species query
+        row = []
+        idx = 0
+        for column in SPECIES_COLUMNS:
+            if column in SPECIES_TEXT_COLUMNS:
+                row.append(self._string(values[idx], values[idx + 1]))
+                idx += 2
+            else:
+                row.append(None if values[idx] == NULL_INTEGER else values[idx])
+                idx += 1
+
+        for value in values[idx:]:
+            row.append(None if math.isnan(value) else value)
+
+        return tuple(row)
+
+
+    def speciesCodes(self):
+        return self._speciesIndex.tolist()
+
+
+    def readSpeciesRow(self, species_cd):
+        idx = bisect.bisect_left(self._speciesIndex, species_cd)
+        if idx == len(self._speciesIndex) or self._speciesIndex[idx] != species_cd:
+            return None
+
+        offset = self._sections['species'][0] + idx * SPECIES_RECORD.size
+        return self._decodeSpecies(SPECIES_RECORD.unpack_from(self._mmap, offset))
+
+
+    def readSpecies(self):
+        return [self._decodeSpecies(values) for values in struct.iter_unpack(SPECIES_RECORD.format, self._view('species'))]
+
+
+    def regionIds(self):
+        return list(self._regions)
+
+
+    def readGrossVolTable(self, region_id):
+
+        # unknown regions give an empty table, the same as a region with no config rows
+        first, count = self._regions.get(region_id, (0, 0))
+        return Snapshot_Gross_Vol_Table(self, first, count)
+
+
+    def _readGrossVolEntry(self, first, count, species_cd):
+        idx = bisect.bisect_left(self._grossVolIndex, species_cd, first, first + count)
+        if idx == first + count or self._grossVolIndex[idx] != species_cd:
+            raise KeyError(species_cd)
+
+        values = GROSS_VOL_RECORD.unpack_from(self._mmap, self._sections['gross_vol'][0] + idx * GROSS_VOL_RECORD.size)
+        gross_cf_spcd, hasCoefficients = values[:2]
+        coefficients = None
+        if hasCoefficients:
+            coefficients = tuple(None if math.isnan(value) else value for value in values[2:])
+
+        return (gross_cf_spcd, coefficients)
+
+
+def _writeString(strings, value):
+    if value == None:
+        return (0, NULL_STRING)
+
+    encoded = value.encode('utf-8')
+    offset = len(strings)
+    strings.extend(encoded)
+    return (offset, len(encoded))
+
+
+def exportSnapshot(snapshotPath, db_path=None):
+
+    # reads the tables through Component_Ratio_Method so the snapshot holds exactly what its caches would
+    crm = Component_Ratio_Method(db_path)
+    crm.preloadCoefficients()
+
+    strings = bytearray()
+    species = bytearray()
+    speciesIndex = bytearray()
+    regions = bytearray()
+    grossVol = bytearray()
+    grossVolIndex = bytearray()
+
+    speciesRows = crm.database.fetchAll('SELECT {0} FROM species ORDER BY species_cd'.format(
+                                            ', '.join(SPECIES_COLUMNS + SPECIES_FLOAT_COLUMNS)))
+
+    for row in speciesRows:
+        values = []
+        for column, value in zip(SPECIES_COLUMNS, row):
+            if column in SPECIES_TEXT_COLUMNS:
+                values.extend(_writeString(strings, value))
+            else:
+                values.append(NULL_INTEGER if value == None else value)
+
+        for column, value in zip(SPECIES_FLOAT_COLUMNS, row[len(SPECIES_COLUMNS):]):
+            if value != None and not isinstance(value, numbers.Number):
+                raise Exception('Species {0} {1} must be a number to be written to a snapshot.'.format(row[0], column))
+            values.append(float('nan') if value == None else value)
+
+        species.extend(SPECIES_RECORD.pack(*values))
+        speciesIndex.extend(struct.pack('<q', row[0]))
+
+    grossVolCount = 0
+    for region_id in sorted(crm._grossVolTables):
+        table = crm._grossVolTables[region_id]
+        regions.extend(REGION_RECORD.pack(*(_writeString(strings, region_id) + (grossVolCount, len(table)))))
+
+        for species_cd in sorted(table):
+            gross_cf_spcd, coefficients = table[species_cd]
+            if coefficients == None:
+                values = (0,) + (float('nan'),) * len(GROSS_VOL_COEFFICIENT_COLUMNS)
+            else:
+                values = (1,) + tuple(float('nan') if value == None else value for value in coefficients)
+            grossVol.extend(GROSS_VOL_RECORD.pack(gross_cf_spcd, *values))
+            grossVolIndex.extend(struct.pack('<q', species_cd))
+            grossVolCount += 1
+
+    source = crm.getCoefficientFingerprint().encode('ascii')
+    crm.close()
+
+    sections = [('strings', strings, len(strings)),
+                ('species', species, len(speciesRows)),
+                ('species_index', speciesIndex, len(speciesRows)),
+                ('regions', regions, len(crm._grossVolTables)),
+                ('gross_vol', grossVol, grossVolCount),
+                ('gross_vol_index', grossVolIndex, grossVolCount),
+                ('source', source, 1)]
+
+    # sections start on 8 byte boundaries after the header and section table
+    offset = HEADER.size + SECTION.size * len(sections)
+    directory = bytearray()
+    for name, data, count in sections:
+        offset += -offset % 8
+        directory.extend(SECTION.pack(name.encode('ascii'), offset, len(data), count))
+        offset += len(data)
+
+    # written next to the target and renamed so readers never map a half written file
+    temporaryPath = snapshotPath + '.tmp'
+    with open(temporaryPath, 'wb') as snapshotFile:
+        snapshotFile.write(HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(sections)))
+        snapshotFile.write(directory)
+        for name, data, count in sections:
+            snapshotFile.write(b'\x00' * (-snapshotFile.tell() % 8))
+            snapshotFile.write(data)
+    os.replace(temporaryPath, snapshotPath)
+
+    return snapshotPath
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in [2, 3]:
+        sys.exit('usage: coefficient_snapshot.py SNAPSHOT_PATH [COEFFICIENTS_DB]')
+    exportSnapshot(sys.argv[1], sys.argv[2] if len(sys.argv) == 3 else None)
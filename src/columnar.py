@@ -0,0 +1,168 @@
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from component_ratio_method import Component_Ratio_Method
+
+# float64 columns returned, null (NaN in the NumPy form) where the tree has no value
+COLUMNAR_RESULTS = ('volcfgrs', 'total_ag', 'stem', 'bark', 'bole', 'foliage', 'root', 'stump', 'top',
+                    'adjustment_factor', 'bole_crm', 'foliage_crm', 'total_ag_crm')
+
+# optional input columns besides species_cd, region and dbh, in the order getVOLCFGRSBatch takes them
+VOLUME_MEASUREMENTS = ('height', 'basal_area', 'site_index', 'stem_count', 'drc', 'bole_hgt')
+
+
+class Columnar_Calculator(object):
+
+    def __init__(self, crm=None):
+        if np == None:
+            raise Exception('NumPy is required for columnar calculations.')
+
+        self.crm = crm if crm != None else Component_Ratio_Method()
+
+
+    def _requirePyarrow(self):
+        try:
+            import pyarrow
+        except ImportError:
+            raise Exception('pyarrow is required for Arrow input or output.')
+        return pyarrow
+
+
+    def _isArrow(self, values):
+        return type(values).__module__.startswith('pyarrow')
+
+
+    def _getColumn(self, columns, name):
+
+        # a RecordBatch or Table, or a mapping of names to NumPy arrays, Arrow arrays or lists
+        if hasattr(columns, 'schema'):
+            if name not in columns.schema.names:
+                return None
+            return columns.column(name)
+        return columns.get(name)
+
+
+    def _numbers(self, values, count):
+
+        # float64 with NaN for missing values, Arrow float64 columns without nulls are viewed instead of copied
+        if values is None:
+            return np.full(count, np.nan)
+        if self._isArrow(values):
+            values = values.to_numpy(zero_copy_only=False)
+
+        column = np.asarray(values, dtype=np.float64).reshape(-1)
+        if column.size != count:
+            raise Exception('Every column must be the same length as species_cd.')
+        return column
+
+
+    def _regions(self, values, count):
+        if values is None:
+            raise Exception('A region column is required.')
+
+        # Arrow strings are dictionary encoded so each distinct region is converted once, not once per row
+        if self._isArrow(values):
+            pyarrow = self._requirePyarrow()
+            if isinstance(values, pyarrow.ChunkedArray):
+                values = values.combine_chunks()
+            encoded = values.dictionary_encode()
+            names = np.asarray(encoded.dictionary.to_pylist() + [''], dtype=str)
+            indices = encoded.indices.fill_null(len(encoded.dictionary)).to_numpy(zero_copy_only=False)
+            regions = names[indices]
+        else:
+            regions = np.asarray(values, dtype=str)
+            if regions.ndim == 0:
+                regions = np.full(count, str(regions))
+            regions = regions.reshape(-1)
+
+        if regions.size != count:
+            raise Exception('Every column must be the same length as species_cd.')
+        return regions
+
+
+    def _knownSpecies(self, species_cds):
+
+        # species that are in the table with usable coefficients, looked up once per distinct code
+        good = []
+        for species_cd in np.unique(species_cds).tolist():
+            try:
+                self.crm._getSpeciesData(species_cd)
+            except Exception:
+                continue
+            if species_cd not in self.crm.speciesErrors:
+                good.append(species_cd)
+        return np.isin(species_cds, good)
+
+
+    def computeArrays(self, columns):
+        crm = self.crm
+
+        speciesColumn = self._getColumn(columns, 'species_cd')
+        if speciesColumn is None:
+            raise Exception('A species_cd column is required.')
+
+        codes = self._numbers(speciesColumn, len(speciesColumn))
+        count = codes.size
+
+        # missing and fractional codes become -1, which no species has
+        with np.errstate(invalid='ignore'):
+            badSpecies = ~np.isfinite(codes) | (np.floor(codes) != codes)
+        species_cds = np.where(badSpecies, -1, codes).astype(np.int64)
+
+        regions = self._regions(self._getColumn(columns, 'region'), count)
+        dbhs = self._numbers(self._getColumn(columns, 'dbh'), count)
+        measurements = [self._numbers(self._getColumn(columns, name), count) for name in VOLUME_MEASUREMENTS]
+
+        results = {}
+        results['volcfgrs'] = crm.getVOLCFGRSBatch(species_cds, regions, dbhs, *measurements)
+
+        # the biomass kernels raise for the whole batch on a bad tree, so only the trees
+        # validateTrees would pass are handed to them and the rest stay NaN
+        valid = ~badSpecies & np.isfinite(dbhs) & (dbhs >= 0) & self._knownSpecies(species_cds)
+        everyTree = bool(valid.all())
+        validSpecies = species_cds if everyTree else species_cds[valid]
+        validDbhs = dbhs if everyTree else dbhs[valid]
+        validVolumes = results['volcfgrs'] if everyTree else results['volcfgrs'][valid]
+
+        # the Jenkins and component ratio columns in one pass over the gross volumes already worked out
+        for column, values in crm._componentRatioArrays(validSpecies, validDbhs, validVolumes).items():
+            if everyTree:
+                results[column] = values
+            else:
+                results[column] = np.full(count, np.nan)
+                results[column][valid] = values
+
+        for column in COLUMNAR_RESULTS:
+            values = results[column]
+            values[~np.isfinite(values)] = np.nan
+
+        return dict((column, results[column]) for column in COLUMNAR_RESULTS)
+
+
+    def _arrowColumn(self, pyarrow, values):
+
+        # the NumPy buffer becomes the Arrow data buffer as it is, only the null bitmap is new
+        values = np.ascontiguousarray(values, dtype=np.float64)
+        missing = np.isnan(values)
+        nullCount = int(missing.sum())
+        validity = None
+        if nullCount:
+            validity = pyarrow.py_buffer(np.packbits(~missing, bitorder='little'))
+        return pyarrow.Array.from_buffers(pyarrow.float64(), values.size, [validity, pyarrow.py_buffer(values)], nullCount)
+
+
+    def computeRecordBatch(self, columns):
+        pyarrow = self._requirePyarrow()
+        arrays = self.computeArrays(columns)
+        return pyarrow.RecordBatch.from_arrays([self._arrowColumn(pyarrow, arrays[column]) for column in COLUMNAR_RESULTS],
+                                               names=list(COLUMNAR_RESULTS))
+
+
+    def computeTable(self, table):
+
+        # one result batch per input batch, a chunked table is never concatenated
+        pyarrow = self._requirePyarrow()
+        schema = pyarrow.schema([(column, pyarrow.float64()) for column in COLUMNAR_RESULTS])
+        return pyarrow.Table.from_batches([self.computeRecordBatch(batch) for batch in table.to_batches()], schema)
@@ -1,21 +1,212 @@
-import math, sqlite3, numbers, os
+import collections, fnmatch, hashlib, math, re, numbers, os
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from coefficient_database import Coefficient_Database
+
+# species columns gathered for the batch Jenkins calculations
+JENKINS_COEFFICIENT_COLUMNS = ('jenkins_total_b1', 'jenkins_total_b2',
+                               'jenkins_stem_wood_ratio_b1', 'jenkins_stem_wood_ratio_b2',
+                               'jenkins_stem_bark_ratio_b1', 'jenkins_stem_bark_ratio_b2',
+                               'jenkins_foliage_ratio_b1', 'jenkins_foliage_ratio_b2',
+                               'jenkins_root_ratio_b1', 'jenkins_root_ratio_b2')
+
+# species coefficients checked once when the species table loads, column -> name used in messages
+SPECIES_COEFFICIENT_NAMES = (('jenkins_total_b1', 'Jenkins Total B1'),
+                             ('jenkins_total_b2', 'Jenkins Total B2'),
+                             ('jenkins_stem_wood_ratio_b1', 'Jenkins Stem Wood B1'),
+                             ('jenkins_stem_wood_ratio_b2', 'Jenkins Stem Wood B2'),
+                             ('jenkins_stem_bark_ratio_b1', 'Jenkins Stem Bark B1'),
+                             ('jenkins_stem_bark_ratio_b2', 'Jenkins Stem Bark B2'),
+                             ('jenkins_foliage_ratio_b1', 'Jenkins Foliage Ratio B1'),
+                             ('jenkins_foliage_ratio_b2', 'Jenkins Foliage Ratio B2'),
+                             ('jenkins_root_ratio_b1', 'Jenkins Root Ratio B1'),
+                             ('jenkins_root_ratio_b2', 'Jenkins Root Ratio B2'),
+                             ('raile_stump_dob_b1', 'Raile Stump DOB B1'),
+                             ('raile_stump_dib_b1', 'Raile Stump DIB B1'),
+                             ('raile_stump_dib_b2', 'Raile Stump DIB B2'),
+                             ('wood_spgr_greenvol_drywt', 'Wood Specific Gravity'),
+                             ('bark_spgr_greenvol_drywt', 'Bark Specific Gravity'),
+                             ('bark_vol_pct', 'Bark Volume Percent'))
+
+# optional tree measurements checked by validateTrees, column -> name used in messages
+TREE_MEASUREMENT_NAMES = (('height', 'Height'),
+                          ('basal_area', 'Basal Area'),
+                          ('site_index', 'Site Index'),
+                          ('stem_count', 'Stem Count'),
+                          ('drc', 'Diameter at root collar'),
+                          ('bole_hgt', 'Bole Height'))
+
+# Jenkins component biomass (lbs) of one tree
+Jenkins_Biomass = collections.namedtuple('Jenkins_Biomass', ['total_ag', 'stem', 'bark', 'bole', 'foliage', 'root'])
+
+# component ratio method biomass (lbs) of one tree, the bole from gross volume and specific gravity and the
+# Jenkins stump, top, foliage and total scaled by the adjustment factor, bole_crm over the Jenkins bole
+Component_Ratio_Biomass = collections.namedtuple('Component_Ratio_Biomass', ['adjustment_factor', 'bole_crm', 'stump', 'top',
+                                                                             'foliage_crm', 'total_ag_crm'])
+
+# species table columns kept in memory, the coefficient columns are held as floats
+SPECIES_COLUMNS = ('species_cd', 'common_name', 'genus', 'species', 'symbol', 'sftwd_hd', 'woodland', 'jenkins_spgrpcd')
+SPECIES_FLOAT_COLUMNS = JENKINS_COEFFICIENT_COLUMNS + ('jenkins_sapling_adjust',
+                                                      'wood_spgr_greenvol_drywt', 'bark_spgr_greenvol_drywt',
+                                                      'mc_pct_green_wood', 'mc_pct_green_bark',
+                                                      'wood_spgr_mc12vol_drywt', 'bark_vol_pct',
+                                                      'raile_stump_dob_b1', 'raile_stump_dib_b1', 'raile_stump_dib_b2')
+
+# worked out from the coefficients when the species table loads
+SPECIES_DERIVED_FIELDS = ('stump_dob_factor', 'stump_dib_factor', 'stump_biomass_factor', 'bole_biomass_factor')
+
+# a region id with any of these is matched as a pattern against the configured regions, e.g. S26L*
+REGION_PATTERN_CHARACTERS = frozenset('*?[')
+
+
+class Species_Record(object):
+
+    # one species held in slots instead of a dict per row, species.column still works
+    __slots__ = SPECIES_COLUMNS + SPECIES_FLOAT_COLUMNS + SPECIES_DERIVED_FIELDS
+
+    def __init__(self, row):
+        for column, value in zip(SPECIES_COLUMNS, row):
+            setattr(self, column, value)
+
+        # non numeric coefficients are kept as they are so validation can report them
+        for column, value in zip(SPECIES_FLOAT_COLUMNS, row[len(SPECIES_COLUMNS):]):
+            setattr(self, column, float(value) if isinstance(value, (int, float)) else value)
+
+        for field in SPECIES_DERIVED_FIELDS:
+            setattr(self, field, None)
+
+
+    def __getitem__(self, column):
+        try:
+            return getattr(self, column)
+        except AttributeError:
+            raise KeyError(column)
+
+
+    def _asdict(self):
+        return {field: getattr(self, field) for field in Species_Record.__slots__}
+
+
+# vw_gross_vol_coeff columns passed to the gross volume equations
+GROSS_VOL_COEFFICIENT_COLUMNS = tuple('b{0}'.format(idx) for idx in range(20))
+
+def treeErrors(coefficients, tree):
+
+    # what validateTrees reports for one tree, coefficients is a Component_Ratio_Method or anything else
+    # with its _getSpeciesData and speciesErrors
+    errors = []
+
+    species_cd = tree.get('species_cd')
+    try:
+        coefficients._getSpeciesData(species_cd)
+    except Exception as e:
+        errors.append(str(e))
+    else:
+        errors.extend(coefficients.speciesErrors.get(species_cd, []))
+
+    dbh = tree.get('dbh')
+    if not isinstance(dbh, numbers.Number):
+        errors.append('DBH must be a number.')
+    elif dbh < 0:
+        errors.append('DBH must be > 0.')
+
+    for column, name in TREE_MEASUREMENT_NAMES:
+        value = tree.get(column)
+        if value != None and not isinstance(value, numbers.Number):
+            errors.append('{0} must be a number.'.format(name))
+
+    return errors
+
+
+def coefficientFingerprint(db_path):
+
+    # a hash of the whole database file, any change to its coefficients gives another fingerprint
+    digest = hashlib.sha256()
+    with open(db_path, 'rb') as coefficientFile:
+        for block in iter(lambda: coefficientFile.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
 
 class Component_Ratio_Method(object):
 
-    def __init__(self):
+    def __init__(self, db_path=None, validate=True, snapshot_path=None, pool_size=4):
         self.WATER_WEIGHT = 62.4 # lbs of ft^3 of water
 
+        # when False the calculations skip their per call type checks, use validateTrees on the batch instead
+        self.validate = validate
+
         # uses the coefficients SQLite DB to get various species coefficients 
         self.current_dir = os.path.dirname(__file__)
-        self.db = os.path.join(self.current_dir, 'coefficients.db')
-        try:
-            self.connect = sqlite3.connect(self.db)
-        except:
-            raise ReferenceError('Cant connect to coefficients sqlite database.')
+        self.db = db_path if db_path != None else os.path.join(self.current_dir, 'coefficients.db')
+
+        # a binary snapshot written by coefficient_snapshot.py replaces the database, nothing is parsed up front
+        # otherwise the database is opened read only through a small pool that worker threads can share,
+        # given both the snapshot must have been exported from db_path
+        self.snapshot = None
+        self.database = None
+        if snapshot_path != None:
+            from coefficient_snapshot import Coefficient_Snapshot
+            self.snapshot = Coefficient_Snapshot(snapshot_path, db_path)
+        else:
+            self.database = Coefficient_Database(self.db, pool_size)
+
+        # species held in memory keyed by species_cd, each read on its first lookup, the whole table by preloadCoefficients
+        self._speciesCache = None
+        self._speciesComplete = False
+        self.speciesErrors = {}
+
+        # codes looked up and not found, so a bad code in a tree list is not read again for every tree
+        self._missingSpecies = set()
+        self.speciesCacheHits = 0
+        self.speciesCacheMisses = 0
+
+        # rgn_config_id -> {species_cd: (gross_cf_spcd, coefficients)}, each region loaded on first use
+        self._grossVolTables = {}
+
+        # rgn_config_id -> the same table as sorted NumPy arrays for getVOLCFGRSBatch
+        self._grossVolBatchTables = {}
+
+        # hash of the coefficient file, worked out on first request
+        self._coefficientFingerprint = None
+
+        # Table/Row counts of the gross volume equations used, None while tracing is off
+        self.equationTrace = None
+
+        # instrumentation.Instrumentation while timing is on, the methods carry no timing code otherwise
+        self.instrumentation = None
+
+        # (rgn_config_id, gross_cf_spcd) -> (gross volume equation, Table/Row label), each pair resolved on first use
+        self._grossVolDispatch = {}
 
     
     def close(self):
-        self.connect.close()
+        if self.database != None:
+            self.database.close()
+        if self.snapshot != None:
+            self.snapshot.close()
+
+
+    def getCoefficientFingerprint(self):
+
+        # identifies the coefficients in use, e.g. to tell cached results from different databases apart,
+        # a snapshot gives the fingerprint of the database it was exported from
+        if self.snapshot != None:
+            return self.snapshot.sourceFingerprint
+
+        if self._coefficientFingerprint == None:
+            self._coefficientFingerprint = coefficientFingerprint(self.db)
+
+        return self._coefficientFingerprint
+
+
+    def _requireDatabase(self):
+        if self.database == None:
+            raise Exception('This lookup needs the coefficients database, it is not in the snapshot.')
 
 
     def _dataSerializer(self, cursor, row):
@@ -37,19 +228,145 @@ class Component_Ratio_Method(object):
             raise Exception('{0} must be > 0.'.format(variableName))
 
 
+    def _loadSpeciesCache(self):
+
+        # built aside and swapped in whole so other threads never see a half filled cache
+        if self.snapshot != None:
+            rows = self.snapshot.readSpecies()
+        else:
+            rows = self.database.fetchAll('SELECT {0} FROM species'.format(', '.join(SPECIES_COLUMNS + SPECIES_FLOAT_COLUMNS)))
+
+        speciesCache = {}
+        speciesErrors = {}
+        for row in rows:
+            species = self._buildSpecies(row, speciesErrors)
+            speciesCache[species.species_cd] = species
+
+        self.speciesErrors = speciesErrors
+        self._missingSpecies = set()
+        self._speciesCache = speciesCache
+        self._speciesComplete = True
+
+
+    def _loadSpecies(self, species_cd):
+
+        # reads the one species a lookup needs, None when it is not there
+        if self._speciesComplete or species_cd in self._missingSpecies:
+            return None
+
+        self.speciesCacheMisses += 1
+        if self.snapshot != None:
+            row = self.snapshot.readSpeciesRow(species_cd)
+        else:
+            sqlString = 'SELECT {0} FROM species WHERE species_cd = ?'.format(', '.join(SPECIES_COLUMNS + SPECIES_FLOAT_COLUMNS))
+            row = self.database.fetchOne(sqlString, (species_cd,))
+
+        if row == None:
+            self._missingSpecies.add(species_cd)
+            return None
+
+        species = self._buildSpecies(row, self.speciesErrors)
+        self._speciesCache[species.species_cd] = species
+        return species
+
+
+    def _buildSpecies(self, row, speciesErrors):
+        species = Species_Record(row)
+        self._addBiomassFactors(species)
+
+        # coefficients are checked once per load instead of on every calculation
+        errors = self._validateSpeciesCoefficients(species)
+        if errors:
+            speciesErrors[species.species_cd] = errors
+
+        return species
+
+
+    def _addBiomassFactors(self, species):
+        woodSPGravity = species.wood_spgr_greenvol_drywt
+        barkSPGravity = species.bark_spgr_greenvol_drywt
+
+        # dry weight of one cubic foot of bole, wood plus bark taken as a percent of the wood volume
+        if (isinstance(woodSPGravity, numbers.Number) and isinstance(barkSPGravity, numbers.Number) and
+                isinstance(species.bark_vol_pct, numbers.Number)):
+            species.bole_biomass_factor = (woodSPGravity + barkSPGravity * species.bark_vol_pct / 100.0) * self.WATER_WEIGHT
+
+        # the Raile stump integral from 0 to 1 ft only depends on the species, so it is done once
+        # per load and scaled by pi / 576, a tree then needs dbh^2 times the factor, left None
+        # when the coefficients are missing
+        for column in ['raile_stump_dob_b1', 'raile_stump_dib_b1', 'raile_stump_dib_b2']:
+            if not isinstance(species[column], numbers.Number):
+                return
+
+        outsideBark = (self._stumpVolumeEquation(1.0, species.raile_stump_dob_b1, 1.0) -
+                       self._stumpVolumeEquation(1.0, species.raile_stump_dob_b1, 0.0))
+        insideBark = (self._stumpVolumeEquation(species.raile_stump_dib_b1, species.raile_stump_dib_b2, 1.0) -
+                      self._stumpVolumeEquation(species.raile_stump_dib_b1, species.raile_stump_dib_b2, 0.0))
+
+        species.stump_dob_factor = (math.pi * outsideBark) / 576.0
+        species.stump_dib_factor = (math.pi * insideBark) / 576.0
+
+        if isinstance(woodSPGravity, numbers.Number) and isinstance(barkSPGravity, numbers.Number):
+            species.stump_biomass_factor = (species.stump_dib_factor * woodSPGravity +
+                                            (species.stump_dob_factor - species.stump_dib_factor) * barkSPGravity
+                                            ) * self.WATER_WEIGHT
+
+
+    def _validateSpeciesCoefficients(self, species):
+        errors = []
+        for column, name in SPECIES_COEFFICIENT_NAMES:
+            if not isinstance(species[column], numbers.Number):
+                errors.append('{0} must be a number.'.format(name))
+        return errors
+
+
+    def validateTrees(self, trees):
+
+        # checks a whole batch up front, returns the rows that fail and why
+        failures = []
+        for row, tree in enumerate(trees):
+            errors = treeErrors(self, tree)
+            if errors:
+                failures.append({'row': row, 'species_cd': tree.get('species_cd'), 'errors': errors})
+
+        return failures
+
+
+    def invalidateSpeciesCache(self):
+        self._speciesCache = None
+        self._speciesComplete = False
+        self._missingSpecies = set()
+        self.speciesErrors = {}
+
+
+    def reloadSpeciesCache(self):
+        self.invalidateSpeciesCache()
+        self._loadSpeciesCache()
+
+
+    def getSpeciesCacheStats(self):
+        return {
+            'hits': self.speciesCacheHits,
+            'misses': self.speciesCacheMisses,
+            'size': 0 if self._speciesCache == None else len(self._speciesCache)
+        }
+
+
     def _getSpeciesData(self, species_cd):
 
         # # checks for proper data types
         if not type(species_cd) == int:
             raise Exception('Species code must be an integer.')
 
-        sqlString = 'SELECT * FROM species WHERE species_cd = {0}'.format(species_cd)
+        # only the first lookup of each species after an invalidate goes to the database
+        if self._speciesCache == None:
+            self._speciesCache = {}
 
-        self.connect.row_factory = self._dataSerializer
-        cursor = self.connect.cursor()
-        cursor.execute(sqlString)
-        species_data = cursor.fetchone()
-        cursor.close()
+        species_data = self._speciesCache.get(species_cd)
+        if species_data == None:
+            species_data = self._loadSpecies(species_cd)
+        else:
+            self.speciesCacheHits += 1
 
         if species_data == None:
             raise Exception('Species not found in database.')
@@ -58,16 +375,14 @@ class Component_Ratio_Method(object):
 
 
     def _getGrossVolConfigSpeciesCode(self, species_cd, region_id):
+        self._requireDatabase()
+
         sqlString = 'SELECT gross_cf_spcd '
-        sqlString += 'FROM config WHERE species_cd = {0} '.format(species_cd)
-        sqlString += "AND rgn_config_id = '{0}' ".format(region_id)
+        sqlString += 'FROM config WHERE species_cd = ? '
+        sqlString += 'AND rgn_config_id = ? '
         sqlString += 'ORDER BY  gross_cf_spcd'
 
-        self.connect.row_factory = self._dataSerializer
-        cursor = self.connect.cursor()
-        cursor.execute(sqlString)
-        species_cd_dict = cursor.fetchone()
-        cursor.close()
+        species_cd_dict = self.database.fetchOne(sqlString, (species_cd, region_id), self._dataSerializer)
 
         if species_cd_dict == None:
             raise Exception('There is no cooresponding gross volume species code for this species!')
@@ -75,16 +390,14 @@ class Component_Ratio_Method(object):
         return species_cd_dict['gross_cf_spcd']
 
     def _getGrossVolCoeff(self, species_cd, region_id):
+        self._requireDatabase()
+
         sqlString = 'SELECT * '
-        sqlString += 'FROM vw_gross_vol_coeff WHERE  species_cd = {0} '.format(species_cd)
-        sqlString += "AND rgn_config_id = '{0}' ".format(region_id)
+        sqlString += 'FROM vw_gross_vol_coeff WHERE  species_cd = ? '
+        sqlString += 'AND rgn_config_id = ? '
         sqlString += 'ORDER BY  gross_cf_spcd'
 
-        self.connect.row_factory = self._dataSerializer
-        cursor = self.connect.cursor()
-        cursor.execute(sqlString)
-        coefficients = cursor.fetchone()
-        cursor.close()
+        coefficients = self.database.fetchOne(sqlString, (species_cd, region_id), self._dataSerializer)
 
         if coefficients == None:
             raise Exception('There is no cooresponding gross volume coefficients for this region and species.')
@@ -92,16 +405,102 @@ class Component_Ratio_Method(object):
         return coefficients
 
 
+    def _loadGrossVolTable(self, region_id):
+        if self.snapshot != None:
+            table = self.snapshot.readGrossVolTable(region_id)
+            self._grossVolTables[region_id] = table
+            return table
+
+        configRows = self.database.fetchAll('SELECT species_cd, gross_cf_spcd FROM config '
+                                            'WHERE rgn_config_id = ? ORDER BY gross_cf_spcd',
+                                            (region_id,), self._dataSerializer)
+
+        coefficientRows = self.database.fetchAll('SELECT * FROM vw_gross_vol_coeff '
+                                                 'WHERE rgn_config_id = ? ORDER BY gross_cf_spcd',
+                                                 (region_id,), self._dataSerializer)
+
+        # keeps the first row per species, the same one the single species queries return
+        coefficients = {}
+        for row in coefficientRows:
+            if row['species_cd'] not in coefficients:
+                coefficients[row['species_cd']] = tuple(row[column] for column in GROSS_VOL_COEFFICIENT_COLUMNS)
+
+        table = {}
+        for row in configRows:
+            if row['species_cd'] not in table:
+                table[row['species_cd']] = (row['gross_cf_spcd'], coefficients.get(row['species_cd']))
+
+        self._grossVolTables[region_id] = table
+        return table
+
+
+    def _getGrossVolSpeciesCodeAndCoeff(self, species_cd, region_id):
+        table = self._grossVolTables.get(region_id)
+        if table == None:
+            table = self._loadGrossVolTable(region_id)
+
+        entry = table.get(species_cd)
+        if entry == None:
+            raise Exception('There is no cooresponding gross volume species code for this species!')
+
+        if entry[1] == None:
+            raise Exception('There is no cooresponding gross volume coefficients for this region and species.')
+
+        return entry
+
+
+    def preloadCoefficients(self, region_ids=None):
+
+        # fills the species and gross volume caches up front, all regions when none are given,
+        # returns the regions loaded
+        if not self._speciesComplete:
+            self._loadSpeciesCache()
+
+        region_ids = self.resolveRegionIds(region_ids)
+        for region_id in region_ids:
+            if region_id not in self._grossVolTables:
+                self._loadGrossVolTable(region_id)
+
+        return region_ids
+
+
+    def resolveRegionIds(self, region_ids=None):
+
+        # rgn_config_id values and shell style patterns, e.g. ['S33'] or ['S26L*'], to the matching ids,
+        # every region when none are given, plain ids are kept even when nothing is configured for them
+        if region_ids != None and not any(REGION_PATTERN_CHARACTERS.intersection(region_id) for region_id in region_ids):
+            return list(region_ids)
+
+        if self.snapshot != None:
+            available = sorted(self.snapshot.regionIds())
+        else:
+            available = [row[0] for row in self.database.fetchAll('SELECT DISTINCT rgn_config_id FROM config ORDER BY rgn_config_id')]
+
+        if region_ids == None:
+            return available
+
+        resolved = []
+        for region_id in region_ids:
+            if REGION_PATTERN_CHARACTERS.intersection(region_id):
+                matches = fnmatch.filter(available, region_id)
+            else:
+                matches = [region_id]
+            resolved.extend(match for match in matches if match not in resolved)
+
+        return resolved
+
+
     def _calcTotalAGBioMassJenkins(self, species, dbh):
 
         # checks for proper data types
-        self._isPositiveNumber('DBH', dbh)
-        self._isNumber('Jenkins Total B1', species['jenkins_total_b1'])
-        self._isNumber('Jenkins Total B2', species['jenkins_total_b2'])
+        if self.validate:
+            self._isPositiveNumber('DBH', dbh)
+            self._isNumber('Jenkins Total B1', species.jenkins_total_b1)
+            self._isNumber('Jenkins Total B2', species.jenkins_total_b2)
 
         result =  math.exp( 
-                    species['jenkins_total_b1'] + 
-                    species['jenkins_total_b2'] * 
+                    species.jenkins_total_b1 + 
+                    species.jenkins_total_b2 * 
                     math.log(dbh * 2.54))
 
         result *= 2.2046
@@ -112,13 +511,14 @@ class Component_Ratio_Method(object):
     def _calcStemRatio(self, species, dbh):
 
         # checks for proper data types
-        self._isPositiveNumber('DBH', dbh)
-        self._isNumber('Jenkins Stem Wood B1', species['jenkins_stem_wood_ratio_b1'])
-        self._isNumber('Jenkins Stem Wood B2', species['jenkins_stem_wood_ratio_b2'])
+        if self.validate:
+            self._isPositiveNumber('DBH', dbh)
+            self._isNumber('Jenkins Stem Wood B1', species.jenkins_stem_wood_ratio_b1)
+            self._isNumber('Jenkins Stem Wood B2', species.jenkins_stem_wood_ratio_b2)
         
         result =  math.exp( 
-                    species['jenkins_stem_wood_ratio_b1'] + 
-                    species['jenkins_stem_wood_ratio_b2'] / 
+                    species.jenkins_stem_wood_ratio_b1 + 
+                    species.jenkins_stem_wood_ratio_b2 / 
                     (dbh * 2.54))
 
         return result
@@ -127,13 +527,14 @@ class Component_Ratio_Method(object):
     def _calcBarkRatio(self, species, dbh):
 
         # checks for proper data types
-        self._isPositiveNumber('DBH', dbh)
-        self._isNumber('Jenkins Stem Bark B1', species['jenkins_stem_bark_ratio_b1'])
-        self._isNumber('Jenkins Stem Bark B2', species['jenkins_stem_bark_ratio_b2'])
+        if self.validate:
+            self._isPositiveNumber('DBH', dbh)
+            self._isNumber('Jenkins Stem Bark B1', species.jenkins_stem_bark_ratio_b1)
+            self._isNumber('Jenkins Stem Bark B2', species.jenkins_stem_bark_ratio_b2)
         
         result =  math.exp( 
-                    species['jenkins_stem_bark_ratio_b1'] + 
-                    species['jenkins_stem_bark_ratio_b2'] / 
+                    species.jenkins_stem_bark_ratio_b1 + 
+                    species.jenkins_stem_bark_ratio_b2 / 
                     (dbh * 2.54))
 
         return result
@@ -142,13 +543,14 @@ class Component_Ratio_Method(object):
     def _calcFoliageRatio(self, species, dbh):
 
         # checks for proper data types
-        self._isPositiveNumber('DBH', dbh)
-        self._isNumber('Jenkins Foliage Ratio B1', species['jenkins_foliage_ratio_b1'])
-        self._isNumber('Jenkins Foliage Ratio B2', species['jenkins_foliage_ratio_b2'])
+        if self.validate:
+            self._isPositiveNumber('DBH', dbh)
+            self._isNumber('Jenkins Foliage Ratio B1', species.jenkins_foliage_ratio_b1)
+            self._isNumber('Jenkins Foliage Ratio B2', species.jenkins_foliage_ratio_b2)
         
         result =  math.exp( 
-                    species['jenkins_foliage_ratio_b1'] + 
-                    species['jenkins_foliage_ratio_b2'] / 
+                    species.jenkins_foliage_ratio_b1 + 
+                    species.jenkins_foliage_ratio_b2 / 
                     (dbh * 2.54))
 
         return result
@@ -157,18 +559,52 @@ class Component_Ratio_Method(object):
     def _calcRootRatio(self, species, dbh):
 
         # checks for proper data types
-        self._isPositiveNumber('DBH', dbh)
-        self._isNumber('Jenkins Foliage Ratio B1', species['jenkins_root_ratio_b1'])
-        self._isNumber('Jenkins Foliage Ratio B2', species['jenkins_root_ratio_b2'])
+        if self.validate:
+            self._isPositiveNumber('DBH', dbh)
+            self._isNumber('Jenkins Root Ratio B1', species.jenkins_root_ratio_b1)
+            self._isNumber('Jenkins Root Ratio B2', species.jenkins_root_ratio_b2)
 
         result =  math.exp( 
-                    species['jenkins_root_ratio_b1'] + 
-                    species['jenkins_root_ratio_b2'] / 
+                    species.jenkins_root_ratio_b1 + 
+                    species.jenkins_root_ratio_b2 / 
                     (dbh * 2.54))
 
         return result
 
 
+    def _calcJenkinsComponentsLbs(self, species, dbh):
+
+        # checks for proper data types
+        if self.validate:
+            self._isPositiveNumber('DBH', dbh)
+            self._isNumber('Jenkins Total B1', species.jenkins_total_b1)
+            self._isNumber('Jenkins Total B2', species.jenkins_total_b2)
+            self._isNumber('Jenkins Stem Wood B1', species.jenkins_stem_wood_ratio_b1)
+            self._isNumber('Jenkins Stem Wood B2', species.jenkins_stem_wood_ratio_b2)
+            self._isNumber('Jenkins Stem Bark B1', species.jenkins_stem_bark_ratio_b1)
+            self._isNumber('Jenkins Stem Bark B2', species.jenkins_stem_bark_ratio_b2)
+            self._isNumber('Jenkins Foliage Ratio B1', species.jenkins_foliage_ratio_b1)
+            self._isNumber('Jenkins Foliage Ratio B2', species.jenkins_foliage_ratio_b2)
+            self._isNumber('Jenkins Root Ratio B1', species.jenkins_root_ratio_b1)
+            self._isNumber('Jenkins Root Ratio B2', species.jenkins_root_ratio_b2)
+
+        return self._jenkinsComponents(species, dbh)
+
+
+    @staticmethod
+    def _jenkinsComponents(species, dbh):
+
+        # total above ground biomass is worked out once and shared by every ratio
+        dbhCm = dbh * 2.54
+        total = math.exp(species.jenkins_total_b1 + species.jenkins_total_b2 * math.log(dbhCm)) * 2.2046
+        stem = total * math.exp(species.jenkins_stem_wood_ratio_b1 + species.jenkins_stem_wood_ratio_b2 / dbhCm)
+        bark = total * math.exp(species.jenkins_stem_bark_ratio_b1 + species.jenkins_stem_bark_ratio_b2 / dbhCm)
+        foliage = total * math.exp(species.jenkins_foliage_ratio_b1 + species.jenkins_foliage_ratio_b2 / dbhCm)
+        root = total * math.exp(species.jenkins_root_ratio_b1 + species.jenkins_root_ratio_b2 / dbhCm)
+
+        return Jenkins_Biomass(total, stem, bark, stem + bark, foliage, root)
+
+
     def _calcStemBiomassJenkinsLbs(self, species, dbh):
         return self._calcTotalAGBioMassJenkins(species, dbh) * self._calcStemRatio(species, dbh)
 
@@ -178,7 +614,7 @@ class Component_Ratio_Method(object):
 
 
     def _calcBoleBiomassJenkinsLbs(self, species, dbh):
-        return self._calcStemBiomassJenkinsLbs(species, dbh) + self._calcBarkBiomassJenkinsLbs(species, dbh)
+        return self._calcJenkinsComponentsLbs(species, dbh).bole
 
 
     def _calcFoliageBiomassJenkinsLbs(self, species, dbh):
@@ -189,6 +625,133 @@ class Component_Ratio_Method(object):
         return self._calcTotalAGBioMassJenkins(species, dbh) * self._calcRootRatio(species, dbh)
 
 
+    def _requireNumpy(self):
+        if np == None:
+            raise Exception('NumPy is required for batch calculations.')
+
+
+    def _getSpeciesCoefficientArrays(self, species_cds, columns):
+
+        # looks up each distinct species once and spreads its coefficients over the batch
+        codes, inverse = np.unique(species_cds, return_inverse=True)
+        coefficients = np.empty((len(columns), codes.size))
+        for idx, species_cd in enumerate(codes.tolist()):
+            species = self._getSpeciesData(species_cd)
+            for row, column in enumerate(columns):
+                coefficients[row, idx] = getattr(species, column)
+
+        return coefficients[:, inverse.reshape(-1)]
+
+
+    def getJenkinsBiomassBatch(self, species_cds, dbhs):
+        self._requireNumpy()
+
+        species_cds = np.asarray(species_cds, dtype=np.int64).reshape(-1)
+        dbhs = np.asarray(dbhs, dtype=np.float64).reshape(-1)
+
+        # checks for proper data types
+        if species_cds.shape != dbhs.shape:
+            raise Exception('Species codes and DBH must be the same length.')
+        if np.any(dbhs < 0):
+            raise Exception('DBH must be > 0.')
+
+        return self._jenkinsArrays(self._getSpeciesCoefficientArrays(species_cds, JENKINS_COEFFICIENT_COLUMNS), dbhs)
+
+
+    def _jenkinsArrays(self, coefficients, dbhs):
+        (total_b1, total_b2,
+         stem_b1, stem_b2,
+         bark_b1, bark_b2,
+         foliage_b1, foliage_b2,
+         root_b1, root_b2) = coefficients
+
+        dbhCm = dbhs * 2.54
+        total = np.exp(total_b1 + total_b2 * np.log(dbhCm)) * 2.2046
+        stem = total * np.exp(stem_b1 + stem_b2 / dbhCm)
+        bark = total * np.exp(bark_b1 + bark_b2 / dbhCm)
+
+        return {
+            'total_ag': total,
+            'stem': stem,
+            'bark': bark,
+            'bole': stem + bark,
+            'foliage': total * np.exp(foliage_b1 + foliage_b2 / dbhCm),
+            'root': total * np.exp(root_b1 + root_b2 / dbhCm)
+        }
+
+
+    def getStumpBiomassBatch(self, species_cds, dbhs, adjustment_factors=1.0):
+        self._requireNumpy()
+
+        species_cds = np.asarray(species_cds, dtype=np.int64).reshape(-1)
+        dbhs = np.asarray(dbhs, dtype=np.float64).reshape(-1)
+
+        # checks for proper data types
+        if species_cds.shape != dbhs.shape:
+            raise Exception('Species codes and DBH must be the same length.')
+        if np.any(dbhs < 0):
+            raise Exception('DBH must be > 0.')
+
+        stumpFactor, = self._getSpeciesCoefficientArrays(species_cds, ['stump_biomass_factor'])
+
+        # the Jenkins stump unless the factors from getComponentRatioBatch are given
+        return dbhs * dbhs * stumpFactor * adjustment_factors
+
+
+    def getComponentRatioBatch(self, species_cds, region_ids,
+                               dbh=None,
+                               height=None,
+                               basal_area=None,
+                               site_index=None,
+                               stem_count=None,
+                               drc=None,
+                               bole_hgt=None):
+        self._requireNumpy()
+
+        # gross volume and every Jenkins and component ratio column in one pass, NaN in the component ratio
+        # columns where the volume is NaN
+        species_cds = np.asarray(species_cds, dtype=np.int64).reshape(-1)
+        volcfgrs = self.getVOLCFGRSBatch(species_cds, region_ids, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt)
+
+        results = self._componentRatioArrays(species_cds, self._batchColumn(dbh, species_cds.size), volcfgrs)
+        results['volcfgrs'] = volcfgrs
+        return results
+
+
+    def _componentRatioArrays(self, species_cds, dbhs, volcfgrs):
+        self._requireNumpy()
+
+        species_cds = np.asarray(species_cds, dtype=np.int64).reshape(-1)
+        dbhs = np.asarray(dbhs, dtype=np.float64).reshape(-1)
+        volcfgrs = np.asarray(volcfgrs, dtype=np.float64).reshape(-1)
+
+        # checks for proper data types
+        if species_cds.shape != dbhs.shape or species_cds.shape != volcfgrs.shape:
+            raise Exception('Species codes, DBH and gross volume must be the same length.')
+        if np.any(dbhs < 0):
+            raise Exception('DBH must be > 0.')
+
+        # each species is looked up once for every coefficient the chain needs
+        coefficients = self._getSpeciesCoefficientArrays(species_cds, JENKINS_COEFFICIENT_COLUMNS +
+                                                         ('stump_biomass_factor', 'bole_biomass_factor'))
+        results = self._jenkinsArrays(coefficients[:len(JENKINS_COEFFICIENT_COLUMNS)], dbhs)
+        stumpFactor, boleFactor = coefficients[len(JENKINS_COEFFICIENT_COLUMNS):]
+
+        total = results['total_ag']
+        foliage = results['foliage']
+        jenkinsStump = dbhs * dbhs * stumpFactor
+        boleBiomass = volcfgrs * boleFactor
+        factor = boleBiomass / results['bole']
+
+        results['adjustment_factor'] = factor
+        results['bole_crm'] = boleBiomass
+        results['stump'] = jenkinsStump * factor
+        results['top'] = (total - results['bole'] - foliage - jenkinsStump) * factor
+        results['foliage_crm'] = foliage * factor
+        results['total_ag_crm'] = total * factor
+        return results
+
+
     def _stumpVolumeEquation(self, a, b, height):
         value =  math.pow((a - b), 2) * height
         value += (11 * b)*(a - b) * math.log( height + 1)
@@ -200,176 +763,182 @@ class Component_Ratio_Method(object):
     def _calcStumpVolumeOutsideBark(self, species, dbh):
 
         # checks for proper data types
-        self._isPositiveNumber('DBH', dbh)
-        self._isNumber('Raile Stump DOB B1', species['raile_stump_dob_b1'])
+        if self.validate:
+            self._isPositiveNumber('DBH', dbh)
+            self._isNumber('Raile Stump DOB B1', species.raile_stump_dob_b1)
 
-        scaler = ( math.pi * ( math.pow( dbh ,2 ) )) / 576.0
-        upperLimit = self._stumpVolumeEquation( 1.0, species['raile_stump_dob_b1'], 1.0)
-        lowerLimit = self._stumpVolumeEquation( 1.0, species['raile_stump_dob_b1'], 0.0)
-
-        return scaler * ( upperLimit - lowerLimit )
+        return dbh * dbh * species.stump_dob_factor
 
     
     def _calcStumpVolumeInsideBark(self, species, dbh):
 
         # checks for proper data types
-        self._isPositiveNumber('DBH', dbh)
-        self._isNumber('Raile Stump DIB B1', species['raile_stump_dib_b1'])
-        self._isNumber('Raile Stump DIB B2', species['raile_stump_dib_b2'])
+        if self.validate:
+            self._isPositiveNumber('DBH', dbh)
+            self._isNumber('Raile Stump DIB B1', species.raile_stump_dib_b1)
+            self._isNumber('Raile Stump DIB B2', species.raile_stump_dib_b2)
+
+        return dbh * dbh * species.stump_dib_factor
+
+
+    def _calcBoleBiomassLbs(self, species, volcfgrs):
+
+        # checks for proper data types
+        if self.validate:
+            self._isNumber('Gross Volume', volcfgrs)
+            self._isNumber('Wood Specific Gravity', species.wood_spgr_greenvol_drywt)
+            self._isNumber('Bark Specific Gravity', species.bark_spgr_greenvol_drywt)
+            self._isNumber('Bark Volume Percent', species.bark_vol_pct)
 
-        scaler = ( math.pi * ( math.pow( dbh ,2 ) )) / 576.0
-        upperLimit = self._stumpVolumeEquation( species['raile_stump_dib_b1'], species['raile_stump_dib_b2'], 1.0)
-        lowerLimit = self._stumpVolumeEquation( species['raile_stump_dib_b1'], species['raile_stump_dib_b2'], 0.0)
+        return volcfgrs * species.bole_biomass_factor
 
-        return scaler * ( upperLimit - lowerLimit )
 
+    def _calcComponentRatioAdjustmentFactor(self, boleBiomass, jenkinsBole):
 
-    def _calcComponentRatioAdjustmentFactor(self):
-        # TODO implement this method
-        return 0
+        # the Jenkins components are scaled so the bole matches the one from volume and specific gravity
+        return boleBiomass / jenkinsBole
 
 
-    def _calcStumpBiomassLbs(self, species, dbh):
+    def _calcStumpBiomassLbs(self, species, dbh, adjustmentFactor=1.0):
 
-        woodSPGravity = species['wood_spgr_greenvol_drywt']
-        barkSPGravity = species['bark_spgr_greenvol_drywt']
-        volInsideBark = self._calcStumpVolumeInsideBark(species, dbh)
-        volOutsideBark = self._calcStumpVolumeOutsideBark(species, dbh)
-        stumpWoodBioMass = volInsideBark * woodSPGravity * self.WATER_WEIGHT
-        stumpBarkBioMass = (volOutsideBark - volInsideBark) * barkSPGravity * self.WATER_WEIGHT
+        # checks for proper data types
+        if self.validate:
+            self._isPositiveNumber('DBH', dbh)
+            self._isNumber('Raile Stump DOB B1', species.raile_stump_dob_b1)
+            self._isNumber('Raile Stump DIB B1', species.raile_stump_dib_b1)
+            self._isNumber('Raile Stump DIB B2', species.raile_stump_dib_b2)
+            self._isNumber('Wood Specific Gravity', species.wood_spgr_greenvol_drywt)
+            self._isNumber('Bark Specific Gravity', species.bark_spgr_greenvol_drywt)
 
-        # TODO add parameters to _calcComponentRatioAdjustmentFactor 
-        return ( stumpWoodBioMass + stumpBarkBioMass ) * self._calcComponentRatioAdjustmentFactor()
+        # inside bark wood and the bark shell, weighted by specific gravity, folded into one factor at load,
+        # the Jenkins stump unless an adjustment factor is given
+        return dbh * dbh * species.stump_biomass_factor * adjustmentFactor
 
 
-    def _calcTopBiomassJenkinsLbs(self, species, dbh, height):
-        return (self._calcTotalAGBioMassJenkins(species, dbh)  - 
-                self._calcStemBiomassJenkinsLbs(species, dbh)  - 
-                self._calcBarkBiomassJenkinsLbs(species, dbh)  -
-                self._calcFoliageBiomassJenkinsLbs(species, dbh) - 
-                self._calcStumpBiomassLbs(species, dbh, height))
+    def _calcTopBiomassJenkinsLbs(self, species, dbh, adjustmentFactor=1.0):
+        components = self._calcJenkinsComponentsLbs(species, dbh)
+        return (components.total_ag - 
+                components.bole -
+                components.foliage - 
+                self._calcStumpBiomassLbs(species, dbh)) * adjustmentFactor
 
 
-    def getVOLCFGRS(self, species, region_id, 
-                    dbh=None, 
-                    height=None, 
-                    basal_area=None, 
-                    site_index=None,
-                    stem_count=None,
-                    drc=None,
-                    bole_hgt=None):
+    def _calcComponentRatioBiomass(self, species, dbh, volcfgrs, components=None):
+
+        # the whole chain for one tree from its gross volume, pass the Jenkins components when they are already known
+        if components == None:
+            components = self._calcJenkinsComponentsLbs(species, dbh)
+
+        # checks for proper data types
+        if self.validate:
+            self._isNumber('Gross Volume', volcfgrs)
+            self._isNumber('Raile Stump DOB B1', species.raile_stump_dob_b1)
+            self._isNumber('Raile Stump DIB B1', species.raile_stump_dib_b1)
+            self._isNumber('Raile Stump DIB B2', species.raile_stump_dib_b2)
+            self._isNumber('Wood Specific Gravity', species.wood_spgr_greenvol_drywt)
+            self._isNumber('Bark Specific Gravity', species.bark_spgr_greenvol_drywt)
+            self._isNumber('Bark Volume Percent', species.bark_vol_pct)
 
-        volcfgrs = None # holds the value to be returned
-        adjGrossVolSpeciesId = self._getGrossVolConfigSpeciesCode(species['species_cd'], region_id )
-        coefficients = self._getGrossVolCoeff(species['species_cd'], region_id)
-
-        b0 = coefficients['b0']
-        b1 = coefficients['b1']
-        b2 = coefficients['b2']
-        b3 = coefficients['b3']
-        b4 = coefficients['b4']
-        b5 = coefficients['b5']
-        b6 = coefficients['b6']
-        b7 = coefficients['b7']
-        b8 = coefficients['b8']
-        b9 = coefficients['b9']
-        b10 = coefficients['b10']
-        b11 = coefficients['b11']
-        b12 = coefficients['b12']
-        b13 = coefficients['b13']
-        b14 = coefficients['b14']
-        b15 = coefficients['b15']
-        b16 = coefficients['b16']
-        b17 = coefficients['b17']
-        b18 = coefficients['b18']
-        b19 = coefficients['b19']
+        return self._componentRatio(species, dbh, volcfgrs, components)
+
+
+    @staticmethod
+    def _componentRatio(species, dbh, volcfgrs, components):
+
+        # the Jenkins stump, the bole from volume and the factor are each worked out once and shared
+        jenkinsStump = dbh * dbh * species.stump_biomass_factor
+        boleBiomass = volcfgrs * species.bole_biomass_factor
+        factor = boleBiomass / components.bole
+
+        return Component_Ratio_Biomass(factor, boleBiomass, jenkinsStump * factor,
+                                       (components.total_ag - components.bole - components.foliage - jenkinsStump) * factor,
+                                       components.foliage * factor, components.total_ag * factor)
+
+
+    def _getGrossVolDispatchEntry(self, region_id, adjGrossVolSpeciesId):
+        equation = self._selectGrossVolEquation(region_id, adjGrossVolSpeciesId)
+
+        # rows the tables list without a formula come back as _volUndefined with their own label
+        if isinstance(equation, tuple):
+            return equation
+
+        # _volTable3Row11 -> Table 3 Row 11
+        match = re.match(r'_volTable(\d+)Row(\d+)$', equation.__name__)
+        if match == None:
+            return (equation, 'Undefined')
+
+        return (equation, 'Table {0} Row {1}'.format(*match.groups()))
+
+
+    def enableEquationTrace(self):
+        if self.equationTrace == None:
+            self.equationTrace = collections.Counter()
+
+
+    def disableEquationTrace(self):
+        self.equationTrace = None
+
+
+    def getEquationTrace(self):
+        if self.equationTrace == None:
+            return {}
+        return dict(self.equationTrace)
+
+
+    def enableInstrumentation(self):
+        if self.instrumentation == None:
+            from instrumentation import Instrumentation
+            self.instrumentation = Instrumentation(self)
+            self.instrumentation.install()
+        return self.instrumentation
+
+
+    def disableInstrumentation(self):
+        if self.instrumentation != None:
+            self.instrumentation.uninstall()
+            self.instrumentation = None
+
+
+    def getInstrumentation(self):
+        if self.instrumentation == None:
+            return {}
+        return self.instrumentation.asDict()
+
+
+    def _selectGrossVolEquation(self, region_id, adjGrossVolSpeciesId):
 
         # Northeastern States (CT,DE,ME,MD,MA,NH,NJ,NY,OH,PA,RI,VT,WV) Table 1
         # Table 1 Row 5
         if region_id == 'S24':
-
-            if bole_hgt != None:
-                volcfgrs = b0 + b1 * math.pow(dbh, b2)
-                volcfgrs += b3 * math.pow(dbh, b4) * math.pow(bole_hgt, b5)
-
-            else:
-                raise Exception('Northeast States requires bole height.')
+            return self._volTable1Row5
 
         # Southern States (AL,AR,FL,GA,KY,LA,MS,NC,OK,SC,TN,TX,VA) Table 2
         elif region_id == 'S33':
 
-            if height == None:
-                raise Exception('Height is required for southern states.')
-
             # Table 2 Row 1
             if adjGrossVolSpeciesId not in [58, 59, 69, 106, 140, 
                                             141, 61, 63, 66, 303,
                                             321, 755, 756, 758, 810,
                                             843, 846, 867, 8513, 122, 202]:
-
-                print('Table 2 Row 1')
-                if dbh == None:
-                    raise Exception('DBH is not provided.')
-
-                if dbh > 5.0 and height != None:
-                    volcfgrs = b0 + b1 * math.pow(dbh, 2.0) * height
+                return self._volTable2Row1
 
             # Table 2 Row 2
             elif adjGrossVolSpeciesId in [58, 59, 69, 106, 140, 141]:
-
-                print('Table 2 Row 2')
-                if dbh == None:
-                    raise Exception('Diameter at root collar is not provided.')
-
-                v1 = math.pow(drc, 2.0) * height * 0.001
-                
-                volcfgrs = b0 + b1 * v1
-                if v1 <= b3:
-                    volcfgrs += b2 * math.pow(v1,2.0)
-                else:
-                    volcfgrs += b2 * ((3.0 * math.pow(b3, 2.0)) - (2.0 * math.pow(b3, 3.0)) / v1 )
-
-                if volcfgrs <= 0.0:
-                    volcfgrs = 0.1
+                return self._volTable2Row2
 
             # Table 2 Row 3
             elif adjGrossVolSpeciesId in [61, 63, 66, 303, 321,
                                           755, 756, 758, 810, 843, 
                                           846, 867, 8513]:
-
-                print('Table 2 Row 3')
-                v1 = math.pow(drc, 2.0) * height * 0.001
-                if v1 <= b6:
-                    volcfgrs = b1 * b2 * v1 + b3 * math.pow(v1, 2.0)
-                else:
-                    volcfgrs = b4 * b2 * v1 - ( b5 / v1 )
-
-                if volcfgrs <= 0.0:
-                    volcfgrs = 0.1
+                return self._volTable2Row3
 
             # Table 2 Row 4
             elif adjGrossVolSpeciesId == 122:
-
-                print('Table 2 Row 4')
-                if dbh < 21.0:
-                    volcfgrs = b1 + b2 * math.pow(dbh, 2.0) * height
-                    volcfgrs -= b3 + b4 * ((64.0 * height)/math.pow(dbh, b5)) + b6 * math.pow(dbh, 2.0)
-                else:
-                    volcfgrs = b7 + b8 * math.pow(dbh, 2.0 ) * height
-                    volcfgrs -= b9 + b10 * ((64.0 * height)/math.pow(dbh, b11)) + b12 * math.pow(dbh, 2.0)
-                
-                if volcfgrs <= 0.0 and dbh >= 1.0:
-                    volcfgrs = 0.1
+                return self._volTable2Row4
 
             # Table 2 Row 5
             elif adjGrossVolSpeciesId == 202:
-
-                print('Table 2 Row 5')
-                volcfgrs = b1 + b2 * math.pow(dbh, 2.0) * height
-                volcfgrs -= b3 + b4 * ((64.0 * height)/math.pow(dbh, b5)) + b6 * math.pow(dbh, 2.0)
-
-                if volcfgrs <= 0.0 and dbh >= 1.0:
-                    volcfgrs = 0.1
+                return self._volTable2Row5
 
             else:
                 raise Exception("Unknown equation for region and species!")
@@ -380,75 +949,19 @@ class Component_Ratio_Method(object):
             # Table 1 Row 1
             if (( region_id in ['S23LCS', 'S23LPS'] and adjGrossVolSpeciesId not in [66, 122] ) 
                     or ( region_id == 'S23LCS' and adjGrossVolSpeciesId == 122 ) ):
-
-                print('Table 1 Row 1')
-                if dbh == None or site_index == None:
-                    raise Exception('DBH and Site Index are needed.')
-
-                volcfgrs = b1 * math.pow(site_index, b2) * (1.0 - math.pow(math.e, b3 * math.pow(dbh, b4)))
-
-                if volcfgrs < 0.0:
-                    volcfgrs = 0.0
+                return self._volTable1Row1
 
             # Table 1 Row 2
             elif region_id == 'S23LLS' and adjGrossVolSpeciesId != 66:
-
-                print('Table 1 Row 2')
-                if dbh == None or site_index == None or basal_area == None:
-                    raise Exception('DBH, Site Index, and Basal Area are needed.')
-
-                if site_index < 20.0:
-                    site_index = 20.0
-                
-                if site_index > 120.0:
-                    site_index = 120.0
-
-                if basal_area < 50.0:
-                    basal_area = 50.0
-
-                if basal_area > 350.0:
-                    basal_area = 350.0
-
-                v1 = 4.0 
-                v2 = b13 * math.pow(1.0 - math.pow(math.e, (-1 * b14 * dbh)), b15 )
-                v2 *= math.pow(site_index, b16)
-                v2 *= math.pow(b17 - ( v1 / dbh ), b18) * math.pow(basal_area, b19)
-                v2 += b12
-
-                if volcfgrs < 0.0:
-                    volcfgrs = 0.0
+                return self._volTable1Row2
 
             # Table 1 Row 4
             elif region_id == 'S23LPS' and adjGrossVolSpeciesId == 122:
-                print('Table 1 Row 4')
-                if dbh == None or site_index == None:
-                    raise Exception('DBH and Site Index are needed.')
-
-                if math.pow(dbh, 2.0) * height <= b1:
-                    volcfgrs = b2 + b3 * math.pow(dbh, 2.0) * height
-
-                elif math.pow(dbh, 2.0) * height > b1:
-                    volcfgrs = b4 + b5 * math.pow(dbh, 2.0) * height
-
-                if volcfgrs <= 0.0:
-                    volcfgrs = 0.1
+                return self._volTable1Row4
 
             # Table 1 Row 3
             elif adjGrossVolSpeciesId == 66:
-
-                print('Table 1 Row 3')
-                if dbh == None or site_index == None:
-                    raise Exception('Diameter at root collar and Site Index are needed.')
-
-                v1 = math.pow(drc, 2.0) * height * 0.001
-                volcfgrs = b0 + b1 * v1
-                if v1 <= b3:
-                    volcfgrs += b2 * math.pow(v1, 2.0)
-                else:
-                    volcfgrs += b2 * (3.0 * math.pow(b3, 2.0) - (( 2.0 * math.pow(b3, 3.0))/ v1))
-
-                if volcfgrs <= 0.0:
-                    volcfgrs = 0.1
+                return self._volTable1Row3
 
             else:
                 raise Exception("Unknown equation for region and species!")
@@ -471,16 +984,7 @@ class Component_Ratio_Method(object):
                                                   114, 142, 202, 351, 352, 
                                                   353, 374, 375, 746] )) 
                   or ( adjGrossVolSpeciesId == 103 )) :
-
-                print('Table 3 Row 1')
-                if dbh == None or height == None:
-                    raise Exception('DBH and height are needed.')
-
-                volcfgrs = b1 + b2 * math.pow(dbh, 2.0) * height
-                volcfgrs -= b3 + b4 * ((64.0 * height) / math.pow(dbh, b5)) + b6 * math.pow( dbh, 2.0)
-
-                if volcfgrs <= 0 and dbh >= 1.0:
-                    volcfgrs = 0.1
+                return self._volTable3Row1
 
             # Table 3 Row 2
             elif ((( region_id in ['S22LCOE', 'S22LCOW', 'S22LNV', 'S22LUTNE', 'S22LWYE', 'S22LWYW'] )
@@ -495,19 +999,7 @@ class Component_Ratio_Method(object):
                           
                     or ((region_id in ['S22LCOE', 'S22LCOW', 'S22LNV','S22LWYE', 'S22LWYW'])
                          and (adjGrossVolSpeciesId == 104 ))):
-
-                print('Table 3 Row 2')
-                if dbh == None or height == None:
-                    raise Exception('DBH and height are needed.')
-
-                if math.pow(dbh, 2.0) * height <= b5:
-                    volcfgrs = b1 + b2 * math.pow(dbh, 2.0) * height
-
-                elif math.pow(dbh, 2.0) * height > b5:
-                    volcfgrs = b3 + b4 * math.pow(dbh, 2.0) * height
-
-                if volcfgrs <= 0 and dbh >= 1.0:
-                    volcfgrs = 0.1
+                return self._volTable3Row2
 
             # Table 3 Row 3
             elif ((( region_id in ['S22LID', 'S22LMTE', 'S22LMTW'] )
@@ -523,18 +1015,7 @@ class Component_Ratio_Method(object):
                                         'S22LMTE', 'S22LMTW', 'S22LNMS',
                                         'S22LNV', 'S22LWYW'] )
                           and ( adjGrossVolSpeciesId in [117, 119] ))):
-
-                print('Table 3 Row 3')
-                if dbh == None or height == None:
-                    raise Exception('DBH and height are needed.')
-
-                v1 = b5 * math.pow(dbh, b6) * math.pow(height, b7)
-                v2 = 4.0
-
-                volcfgrs = v1 - (v1 * ( b1 * (math.pow(v2 / b2, b3) / math.pow(dbh, b4))))
-
-                if volcfgrs <= 0:
-                    volcfgrs = 0.1
+                return self._volTable3Row3
 
             # Table 3 Row 4
             elif (((region_id in ['S22LID', 'S22LMTE', 'S22LMTW'] )
@@ -549,73 +1030,22 @@ class Component_Ratio_Method(object):
                           and ( adjGrossVolSpeciesId in [242, 263, 264] ))
 
                     or ( adjGrossVolSpeciesId in [741, 742, 745, 747, 748, 749] )):
-
-                print('Table 3 Row 4')
-                if dbh == None or height == None:
-                    raise Exception('DBH and height are needed.')
-
-                if math.pow(dbh, 2.0) * height <= b5 or (dbh < 21.0 and b5 == 0):
-                    volcfgrs = b1 + b2 * math.pow(dbh, 2.0) * height
-                else:
-                    b3 + b4 * math.pow(dbh, 2.0) * height
-
-                if volcfgrs <= 0:
-                    volcfgrs = 0.1
+                return self._volTable3Row4
 
             # Table 3 Row 5
             elif (((region_id in ['S22LAZN', 'S22LAZS', 'S22LNMN', 'S22LNMS', 'S22LUTSW'])
                      and ( adjGrossVolSpeciesId in [51, 112, 116, 118, 122, 135, 137, 231] ))):
-                
-                print('Table 3 Row 5')
-                if dbh == None or height == None:
-                    raise Exception('DBH and height are needed.')
-
-                if dbh < 21.0:
-                    volcfgrs = b1 + b2 * math.pow(dbh, 2.0) * height
-                    volcfgrs -= b3 + b4 * ((64.0 * height) / math.pow(dbh, b5)) + b6 * math.pow(dbh, 2.0)
-                else:
-                    volcfgrs = b7 + b8 * math.pow(dbh, 2.0) * height
-                    volcfgrs -= b9 + b10 * ((64.0 * height) / math.pow(dbh, b11)) + b12 * math.pow(dbh, 2.0)
-
-                if volcfgrs <= 0 and dbh >= 1.0:
-                    volcfgrs = 0.1                  
+                return self._volTable3Row5
 
             # Table 3 Row 6
             elif (((region_id in ['S22LCOW', 'S22LNV', 'S22LUTNE', 'S22LWYW'])
                      and ( adjGrossVolSpeciesId in [51, 112, 116, 118, 122, 135, 137, 231] ))):
-                
-                print('Table 3 Row 6')
-                if dbh == None or height == None:
-                    raise Exception('DBH and height are needed.')
-
-                if dbh > 5.0:
-                    volcfgrs = b0 + b1 * math.pow(dbh, 2.0) * height
-
-                if volcfgrs <= 0 and volcfgrs != None:
-                    volcfgrs = 0.1                
+                return self._volTable3Row6
 
             # Table 3 Row 8
             elif (((region_id in ['S22LID', 'S22LMTE', 'S22LMTW', 'S22LNV'])
                      and ( adjGrossVolSpeciesId == 64 ))):
-
-                print('Table 3 Row 8')
-                if dbh == None or height == None:
-                    raise Exception('DBH and height are needed.')
-
-                if dbh > 60.0:
-                    dbh = 60.0
-                
-                v1_1 = (b9 * dbh * height) / (height + b10)
-                v1_2 = height * math.pow( height / (height + b10), 2.0)
-                v1 = b6 * math.pow(dbh, 2.0) * (b7 + b8 * height - v1_1 ) * v1_2
-
-                if v1 <= 0.0:
-                    v1 = 2.0
-                
-                volcfgrs = ((v1 + b1) / ( b2 + b3 * math.pow(math.e, b4 * dbh))) + b5
-
-                if volcfgrs <= 0:
-                    volcfgrs = 1.0
+                return self._volTable3Row8
 
             # Table 3 Row 11
             elif (((region_id in ['S22LAZN', 'S22LAZS', 'S22LNMN', 'S22LNMS'] )
@@ -623,93 +1053,29 @@ class Component_Ratio_Method(object):
 
                      or ( adjGrossVolSpeciesId in [756, 757, 758, 803, 810,
                                                    829, 843, 846, 847] )):
-                
-                print('Table 3 Row 11')
-                if drc == None or height == None:
-                    raise Exception('Diameter at root collar and height are needed.')
-
-                v1 = math.pow(drc, 2.0) * height * 0.001
-                if v1 <= b6:
-                    volcfgrs = b1 + b2 * v1 + b3 * math.pow(v1, 2.0)
-                else:
-                    volcfgrs = b4 + b2 * v1 - (b5 / v1)
-
-                if volcfgrs <= 0:
-                    volcfgrs = 0.1
+                return self._volTable3Row11
 
             # Table 3 Row 12
             elif ((region_id in ['S22LCOE', 'S22LCOW', 'S22LID', 'S22LMTE', 'S22LMTW',
                                   'S22LNV', 'S22LUTNE', 'S22LUTSW','S22LWYE', 'S22LWYW'])
                      and ( adjGrossVolSpeciesId in [322, 814] )):
-                
-                print('Table 3 Row 12')
-                if drc == None or height == None or stem_count == None:
-                    raise Exception('Diameter at root collar, height and # of stems are needed.')
-
-                if drc >= 3.0 and height > 0.0 and stem_count == 1:
-                    volcfgrs = math.pow((b0 + b1 * math.pow(math.pow(drc, 2.0) * height, b2) + b3 ), 3.0)
-                        
-                elif drc >= 3.0 and height > 0.0 and stem_count != 1:
-                    volcfgrs = math.pow((b0 + b1 * math.pow(math.pow(drc, 2.0) * height, b2)), 3.0)
-
-                else:
-                    volcfgrs = 0
-
-                if volcfgrs <= 0:
-                    volcfgrs = 0.1
+                return self._volTable3Row12
 
             # Table 3 Row 7
             elif adjGrossVolSpeciesId in [58, 59, 62, 63, 65, 
                                           66, 69, 106, 134, 140, 143]:
-                
-                print('Table 3 Row 7')
-                if drc == None or height == None:
-                    raise Exception('Diameter at root collar and height are needed.')
-
-                v1 = math.pow(drc, 2.0) * height * 0.001
-                volcfgrs = b0 + b1 * v1 + b2
-                if v1 <= b3:
-                    volcfgrs += b2 * math.pow(v1, 2.0)
-                else:
-                    volcfgrs += b2 * (3.0 * math.pow(b3, 2.0) - ((2.0 * math.pow(b3, 3.0))/v1 ))
-
-                if volcfgrs <= 0:
-                    volcfgrs = 0.1
+                return self._volTable3Row7
 
             # Table 3 Row 9
             elif adjGrossVolSpeciesId in [68, 130, 136, 313, 361, 
                                           362, 404, 461, 462, 492, 
                                           544, 547, 552, 602, 606, 
                                           732, 823, 826, 901, 972, 974]:
-                
-                print('Table 3 Row 9')
-                if dbh == None:
-                    raise Exception('DBH is needed.')
-
-                if (adjGrossVolSpeciesId < 300 and dbh < 9.0) or (adjGrossVolSpeciesId >= 300 and dbh < 11.0):
-                    volcfgrs = b1 + b2 * math.pow(dbh, 2.0) * height
-                else:
-                    volcfgrs = b3 + b4 * math.pow(dbh, 2.0) * height
-
-                if volcfgrs <= 0 or height == None or dbh < 5.0:
-                    volcfgrs = 0.1
+                return self._volTable3Row9
 
             # Table 3 Row 10
             elif adjGrossVolSpeciesId in [133, 475]:
-                
-                print('Table 3 Row 10')
-                if drc == None or height == None or stem_count == None:
-                    raise Exception('Diameter at root collar, height and # of stems are needed.')
-
-                if drc >= 3.0 and height > 0.0 and stem_count == 1:
-                    volcfgrs = math.pow((b0 + b1 * math.pow(math.pow(drc, 2.0) * height, b2) + b3 ), 3.0)
-                elif drc >= 3.0 and height > 0.0 and stem_count != 1:
-                    volcfgrs = math.pow((b0 + b1 * math.pow(math.pow(drc, 2.0) * height, b2)), 3.0)
-                else:
-                    volcfgrs = 0.1
-
-                if volcfgrs <= 0:
-                    volcfgrs = 0.1
+                return self._volTable3Row10
 
             else:
                 raise Exception("Unknown equation for region and species!")
@@ -759,17 +1125,7 @@ class Component_Ratio_Method(object):
 
                 or (( region_id == 'S26LCA')
                       and ( adjGrossVolSpeciesId == 611))):
-
-                print('Table 4 Row 1')
-                if dbh == None or height == None:
-                    raise Exception('DBH and height are needed.')
-                
-                a = math.pow(10.0, b1) * math.pow(dbh, b2) * math.pow(height, b3) * b4
-                b = b5 * (1.0 + b6 * math.pow(math.e, b7 * (dbh/10.0)))
-                c = (b8 * math.pow(dbh , 2.0) + b9) + b10
-                d = (b11 * math.pow(dbh , 2.0) - b9) / b4
-
-                volcfgrs = a / (b * c * d)
+                return self._volTable4Row1
 
             # Table 4 Row 2
             elif ((( region_id in ['S26LCA', 'S26LCAMIX'] )
@@ -780,21 +1136,7 @@ class Component_Ratio_Method(object):
 
                 or (( region_id in ['S26LCA', 'S26LCAMIX','S26LEOR', 'S26LWOR', 'S26LORJJ'])
                       and ( adjGrossVolSpeciesId == 21))):
-
-                print('Table 4 Row 2')
-                if dbh == None or height == None:
-                    raise Exception('DBH and height are needed.')
-
-                if dbh < 6.0:
-                    dbh = 6.0
-
-                v1 = b2 + b3 * (dbh / height)
-                if v1 > 0.4:
-                    v1 = 0.4
-                if v1 < 0.3:
-                    v1 = 0.3
-
-                volcfgrs = b1 * math.pow(dbh, 2.0) * height * v1
+                return self._volTable4Row2
 
             # Table 4 Row 3
             elif ((( region_id in ['S26LCA', 'S26LCAMIX','S26LWOR', 'S26LORJJ'] )
@@ -802,21 +1144,7 @@ class Component_Ratio_Method(object):
 
                 or (( region_id in ['S26LCA', 'S26LCAMIX'])
                       and ( adjGrossVolSpeciesId == 17))):
-
-                print('Table 4 Row 3')
-                if dbh == None or height == None:
-                    raise Exception('DBH and height are needed.')
-
-                if dbh < 6.0:
-                    dbh = 6.0
-
-                v1 = b2 + b3 * math.pow(height, -1) + b4 * (math.pow(dbh, 2.0) / height)
-                if v1 > 0.4:
-                    v1 = 0.4
-                if v1 < 0.3:
-                    v1 = 0.3
-
-                volcfgrs = b1 * math.pow(dbh, 2.0) * height * v1
+                return self._volTable4Row3
 
             # Table 4 Row 4
             elif ((( region_id in ['S26LEOR', 'S26LWOR', 'S26LORJJ', 'S26LEWA', 'S26LWWA', 'S26LWACF'] )
@@ -832,19 +1160,7 @@ class Component_Ratio_Method(object):
                                     'S26LEOR', 'S26LWOR', 'S26LORJJ',
                                     'S26LEWA', 'S26LWWA', 'S26LWACF'])
                       and ( adjGrossVolSpeciesId == 81))):
-
-                print('Table 4 Row 4')
-                if dbh == None or height == None:
-                    raise Exception('DBH and height are needed.')
-
-                if dbh < 6.0:
-                    dbh = 6.0
-
-                v1 = b2 + b3 * math.pow(height, -1)
-                if v1 < 0.27:
-                    v1 = 0.27
-
-                volcfgrs = b1 * math.pow(dbh, 2.0) * height * v1
+                return self._volTable4Row4
 
             # Table 4 Row 5
             elif ((( region_id in ['S26LCA', 'S26LCAMIX', 'S26LEOR', 'S26LWOR', 'S26LORJJ'] )
@@ -854,46 +1170,14 @@ class Component_Ratio_Method(object):
                                     'S26LEOR', 'S26LWOR', 'S26LORJJ',
                                     'S26LEWA', 'S26LWWA', 'S26LWACF'])
                       and ( adjGrossVolSpeciesId in [133, 321, 475]))):
-
-                print('Table 4 Row 5')
-                if drc == None or height == None or stem_count == None:
-                    raise Exception('Diameter at root collar, height and # of stems are needed.')
-
-                if drc >= 3.0 and height > 0.0 and stem_count == 1:
-                    volcfgrs = math.pow((b0 + b1 * math.pow(math.pow(drc, 2.0) * height, b2) + b3 ), 3.0)
-                elif drc >= 3.0 and height > 0.0 and stem_count != 1:
-                    volcfgrs = math.pow((b0 + b1 * math.pow(math.pow(drc, 2.0) * height, b2)), 3.0)
-                else:
-                    volcfgrs = 0.1
-
-                if volcfgrs <= 0:
-                    volcfgrs = 0.1
+                return self._volTable4Row5
 
             # Table 4 Row 6
             elif ((( region_id in ['S26LCA', 'S26LCAMIX', 
                                     'S26LEOR', 'S26LWOR', 'S26LORJJ',
                                     'S26LEWA', 'S26LWWA', 'S26LWACF'])
                       and ( adjGrossVolSpeciesId == 64))):
-
-                print('Table 4 Row 6')
-                if dbh == None or height == None:
-                    raise Exception('DBH and height are needed.')
-
-                if dbh > 6.0:
-                    dbh = 6.0
-
-                a = (b9 * dbh * height) / (height + b10)
-                b = height * math.pow(height / (height + b10), 2.0)
-                c = b6 * math.pow(dbh, 2.0)
-                v1 = c * ( b7 + b8 * height - a ) * b
-
-                if v1 <= 0:
-                    v1 = 2.0
-
-                volcfgrs = ((v1 + b1) / (b2 + b3 * math.pow(math.e, b4 * dbh))) + b5
-
-                if volcfgrs <= 0:
-                    volcfgrs = 1.0
+                return self._volTable4Row6
             
             # Table 4 Row 7
             elif ((( region_id in ['S26LCA', 'S26LCAMIX'] )
@@ -902,9 +1186,7 @@ class Component_Ratio_Method(object):
                 or (( region_id in ['S26LCA', 'S26LCAMIX', 
                                     'S26LEOR', 'S26LWOR', 'S26LORJJ'])
                       and ( adjGrossVolSpeciesId == 120))):
-
-                # TODO implement the calculation here
-                print('Table 4 Row 7')
+                return self._volUndefined, 'Table 4 Row 7'
 
             # Table 4 Row 8
             elif ((( region_id in ['S26LCA', 'S26LCAMIX'] )
@@ -917,9 +1199,7 @@ class Component_Ratio_Method(object):
                                     'S26LEOR', 'S26LWOR', 'S26LORJJ',
                                     'S26LEWA', 'S26LWWA', 'S26LWACF'])
                       and ( adjGrossVolSpeciesId == 117))):
-
-                # TODO implement the calculation here
-                print('Table 4 Row 8')
+                return self._volUndefined, 'Table 4 Row 8'
 
             # Table 4 Row 9
             elif ((( region_id == 'S26LEOR' )
@@ -930,48 +1210,36 @@ class Component_Ratio_Method(object):
 
                 or (( region_id in ['S26LEOR', 'S26LEWA'])
                       and ( adjGrossVolSpeciesId == 202))):
-
-                # TODO implement the calculation here
-                print('Table 4 Row 9')
+                return self._volUndefined, 'Table 4 Row 9'
 
             # Table 4 Row 10
             elif (( region_id in ['S26LCA', 'S26LCAMIX']  )
                    and ( adjGrossVolSpeciesId in [201, 202])):
-
-                # TODO implement the calculation here
-                print('Table 4 Row 10')
+                return self._volUndefined, 'Table 4 Row 10'
 
              # Table 4 Row 11
             elif (( region_id in ['S26LWOR', 'S26LORJJ', 'S26LWWA', 'S26LWACF']  )
                    and ( adjGrossVolSpeciesId == 202)):
-
-                # TODO implement the calculation here
-                print('Table 4 Row 11')
+                return self._volUndefined, 'Table 4 Row 11'
 
              # Table 4 Row 12
             elif (( region_id in ['S26LCA', 'S26LCAMIX', 'S26LEOR', 'S26LWOR', 'S26LORJJ']  )
                    and ( adjGrossVolSpeciesId in [211, 212])):
-
-                # TODO implement the calculation here
-                print('Table 4 Row 12')
+                return self._volUndefined, 'Table 4 Row 12'
 
             # Table 4 Row 13
             elif (( region_id in ['S26LCA', 'S26LCAMIX', 
                                   'S26LEOR', 'S26LWOR', 'S26LORJJ',
                                   'S26LEWA', 'S26LWWA', 'S26LWACF'])
                    and ( adjGrossVolSpeciesId == 263)):
-
-                # TODO implement the calculation here
-                print('Table 4 Row 13')
+                return self._volUndefined, 'Table 4 Row 13'
 
             # Table 4 Row 14
             elif (( region_id in ['S26LCA', 'S26LCAMIX', 
                                   'S26LEOR', 'S26LWOR', 'S26LORJJ',
                                   'S26LEWA', 'S26LWWA', 'S26LWACF'])
                    and ( adjGrossVolSpeciesId in [264, 299])):
-
-                # TODO implement the calculation here
-                print('Table 4 Row 14')   
+                return self._volUndefined, 'Table 4 Row 14'
 
             # Table 4 Row 15
             elif (( region_id in ['S26LCA', 'S26LCAMIX', 'S26LEOR', 'S26LWOR', 'S26LORJJ'])
@@ -998,9 +1266,7 @@ class Component_Ratio_Method(object):
 
                 or ((region_id in ['S26LCA', 'S26LCAMIX', 'S26LORJJ'])
                     and adjGrossVolSpeciesId == 821)):
-
-                # TODO implement the calculation here
-                print('Table 4 Row 15')
+                return self._volUndefined, 'Table 4 Row 15'
 
             # Table 4 Row 16
             elif (( region_id in ['S26LEWA', 'S26LWWA', 'S26LWACF'])
@@ -1035,9 +1301,7 @@ class Component_Ratio_Method(object):
 
                 or ((region_id == 'S26LEWA')
                      and adjGrossVolSpeciesId == 818)):
-
-                # TODO implement the calculation here
-                print('Table 4 Row 16')
+                return self._volUndefined, 'Table 4 Row 16'
 
             # Table 4 Row 17
             elif (( region_id in ['S26LCA', 'S26LCAMIX'])
@@ -1045,9 +1309,7 @@ class Component_Ratio_Method(object):
                    
                 or (region_id == 'S26LCA')
                     and adjGrossVolSpeciesId == 511 ):
-
-                # TODO implement the calculation here
-                print('Table 4 Row 17')   
+                return self._volUndefined, 'Table 4 Row 17'
 
             # Table 4 Row 18
             elif (( region_id in ['S26LCA', 'S26LCAMIX'])
@@ -1059,9 +1321,7 @@ class Component_Ratio_Method(object):
                 or ((region_id in ['S26LCA', 'S26LCAMIX', 'S26LEOR', 'S26LEWA'])
                     and adjGrossVolSpeciesId == 990 )                
                 ):
-
-                # TODO implement the calculation here
-                print('Table 4 Row 18')
+                return self._volUndefined, 'Table 4 Row 18'
 
             # Table 4 Row 19
             elif ( region_id in ['S27LAK', 'S27LAK1AB', 'S27LAK1C', 'S27LAK2A', 'S27LAK2B',
@@ -1069,12 +1329,1027 @@ class Component_Ratio_Method(object):
                                  'S27LAK3E', 'S27LAK3F']):
                 raise Exception("Alaska is unsupported at this time.")
 
+            # no equation in Table 4, volume is left undefined
+            return self._volUndefined
+
         else:
             raise Exception("Unknown region!")
 
+
+    def getVOLCFGRS(self, species, region_id, 
+                    dbh=None, 
+                    height=None, 
+                    basal_area=None, 
+                    site_index=None,
+                    stem_count=None,
+                    drc=None,
+                    bole_hgt=None):
+
+        # a Species_Record, or the dict style species record callers have always been able to pass
+        species_cd = species['species_cd'] if isinstance(species, dict) else species.species_cd
+        adjGrossVolSpeciesId, b = self._getGrossVolSpeciesCodeAndCoeff(species_cd, region_id)
+
+        entry = self._grossVolDispatch.get((region_id, adjGrossVolSpeciesId))
+        if entry == None:
+            entry = self._getGrossVolDispatchEntry(region_id, adjGrossVolSpeciesId)
+            self._grossVolDispatch[(region_id, adjGrossVolSpeciesId)] = entry
+
+        equation, label = entry
+        if self.equationTrace != None:
+            self.equationTrace[label] += 1
+
+        return equation(b, adjGrossVolSpeciesId, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt)
+
+
+    @staticmethod
+    def _volUndefined(b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        return None
+
+
+    @staticmethod
+    def _volTable1Row1(b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1, b2, b3, b4 = b[:5]
+
+        if dbh == None or site_index == None:
+            raise Exception('DBH and Site Index are needed.')
+
+        volcfgrs = b1 * math.pow(site_index, b2) * (1.0 - math.pow(math.e, b3 * math.pow(dbh, b4)))
+
+        if volcfgrs < 0.0:
+            volcfgrs = 0.0
+
+        return volcfgrs
+
+
+    @staticmethod
+    def _volTable1Row2(b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b12, b13, b14, b15, b16, b17, b18, b19 = b[12:20]
+
+        if dbh == None or site_index == None or basal_area == None:
+            raise Exception('DBH, Site Index, and Basal Area are needed.')
+
+        if site_index < 20.0:
+            site_index = 20.0
+        
+        if site_index > 120.0:
+            site_index = 120.0
+
+        if basal_area < 50.0:
+            basal_area = 50.0
+
+        if basal_area > 350.0:
+            basal_area = 350.0
+
+        v1 = 4.0 
+        v2 = b13 * math.pow(1.0 - math.pow(math.e, (-1 * b14 * dbh)), b15 )
+        v2 *= math.pow(site_index, b16)
+        v2 *= math.pow(b17 - ( v1 / dbh ), b18) * math.pow(basal_area, b19)
+        v2 += b12
+
+        volcfgrs = v2
+        if volcfgrs < 0.0:
+            volcfgrs = 0.0
+
+        return volcfgrs
+
+
+    @staticmethod
+    def _volTable1Row3(b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1, b2, b3 = b[:4]
+
+        if dbh == None or site_index == None:
+            raise Exception('Diameter at root collar and Site Index are needed.')
+
+        v1 = math.pow(drc, 2.0) * height * 0.001
+        volcfgrs = b0 + b1 * v1
+        if v1 <= b3:
+            volcfgrs += b2 * math.pow(v1, 2.0)
+        else:
+            volcfgrs += b2 * (3.0 * math.pow(b3, 2.0) - (( 2.0 * math.pow(b3, 3.0))/ v1))
+
+        if volcfgrs <= 0.0:
+            volcfgrs = 0.1
+
+        return volcfgrs
+
+
+    @staticmethod
+    def _volTable1Row4(b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1, b2, b3, b4, b5 = b[:6]
+
+        if dbh == None or site_index == None:
+            raise Exception('DBH and Site Index are needed.')
+
+        volcfgrs = None
+        if math.pow(dbh, 2.0) * height <= b1:
+            volcfgrs = b2 + b3 * math.pow(dbh, 2.0) * height
+
+        elif math.pow(dbh, 2.0) * height > b1:
+            volcfgrs = b4 + b5 * math.pow(dbh, 2.0) * height
+
+        if volcfgrs <= 0.0:
+            volcfgrs = 0.1
+
+        return volcfgrs
+
+
+    @staticmethod
+    def _volTable1Row5(b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1, b2, b3, b4, b5 = b[:6]
+
+        if bole_hgt != None:
+            volcfgrs = b0 + b1 * math.pow(dbh, b2)
+            volcfgrs += b3 * math.pow(dbh, b4) * math.pow(bole_hgt, b5)
+
+        else:
+            raise Exception('Northeast States requires bole height.')
+
+        return volcfgrs
+
+
+    @staticmethod
+    def _volTable2Row1(b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1 = b[:2]
+
+        if height == None:
+            raise Exception('Height is required for southern states.')
+
+        if dbh == None:
+            raise Exception('DBH is not provided.')
+
+        volcfgrs = None
+        if dbh > 5.0 and height != None:
+            volcfgrs = b0 + b1 * math.pow(dbh, 2.0) * height
+
+        return volcfgrs
+
+
+    @staticmethod
+    def _volTable2Row2(b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1, b2, b3 = b[:4]
+
+        if height == None:
+            raise Exception('Height is required for southern states.')
+
+        if dbh == None:
+            raise Exception('Diameter at root collar is not provided.')
+
+        v1 = math.pow(drc, 2.0) * height * 0.001
+        
+        volcfgrs = b0 + b1 * v1
+        if v1 <= b3:
+            volcfgrs += b2 * math.pow(v1,2.0)
+        else:
+            volcfgrs += b2 * ((3.0 * math.pow(b3, 2.0)) - (2.0 * math.pow(b3, 3.0)) / v1 )
+
+        if volcfgrs <= 0.0:
+            volcfgrs = 0.1
+
+        return volcfgrs
+
+
+    @staticmethod
+    def _volTable2Row3(b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1, b2, b3, b4, b5, b6 = b[:7]
+
+        if height == None:
+            raise Exception('Height is required for southern states.')
+
+        v1 = math.pow(drc, 2.0) * height * 0.001
+        if v1 <= b6:
+            volcfgrs = b1 * b2 * v1 + b3 * math.pow(v1, 2.0)
+        else:
+            volcfgrs = b4 * b2 * v1 - ( b5 / v1 )
+
+        if volcfgrs <= 0.0:
+            volcfgrs = 0.1
+
+        return volcfgrs
+
+
+    @staticmethod
+    def _volTable2Row4(b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1, b2, b3, b4, b5, b6, b7, b8, b9, b10, b11, b12 = b[:13]
+
+        if height == None:
+            raise Exception('Height is required for southern states.')
+
+        if dbh < 21.0:
+            volcfgrs = b1 + b2 * math.pow(dbh, 2.0) * height
+            volcfgrs -= b3 + b4 * ((64.0 * height)/math.pow(dbh, b5)) + b6 * math.pow(dbh, 2.0)
+        else:
+            volcfgrs = b7 + b8 * math.pow(dbh, 2.0 ) * height
+            volcfgrs -= b9 + b10 * ((64.0 * height)/math.pow(dbh, b11)) + b12 * math.pow(dbh, 2.0)
+        
+        if volcfgrs <= 0.0 and dbh >= 1.0:
+            volcfgrs = 0.1
+
+        return volcfgrs
+
+
+    @staticmethod
+    def _volTable2Row5(b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1, b2, b3, b4, b5, b6 = b[:7]
+
+        if height == None:
+            raise Exception('Height is required for southern states.')
+
+        volcfgrs = b1 + b2 * math.pow(dbh, 2.0) * height
+        volcfgrs -= b3 + b4 * ((64.0 * height)/math.pow(dbh, b5)) + b6 * math.pow(dbh, 2.0)
+
+        if volcfgrs <= 0.0 and dbh >= 1.0:
+            volcfgrs = 0.1
+
+        return volcfgrs
+
+
+    @staticmethod
+    def _volTable3Row1(b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1, b2, b3, b4, b5, b6 = b[:7]
+
+        if dbh == None or height == None:
+            raise Exception('DBH and height are needed.')
+
+        volcfgrs = b1 + b2 * math.pow(dbh, 2.0) * height
+        volcfgrs -= b3 + b4 * ((64.0 * height) / math.pow(dbh, b5)) + b6 * math.pow( dbh, 2.0)
+
+        if volcfgrs <= 0 and dbh >= 1.0:
+            volcfgrs = 0.1
+
+        return volcfgrs
+
+
+    @staticmethod
+    def _volTable3Row2(b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1, b2, b3, b4, b5 = b[:6]
+
+        if dbh == None or height == None:
+            raise Exception('DBH and height are needed.')
+
+        volcfgrs = None
+        if math.pow(dbh, 2.0) * height <= b5:
+            volcfgrs = b1 + b2 * math.pow(dbh, 2.0) * height
+
+        elif math.pow(dbh, 2.0) * height > b5:
+            volcfgrs = b3 + b4 * math.pow(dbh, 2.0) * height
+
+        if volcfgrs <= 0 and dbh >= 1.0:
+            volcfgrs = 0.1
+
+        return volcfgrs
+
+
+    @staticmethod
+    def _volTable3Row3(b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1, b2, b3, b4, b5, b6, b7 = b[:8]
+
+        if dbh == None or height == None:
+            raise Exception('DBH and height are needed.')
+
+        v1 = b5 * math.pow(dbh, b6) * math.pow(height, b7)
+        v2 = 4.0
+
+        volcfgrs = v1 - (v1 * ( b1 * (math.pow(v2 / b2, b3) / math.pow(dbh, b4))))
+
+        if volcfgrs <= 0:
+            volcfgrs = 0.1
+
+        return volcfgrs
+
+
+    @staticmethod
+    def _volTable3Row4(b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1, b2, b3, b4, b5 = b[:6]
+
+        if dbh == None or height == None:
+            raise Exception('DBH and height are needed.')
+
+        if math.pow(dbh, 2.0) * height <= b5 or (dbh < 21.0 and b5 == 0):
+            volcfgrs = b1 + b2 * math.pow(dbh, 2.0) * height
+        else:
+            volcfgrs = b3 + b4 * math.pow(dbh, 2.0) * height
+
+        if volcfgrs <= 0:
+            volcfgrs = 0.1
+
+        return volcfgrs
+
+
+    @staticmethod
+    def _volTable3Row5(b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1, b2, b3, b4, b5, b6, b7, b8, b9, b10, b11, b12 = b[:13]
+
+        if dbh == None or height == None:
+            raise Exception('DBH and height are needed.')
+
+        if dbh < 21.0:
+            volcfgrs = b1 + b2 * math.pow(dbh, 2.0) * height
+            volcfgrs -= b3 + b4 * ((64.0 * height) / math.pow(dbh, b5)) + b6 * math.pow(dbh, 2.0)
+        else:
+            volcfgrs = b7 + b8 * math.pow(dbh, 2.0) * height
+            volcfgrs -= b9 + b10 * ((64.0 * height) / math.pow(dbh, b11)) + b12 * math.pow(dbh, 2.0)
+
+        if volcfgrs <= 0 and dbh >= 1.0:
+            volcfgrs = 0.1                  
+
+        return volcfgrs
+
+
+    @staticmethod
+    def _volTable3Row6(b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1 = b[:2]
+
+        if dbh == None or height == None:
+            raise Exception('DBH and height are needed.')
+
+        volcfgrs = None
+        if dbh > 5.0:
+            volcfgrs = b0 + b1 * math.pow(dbh, 2.0) * height
+
+        if volcfgrs != None and volcfgrs <= 0:
+            volcfgrs = 0.1                
+
+        return volcfgrs
+
+
+    @staticmethod
+    def _volTable3Row7(b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1, b2, b3 = b[:4]
+
+        if drc == None or height == None:
+            raise Exception('Diameter at root collar and height are needed.')
+
+        v1 = math.pow(drc, 2.0) * height * 0.001
+        volcfgrs = b0 + b1 * v1 + b2
+        if v1 <= b3:
+            volcfgrs += b2 * math.pow(v1, 2.0)
+        else:
+            volcfgrs += b2 * (3.0 * math.pow(b3, 2.0) - ((2.0 * math.pow(b3, 3.0))/v1 ))
+
+        if volcfgrs <= 0:
+            volcfgrs = 0.1
+
+        return volcfgrs
+
+
+    @staticmethod
+    def _volTable3Row8(b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1, b2, b3, b4, b5, b6, b7, b8, b9, b10 = b[:11]
+
+        if dbh == None or height == None:
+            raise Exception('DBH and height are needed.')
+
+        if dbh > 60.0:
+            dbh = 60.0
+        
+        v1_1 = (b9 * dbh * height) / (height + b10)
+        v1_2 = height * math.pow( height / (height + b10), 2.0)
+        v1 = b6 * math.pow(dbh, 2.0) * (b7 + b8 * height - v1_1 ) * v1_2
+
+        if v1 <= 0.0:
+            v1 = 2.0
+        
+        volcfgrs = ((v1 + b1) / ( b2 + b3 * math.pow(math.e, b4 * dbh))) + b5
+
+        if volcfgrs <= 0:
+            volcfgrs = 1.0
+
         return volcfgrs
 
 
+    @staticmethod
+    def _volTable3Row9(b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1, b2, b3, b4 = b[:5]
+
+        if dbh == None:
+            raise Exception('DBH is needed.')
+
+        if (spcd < 300 and dbh < 9.0) or (spcd >= 300 and dbh < 11.0):
+            volcfgrs = b1 + b2 * math.pow(dbh, 2.0) * height
+        else:
+            volcfgrs = b3 + b4 * math.pow(dbh, 2.0) * height
+
+        if volcfgrs <= 0 or height == None or dbh < 5.0:
+            volcfgrs = 0.1
+
+        return volcfgrs
+
+
+    @staticmethod
+    def _volTable3Row10(b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1, b2, b3 = b[:4]
+
+        if drc == None or height == None or stem_count == None:
+            raise Exception('Diameter at root collar, height and # of stems are needed.')
+
+        if drc >= 3.0 and height > 0.0 and stem_count == 1:
+            volcfgrs = math.pow((b0 + b1 * math.pow(math.pow(drc, 2.0) * height, b2) + b3 ), 3.0)
+        elif drc >= 3.0 and height > 0.0 and stem_count != 1:
+            volcfgrs = math.pow((b0 + b1 * math.pow(math.pow(drc, 2.0) * height, b2)), 3.0)
+        else:
+            volcfgrs = 0.1
+
+        if volcfgrs <= 0:
+            volcfgrs = 0.1
+
+        return volcfgrs
+
+
+    @staticmethod
+    def _volTable3Row11(b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1, b2, b3, b4, b5, b6 = b[:7]
+
+        if drc == None or height == None:
+            raise Exception('Diameter at root collar and height are needed.')
+
+        v1 = math.pow(drc, 2.0) * height * 0.001
+        if v1 <= b6:
+            volcfgrs = b1 + b2 * v1 + b3 * math.pow(v1, 2.0)
+        else:
+            volcfgrs = b4 + b2 * v1 - (b5 / v1)
+
+        if volcfgrs <= 0:
+            volcfgrs = 0.1
+
+        return volcfgrs
+
+
+    @staticmethod
+    def _volTable3Row12(b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1, b2, b3 = b[:4]
+
+        if drc == None or height == None or stem_count == None:
+            raise Exception('Diameter at root collar, height and # of stems are needed.')
+
+        if drc >= 3.0 and height > 0.0 and stem_count == 1:
+            volcfgrs = math.pow((b0 + b1 * math.pow(math.pow(drc, 2.0) * height, b2) + b3 ), 3.0)
+                
+        elif drc >= 3.0 and height > 0.0 and stem_count != 1:
+            volcfgrs = math.pow((b0 + b1 * math.pow(math.pow(drc, 2.0) * height, b2)), 3.0)
+
+        else:
+            volcfgrs = 0
+
+        if volcfgrs <= 0:
+            volcfgrs = 0.1
+
+        return volcfgrs
+
+
+    @staticmethod
+    def _volTable4Row1(b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1, b2, b3, b4, b5, b6, b7, b8, b9, b10, b11 = b[:12]
+
+        if dbh == None or height == None:
+            raise Exception('DBH and height are needed.')
+        
+        a = math.pow(10.0, b1) * math.pow(dbh, b2) * math.pow(height, b3) * b4
+        b = b5 * (1.0 + b6 * math.pow(math.e, b7 * (dbh/10.0)))
+        c = (b8 * math.pow(dbh , 2.0) + b9) + b10
+        d = (b11 * math.pow(dbh , 2.0) - b9) / b4
+
+        return a / (b * c * d)
+
+
+    @staticmethod
+    def _volTable4Row2(b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1, b2, b3 = b[:4]
+
+        if dbh == None or height == None:
+            raise Exception('DBH and height are needed.')
+
+        if dbh < 6.0:
+            dbh = 6.0
+
+        v1 = b2 + b3 * (dbh / height)
+        if v1 > 0.4:
+            v1 = 0.4
+        if v1 < 0.3:
+            v1 = 0.3
+
+        return b1 * math.pow(dbh, 2.0) * height * v1
+
+
+    @staticmethod
+    def _volTable4Row3(b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1, b2, b3, b4 = b[:5]
+
+        if dbh == None or height == None:
+            raise Exception('DBH and height are needed.')
+
+        if dbh < 6.0:
+            dbh = 6.0
+
+        v1 = b2 + b3 * math.pow(height, -1) + b4 * (math.pow(dbh, 2.0) / height)
+        if v1 > 0.4:
+            v1 = 0.4
+        if v1 < 0.3:
+            v1 = 0.3
+
+        return b1 * math.pow(dbh, 2.0) * height * v1
+
+
+    @staticmethod
+    def _volTable4Row4(b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1, b2, b3 = b[:4]
+
+        if dbh == None or height == None:
+            raise Exception('DBH and height are needed.')
+
+        if dbh < 6.0:
+            dbh = 6.0
+
+        v1 = b2 + b3 * math.pow(height, -1)
+        if v1 < 0.27:
+            v1 = 0.27
+
+        return b1 * math.pow(dbh, 2.0) * height * v1
+
+
+    @staticmethod
+    def _volTable4Row5(b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1, b2, b3 = b[:4]
+
+        if drc == None or height == None or stem_count == None:
+            raise Exception('Diameter at root collar, height and # of stems are needed.')
+
+        if drc >= 3.0 and height > 0.0 and stem_count == 1:
+            volcfgrs = math.pow((b0 + b1 * math.pow(math.pow(drc, 2.0) * height, b2) + b3 ), 3.0)
+        elif drc >= 3.0 and height > 0.0 and stem_count != 1:
+            volcfgrs = math.pow((b0 + b1 * math.pow(math.pow(drc, 2.0) * height, b2)), 3.0)
+        else:
+            volcfgrs = 0.1
+
+        if volcfgrs <= 0:
+            volcfgrs = 0.1
+
+        return volcfgrs
+
+
+    @staticmethod
+    def _volTable4Row6(b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1, b2, b3, b4, b5, b6, b7, b8, b9, b10 = b[:11]
+
+        if dbh == None or height == None:
+            raise Exception('DBH and height are needed.')
+
+        if dbh > 6.0:
+            dbh = 6.0
+
+        a = (b9 * dbh * height) / (height + b10)
+        b = height * math.pow(height / (height + b10), 2.0)
+        c = b6 * math.pow(dbh, 2.0)
+        v1 = c * ( b7 + b8 * height - a ) * b
+
+        if v1 <= 0:
+            v1 = 2.0
+
+        volcfgrs = ((v1 + b1) / (b2 + b3 * math.pow(math.e, b4 * dbh))) + b5
+
+        if volcfgrs <= 0:
+            volcfgrs = 1.0
+
+        return volcfgrs
+
+
+    def _batchColumn(self, values, count):
+        if values is None:
+            return np.full(count, np.nan)
+
+        # None inside a list becomes NaN, a single value is spread over the batch
+        column = np.asarray(values, dtype=np.float64)
+        if column.ndim == 0:
+            return np.full(count, float(column))
+
+        column = column.reshape(-1)
+        if column.size != count:
+            raise Exception('Every tree measurement must be the same length as the species codes.')
+        return column
+
+
+    def _missing(self, *columns):
+        missing = np.isnan(columns[0])
+        for column in columns[1:]:
+            missing = missing | np.isnan(column)
+        return missing
+
+
+    def getVOLCFGRSBatch(self, species_cds, region_ids,
+                         dbh=None,
+                         height=None,
+                         basal_area=None,
+                         site_index=None,
+                         stem_count=None,
+                         drc=None,
+                         bole_hgt=None):
+        self._requireNumpy()
+
+        # trees that getVOLCFGRS would return None for or raise on come back as NaN
+        species_cds = np.asarray(species_cds, dtype=np.int64).reshape(-1)
+        count = species_cds.size
+        region_ids = np.asarray(region_ids, dtype=str)
+        if region_ids.ndim == 0:
+            region_ids = np.full(count, str(region_ids))
+        region_ids = region_ids.reshape(-1)
+        if region_ids.size != count:
+            raise Exception('Region ids must be the same length as the species codes.')
+
+        measurements = tuple(self._batchColumn(values, count)
+                             for values in (dbh, height, basal_area, site_index, stem_count, drc, bole_hgt))
+
+        volcfgrs = np.full(count, np.nan)
+        regions, regionRows = np.unique(region_ids, return_inverse=True)
+        regionRows = regionRows.reshape(-1)
+
+        with np.errstate(all='ignore'):
+            for regionIdx, region_id in enumerate(regions.tolist()):
+                speciesIds, adjGrossVolSpeciesIds, coefficients, equationIdxs, equations = self._getGrossVolBatchTable(region_id)
+                rows = np.nonzero(regionRows == regionIdx)[0] if regions.size > 1 else np.arange(count)
+
+                if speciesIds.size == 0:
+                    continue
+
+                # unknown species in the region keep their NaN
+                treeSpeciesIds = species_cds[rows]
+                positions = np.minimum(np.searchsorted(speciesIds, treeSpeciesIds), speciesIds.size - 1)
+                treeEquations = np.where(speciesIds[positions] == treeSpeciesIds, equationIdxs[positions], -1)
+
+                # each (region, Table/Row) group is evaluated over arrays and scattered back into input order
+                for equationIdx, (equation, label) in enumerate(equations):
+                    selected = np.nonzero(treeEquations == equationIdx)[0]
+                    if selected.size == 0:
+                        continue
+
+                    if self.equationTrace != None:
+                        self.equationTrace[label] += selected.size
+
+                    treeRows = rows[selected]
+                    tablePositions = positions[selected]
+                    b = coefficients[tablePositions].T
+                    spcd = adjGrossVolSpeciesIds[tablePositions]
+                    values = tuple(column[treeRows] for column in measurements)
+
+                    kernel = getattr(self, equation.__name__ + 'Batch', None)
+                    if kernel != None:
+                        volcfgrs[treeRows] = kernel(b, spcd, *values)
+                    else:
+                        volcfgrs[treeRows] = self._evaluateGrossVolEquationPerTree(equation, b, spcd, *values)
+
+        volcfgrs[~np.isfinite(volcfgrs)] = np.nan
+        return volcfgrs
+
+
+    def _getGrossVolBatchTable(self, region_id):
+        batchTable = self._grossVolBatchTables.get(region_id)
+        if batchTable != None:
+            return batchTable
+
+        table = self._grossVolTables.get(region_id)
+        if table == None:
+            table = self._loadGrossVolTable(region_id)
+
+        # species are sorted for searchsorted, the ones without a usable equation are left out
+        speciesIds = []
+        adjGrossVolSpeciesIds = []
+        coefficients = []
+        equationIdxs = []
+        equations = []
+        equationIndexes = {}
+
+        for species_cd in sorted(table):
+            try:
+                adjGrossVolSpeciesId, b = self._getGrossVolSpeciesCodeAndCoeff(species_cd, region_id)
+                entry = self._grossVolDispatch.get((region_id, adjGrossVolSpeciesId))
+                if entry == None:
+                    entry = self._getGrossVolDispatchEntry(region_id, adjGrossVolSpeciesId)
+            except Exception:
+                continue
+
+            if entry not in equationIndexes:
+                equationIndexes[entry] = len(equations)
+                equations.append(entry)
+
+            speciesIds.append(species_cd)
+            adjGrossVolSpeciesIds.append(adjGrossVolSpeciesId)
+            coefficients.append([np.nan if value == None else value for value in b])
+            equationIdxs.append(equationIndexes[entry])
+
+        batchTable = (np.array(speciesIds, dtype=np.int64),
+                      np.array(adjGrossVolSpeciesIds, dtype=np.int64),
+                      np.array(coefficients, dtype=np.float64).reshape(-1, len(GROSS_VOL_COEFFICIENT_COLUMNS)),
+                      np.array(equationIdxs, dtype=np.int64),
+                      equations)
+
+        self._grossVolBatchTables[region_id] = batchTable
+        return batchTable
+
+
+    def _evaluateGrossVolEquationPerTree(self, equation, b, spcd, *measurements):
+
+        # equations without an array form run one tree at a time
+        volcfgrs = np.full(spcd.size, np.nan)
+        for idx in range(spcd.size):
+            coefficients = tuple(None if np.isnan(value) else float(value) for value in b[:, idx])
+            values = [None if np.isnan(column[idx]) else float(column[idx]) for column in measurements]
+            try:
+                volume = equation(coefficients, int(spcd[idx]), *values)
+            except Exception:
+                continue
+            if volume != None:
+                volcfgrs[idx] = volume
+        return volcfgrs
+
+
+    def _volUndefinedBatch(self, b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        return np.full(spcd.size, np.nan)
+
+
+    def _volTable1Row1Batch(self, b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1, b2, b3, b4 = b[:5]
+
+        volcfgrs = b1 * np.power(site_index, b2) * (1.0 - np.exp(b3 * np.power(dbh, b4)))
+        volcfgrs = np.where(volcfgrs < 0.0, 0.0, volcfgrs)
+
+        return np.where(self._missing(dbh, site_index), np.nan, volcfgrs)
+
+
+    def _volTable1Row2Batch(self, b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b12, b13, b14, b15, b16, b17, b18, b19 = b[12:20]
+
+        site_index = np.clip(site_index, 20.0, 120.0)
+        basal_area = np.clip(basal_area, 50.0, 350.0)
+
+        v1 = 4.0
+        v2 = b13 * np.power(1.0 - np.exp(-1 * b14 * dbh), b15)
+        v2 *= np.power(site_index, b16)
+        v2 *= np.power(b17 - (v1 / dbh), b18) * np.power(basal_area, b19)
+        v2 += b12
+
+        volcfgrs = np.where(v2 < 0.0, 0.0, v2)
+
+        return np.where(self._missing(dbh, site_index, basal_area), np.nan, volcfgrs)
+
+
+    def _volTable1Row3Batch(self, b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1, b2, b3 = b[:4]
+
+        v1 = np.power(drc, 2.0) * height * 0.001
+        volcfgrs = b0 + b1 * v1 + np.where(v1 <= b3,
+                                           b2 * np.power(v1, 2.0),
+                                           b2 * (3.0 * np.power(b3, 2.0) - ((2.0 * np.power(b3, 3.0)) / v1)))
+        volcfgrs = np.where(volcfgrs <= 0.0, 0.1, volcfgrs)
+
+        return np.where(self._missing(dbh, site_index), np.nan, volcfgrs)
+
+
+    def _volTable1Row4Batch(self, b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1, b2, b3, b4, b5 = b[:6]
+
+        v1 = np.power(dbh, 2.0) * height
+        volcfgrs = np.where(v1 <= b1, b2 + b3 * v1, np.where(v1 > b1, b4 + b5 * v1, np.nan))
+        volcfgrs = np.where(volcfgrs <= 0.0, 0.1, volcfgrs)
+
+        return np.where(self._missing(dbh, site_index), np.nan, volcfgrs)
+
+
+    def _volTable1Row5Batch(self, b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1, b2, b3, b4, b5 = b[:6]
+
+        return b0 + b1 * np.power(dbh, b2) + b3 * np.power(dbh, b4) * np.power(bole_hgt, b5)
+
+
+    def _volTable2Row1Batch(self, b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1 = b[:2]
+
+        volcfgrs = np.where(dbh > 5.0, b0 + b1 * np.power(dbh, 2.0) * height, np.nan)
+
+        return np.where(self._missing(dbh, height), np.nan, volcfgrs)
+
+
+    def _volTable2Row2Batch(self, b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1, b2, b3 = b[:4]
+
+        v1 = np.power(drc, 2.0) * height * 0.001
+        volcfgrs = b0 + b1 * v1 + np.where(v1 <= b3,
+                                           b2 * np.power(v1, 2.0),
+                                           b2 * ((3.0 * np.power(b3, 2.0)) - (2.0 * np.power(b3, 3.0)) / v1))
+        volcfgrs = np.where(volcfgrs <= 0.0, 0.1, volcfgrs)
+
+        return np.where(self._missing(dbh, height), np.nan, volcfgrs)
+
+
+    def _volTable2Row3Batch(self, b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1, b2, b3, b4, b5, b6 = b[:7]
+
+        v1 = np.power(drc, 2.0) * height * 0.001
+        volcfgrs = np.where(v1 <= b6, b1 * b2 * v1 + b3 * np.power(v1, 2.0), b4 * b2 * v1 - (b5 / v1))
+        volcfgrs = np.where(volcfgrs <= 0.0, 0.1, volcfgrs)
+
+        return np.where(self._missing(height), np.nan, volcfgrs)
+
+
+    def _volTable2Row4Batch(self, b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1, b2, b3, b4, b5, b6, b7, b8, b9, b10, b11, b12 = b[:13]
+
+        small = b1 + b2 * np.power(dbh, 2.0) * height
+        small -= b3 + b4 * ((64.0 * height) / np.power(dbh, b5)) + b6 * np.power(dbh, 2.0)
+        large = b7 + b8 * np.power(dbh, 2.0) * height
+        large -= b9 + b10 * ((64.0 * height) / np.power(dbh, b11)) + b12 * np.power(dbh, 2.0)
+
+        volcfgrs = np.where(dbh < 21.0, small, large)
+        volcfgrs = np.where((volcfgrs <= 0.0) & (dbh >= 1.0), 0.1, volcfgrs)
+
+        return np.where(self._missing(height), np.nan, volcfgrs)
+
+
+    def _volTable2Row5Batch(self, b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1, b2, b3, b4, b5, b6 = b[:7]
+
+        volcfgrs = b1 + b2 * np.power(dbh, 2.0) * height
+        volcfgrs -= b3 + b4 * ((64.0 * height) / np.power(dbh, b5)) + b6 * np.power(dbh, 2.0)
+        volcfgrs = np.where((volcfgrs <= 0.0) & (dbh >= 1.0), 0.1, volcfgrs)
+
+        return np.where(self._missing(height), np.nan, volcfgrs)
+
+
+    def _volTable3Row1Batch(self, b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1, b2, b3, b4, b5, b6 = b[:7]
+
+        volcfgrs = b1 + b2 * np.power(dbh, 2.0) * height
+        volcfgrs -= b3 + b4 * ((64.0 * height) / np.power(dbh, b5)) + b6 * np.power(dbh, 2.0)
+        volcfgrs = np.where((volcfgrs <= 0) & (dbh >= 1.0), 0.1, volcfgrs)
+
+        return np.where(self._missing(dbh, height), np.nan, volcfgrs)
+
+
+    def _volTable3Row2Batch(self, b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1, b2, b3, b4, b5 = b[:6]
+
+        v1 = np.power(dbh, 2.0) * height
+        volcfgrs = np.where(v1 <= b5, b1 + b2 * v1, np.where(v1 > b5, b3 + b4 * v1, np.nan))
+        volcfgrs = np.where((volcfgrs <= 0) & (dbh >= 1.0), 0.1, volcfgrs)
+
+        return np.where(self._missing(dbh, height), np.nan, volcfgrs)
+
+
+    def _volTable3Row3Batch(self, b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1, b2, b3, b4, b5, b6, b7 = b[:8]
+
+        v1 = b5 * np.power(dbh, b6) * np.power(height, b7)
+        v2 = 4.0
+
+        volcfgrs = v1 - (v1 * (b1 * (np.power(v2 / b2, b3) / np.power(dbh, b4))))
+        volcfgrs = np.where(volcfgrs <= 0, 0.1, volcfgrs)
+
+        return np.where(self._missing(dbh, height), np.nan, volcfgrs)
+
+
+    def _volTable3Row4Batch(self, b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1, b2, b3, b4, b5 = b[:6]
+
+        v1 = np.power(dbh, 2.0) * height
+        volcfgrs = np.where((v1 <= b5) | ((dbh < 21.0) & (b5 == 0)), b1 + b2 * v1, b3 + b4 * v1)
+        volcfgrs = np.where(volcfgrs <= 0, 0.1, volcfgrs)
+
+        return np.where(self._missing(dbh, height), np.nan, volcfgrs)
+
+
+    def _volTable3Row5Batch(self, b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        return self._volTable2Row4Batch(b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt)
+
+
+    def _volTable3Row6Batch(self, b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1 = b[:2]
+
+        volcfgrs = np.where(dbh > 5.0, b0 + b1 * np.power(dbh, 2.0) * height, np.nan)
+        volcfgrs = np.where(volcfgrs <= 0, 0.1, volcfgrs)
+
+        return np.where(self._missing(dbh, height), np.nan, volcfgrs)
+
+
+    def _volTable3Row7Batch(self, b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1, b2, b3 = b[:4]
+
+        v1 = np.power(drc, 2.0) * height * 0.001
+        volcfgrs = b0 + b1 * v1 + b2 + np.where(v1 <= b3,
+                                                b2 * np.power(v1, 2.0),
+                                                b2 * (3.0 * np.power(b3, 2.0) - ((2.0 * np.power(b3, 3.0)) / v1)))
+        volcfgrs = np.where(volcfgrs <= 0, 0.1, volcfgrs)
+
+        return np.where(self._missing(drc, height), np.nan, volcfgrs)
+
+
+    def _volTable3Row8Batch(self, b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        return self._volDouglasFirBatch(b, np.where(dbh > 60.0, 60.0, dbh), height)
+
+
+    def _volTable3Row9Batch(self, b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1, b2, b3, b4 = b[:5]
+
+        v1 = np.power(dbh, 2.0) * height
+        small = ((spcd < 300) & (dbh < 9.0)) | ((spcd >= 300) & (dbh < 11.0))
+        volcfgrs = np.where(small, b1 + b2 * v1, b3 + b4 * v1)
+        volcfgrs = np.where((volcfgrs <= 0) | (dbh < 5.0), 0.1, volcfgrs)
+
+        # a missing height fails in getVOLCFGRS before the 0.1 floor is reached
+        return np.where(self._missing(dbh, height), np.nan, volcfgrs)
+
+
+    def _volTable3Row10Batch(self, b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        return self._volRootCollarStemsBatch(b, height, stem_count, drc, 0.1)
+
+
+    def _volTable3Row11Batch(self, b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1, b2, b3, b4, b5, b6 = b[:7]
+
+        v1 = np.power(drc, 2.0) * height * 0.001
+        volcfgrs = np.where(v1 <= b6, b1 + b2 * v1 + b3 * np.power(v1, 2.0), b4 + b2 * v1 - (b5 / v1))
+        volcfgrs = np.where(volcfgrs <= 0, 0.1, volcfgrs)
+
+        return np.where(self._missing(drc, height), np.nan, volcfgrs)
+
+
+    def _volTable3Row12Batch(self, b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        return self._volRootCollarStemsBatch(b, height, stem_count, drc, 0.0)
+
+
+    def _volTable4Row1Batch(self, b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1, b2, b3, b4, b5, b6, b7, b8, b9, b10, b11 = b[:12]
+
+        a = np.power(10.0, b1) * np.power(dbh, b2) * np.power(height, b3) * b4
+        b = b5 * (1.0 + b6 * np.exp(b7 * (dbh / 10.0)))
+        c = (b8 * np.power(dbh, 2.0) + b9) + b10
+        d = (b11 * np.power(dbh, 2.0) - b9) / b4
+
+        return np.where(self._missing(dbh, height), np.nan, a / (b * c * d))
+
+
+    def _volTable4Row2Batch(self, b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1, b2, b3 = b[:4]
+
+        dbh = np.where(dbh < 6.0, 6.0, dbh)
+        v1 = np.clip(b2 + b3 * (dbh / height), 0.3, 0.4)
+
+        return np.where(self._missing(dbh, height), np.nan, b1 * np.power(dbh, 2.0) * height * v1)
+
+
+    def _volTable4Row3Batch(self, b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1, b2, b3, b4 = b[:5]
+
+        dbh = np.where(dbh < 6.0, 6.0, dbh)
+        v1 = np.clip(b2 + b3 * np.power(height, -1) + b4 * (np.power(dbh, 2.0) / height), 0.3, 0.4)
+
+        return np.where(self._missing(dbh, height), np.nan, b1 * np.power(dbh, 2.0) * height * v1)
+
+
+    def _volTable4Row4Batch(self, b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        b0, b1, b2, b3 = b[:4]
+
+        dbh = np.where(dbh < 6.0, 6.0, dbh)
+        v1 = b2 + b3 * np.power(height, -1)
+        v1 = np.where(v1 < 0.27, 0.27, v1)
+
+        return np.where(self._missing(dbh, height), np.nan, b1 * np.power(dbh, 2.0) * height * v1)
+
+
+    def _volTable4Row5Batch(self, b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        return self._volRootCollarStemsBatch(b, height, stem_count, drc, 0.1)
+
+
+    def _volTable4Row6Batch(self, b, spcd, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt):
+        return self._volDouglasFirBatch(b, np.where(dbh > 6.0, 6.0, dbh), height)
+
+
+    def _volRootCollarStemsBatch(self, b, height, stem_count, drc, otherwise):
+
+        # Table 3 Rows 10 and 12 and Table 4 Row 5, single and multi stem woodland species
+        b0, b1, b2, b3 = b[:4]
+
+        measured = (drc >= 3.0) & (height > 0.0)
+        v1 = b0 + b1 * np.power(np.power(drc, 2.0) * height, b2)
+        volcfgrs = np.where(measured & (stem_count == 1), np.power(v1 + b3, 3.0),
+                            np.where(measured & (stem_count != 1), np.power(v1, 3.0), otherwise))
+        volcfgrs = np.where(volcfgrs <= 0, 0.1, volcfgrs)
+
+        return np.where(self._missing(drc, height, stem_count), np.nan, volcfgrs)
+
+
+    def _volDouglasFirBatch(self, b, dbh, height):
+
+        # Table 3 Row 8 and Table 4 Row 6, dbh already capped by the caller
+        b0, b1, b2, b3, b4, b5, b6, b7, b8, b9, b10 = b[:11]
+
+        v1_1 = (b9 * dbh * height) / (height + b10)
+        v1_2 = height * np.power(height / (height + b10), 2.0)
+        v1 = b6 * np.power(dbh, 2.0) * (b7 + b8 * height - v1_1) * v1_2
+        v1 = np.where(v1 <= 0.0, 2.0, v1)
+
+        volcfgrs = ((v1 + b1) / (b2 + b3 * np.exp(b4 * dbh))) + b5
+        volcfgrs = np.where(volcfgrs <= 0, 1.0, volcfgrs)
+
+        return np.where(self._missing(dbh, height), np.nan, volcfgrs)
+
+
 if __name__ == '__main__':
     crm = Component_Ratio_Method()
     species = crm._getSpeciesData(58)
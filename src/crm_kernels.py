@@ -0,0 +1,204 @@
+import concurrent.futures, numbers, types
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from component_ratio_method import Component_Ratio_Method, JENKINS_COEFFICIENT_COLUMNS, Jenkins_Biomass, Species_Record
+
+
+class Frozen_Species(Species_Record):
+
+    # a copy of one of the crm's species records that refuses assignment, the crm keeps its own to change
+    __slots__ = ()
+
+    def __init__(self, species):
+        for field in Species_Record.__slots__:
+            object.__setattr__(self, field, getattr(species, field))
+
+
+    def __setattr__(self, name, value):
+        raise Exception('Coefficient tables are read only.')
+
+
+class Coefficient_Tables(object):
+
+    # the coefficients the kernels read, copied out of a Component_Ratio_Method once and never changed after,
+    # any number of threads can share one without locks
+    __slots__ = ('species', 'speciesErrors', 'grossVolume', 'regionIds', 'jenkinsSpeciesCodes', 'jenkinsCoefficients')
+
+    def __init__(self, crm=None, region_ids=None):
+
+        # a crm made here only to copy the coefficients from is closed again once they are read
+        ownsCrm = crm == None
+        crm = crm if crm != None else Component_Ratio_Method()
+        try:
+            region_ids = crm.preloadCoefficients(region_ids)
+
+            # (rgn_config_id, species_cd) -> (gross_cf_spcd, coefficients, equation), or the message the lookup
+            # raises for that pair, the equations are the plain functions so no instance is reachable from here
+            grossVolume = {}
+            for region_id in region_ids:
+                for species_cd in crm._grossVolTables[region_id]:
+                    try:
+                        adjGrossVolSpeciesId, b = crm._getGrossVolSpeciesCodeAndCoeff(species_cd, region_id)
+                        entry = crm._grossVolDispatch.get((region_id, adjGrossVolSpeciesId))
+                        if entry == None:
+                            entry = crm._getGrossVolDispatchEntry(region_id, adjGrossVolSpeciesId)
+                    except Exception as e:
+                        grossVolume[(region_id, species_cd)] = str(e)
+                        continue
+
+                    equation = getattr(Component_Ratio_Method, entry[0].__name__)
+                    grossVolume[(region_id, species_cd)] = (adjGrossVolSpeciesId, tuple(b), equation)
+        finally:
+            if ownsCrm:
+                crm.close()
+
+        setter = object.__setattr__
+        setter(self, 'species', types.MappingProxyType(dict((species_cd, Frozen_Species(species))
+                                                            for species_cd, species in crm._speciesCache.items())))
+        setter(self, 'speciesErrors', types.MappingProxyType(dict((species_cd, tuple(errors))
+                                                                  for species_cd, errors in crm.speciesErrors.items())))
+        setter(self, 'grossVolume', types.MappingProxyType(grossVolume))
+        setter(self, 'regionIds', tuple(region_ids))
+
+        # sorted species codes and their Jenkins coefficients for the batch kernel
+        setter(self, 'jenkinsSpeciesCodes', None)
+        setter(self, 'jenkinsCoefficients', None)
+        if np != None:
+            codes = sorted(self.species)
+            coefficients = np.array([[_asFloat(self.species[species_cd][column]) for column in JENKINS_COEFFICIENT_COLUMNS]
+                                     for species_cd in codes], dtype=np.float64).reshape(-1, len(JENKINS_COEFFICIENT_COLUMNS))
+            codes = np.array(codes, dtype=np.int64)
+            codes.flags.writeable = False
+            coefficients.flags.writeable = False
+            setter(self, 'jenkinsSpeciesCodes', codes)
+            setter(self, 'jenkinsCoefficients', coefficients)
+
+
+    def __setattr__(self, name, value):
+        raise Exception('Coefficient tables are read only.')
+
+
+    def _getSpeciesData(self, species_cd):
+
+        # the same checks and messages as Component_Ratio_Method._getSpeciesData
+        if not type(species_cd) == int:
+            raise Exception('Species code must be an integer.')
+
+        species = self.species.get(species_cd)
+        if species == None:
+            raise Exception('Species not found in database.')
+
+        return species
+
+
+def _asFloat(value):
+    return float(value) if isinstance(value, numbers.Number) else float('nan')
+
+
+def grossVolume(tables, species, region_id,
+                dbh=None,
+                height=None,
+                basal_area=None,
+                site_index=None,
+                stem_count=None,
+                drc=None,
+                bole_hgt=None):
+
+    # regions left out of the tables raise the same as a region without config rows
+    entry = tables.grossVolume.get((region_id, species.species_cd))
+    if entry == None:
+        raise Exception('There is no cooresponding gross volume species code for this species!')
+    if isinstance(entry, str):
+        raise Exception(entry)
+
+    adjGrossVolSpeciesId, b, equation = entry
+    return equation(b, adjGrossVolSpeciesId, dbh, height, basal_area, site_index, stem_count, drc, bole_hgt)
+
+
+def treeResults(tables, tree):
+
+    # the result columns of one tree that passed treeErrors, nothing here reads or writes shared state
+    species = tables._getSpeciesData(tree['species_cd'])
+    dbh = tree['dbh']
+
+    results = {
+        'volcfgrs': grossVolume(tables, species, tree['region'],
+                                dbh=dbh,
+                                height=tree['height'],
+                                basal_area=tree['basal_area'],
+                                site_index=tree['site_index'],
+                                stem_count=tree['stem_count'],
+                                drc=tree['drc'],
+                                bole_hgt=tree['bole_hgt'])
+    }
+
+    components = Component_Ratio_Method._jenkinsComponents(species, dbh)
+    results.update(components._asdict())
+
+    # the component ratio columns need a gross volume, a tree whose equation gives none keeps the Jenkins ones
+    if isinstance(results['volcfgrs'], numbers.Number):
+        results.update(Component_Ratio_Method._componentRatio(species, dbh, results['volcfgrs'], components)._asdict())
+
+    return results
+
+
+def _jenkinsSlice(tables, species_cds, dbhs, out, start, stop):
+    codes = tables.jenkinsSpeciesCodes
+    positions = np.searchsorted(codes, species_cds[start:stop])
+    (total_b1, total_b2,
+     stem_b1, stem_b2,
+     bark_b1, bark_b2,
+     foliage_b1, foliage_b2,
+     root_b1, root_b2) = tables.jenkinsCoefficients[positions].T
+
+    dbhCm = dbhs[start:stop] * 2.54
+    total = np.exp(total_b1 + total_b2 * np.log(dbhCm)) * 2.2046
+    stem = total * np.exp(stem_b1 + stem_b2 / dbhCm)
+    bark = total * np.exp(bark_b1 + bark_b2 / dbhCm)
+
+    out['total_ag'][start:stop] = total
+    out['stem'][start:stop] = stem
+    out['bark'][start:stop] = bark
+    out['bole'][start:stop] = stem + bark
+    out['foliage'][start:stop] = total * np.exp(foliage_b1 + foliage_b2 / dbhCm)
+    out['root'][start:stop] = total * np.exp(root_b1 + root_b2 / dbhCm)
+
+
+def jenkinsBiomassBatch(tables, species_cds, dbhs, threads=1):
+    if np == None:
+        raise Exception('NumPy is required for batch calculations.')
+
+    species_cds = np.asarray(species_cds, dtype=np.int64).reshape(-1)
+    dbhs = np.asarray(dbhs, dtype=np.float64).reshape(-1)
+
+    # checks for proper data types
+    if species_cds.shape != dbhs.shape:
+        raise Exception('Species codes and DBH must be the same length.')
+    if np.any(dbhs < 0):
+        raise Exception('DBH must be > 0.')
+    if threads < 1:
+        raise Exception('Threads must be > 0.')
+
+    codes = tables.jenkinsSpeciesCodes
+    positions = np.minimum(np.searchsorted(codes, species_cds), max(codes.size - 1, 0))
+    if codes.size == 0 or np.any(codes[positions] != species_cds):
+        raise Exception('Species not found in database.')
+
+    # every thread fills its own slice of the outputs, NumPy lets go of the GIL inside each ufunc so the
+    # slices overlap in time, the values do not depend on how the trees were split
+    out = dict((column, np.empty(dbhs.size)) for column in Jenkins_Biomass._fields)
+    if threads == 1:
+        _jenkinsSlice(tables, species_cds, dbhs, out, 0, dbhs.size)
+    else:
+        bounds = [dbhs.size * idx // threads for idx in range(threads + 1)]
+        with concurrent.futures.ThreadPoolExecutor(threads) as executor:
+            futures = [executor.submit(_jenkinsSlice, tables, species_cds, dbhs, out, start, stop)
+                       for start, stop in zip(bounds, bounds[1:]) if stop > start]
+            for future in futures:
+                future.result()
+
+    return out
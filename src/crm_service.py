@@ -0,0 +1,376 @@
+import argparse, asyncio, concurrent.futures, json, sys
+
+from component_ratio_method import Component_Ratio_Method
+from tree_list import Tree_List_Pipeline
+
+# largest body accepted by the single tree endpoint, bulk lists are streamed instead
+MAX_TREE_BODY = 64 * 1024
+
+STATUS_TEXT = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    411: 'Length Required',
+    413: 'Payload Too Large',
+    500: 'Internal Server Error',
+}
+
+
+class Micro_Batcher(object):
+
+    def __init__(self, pipeline, max_batch_size=256, max_wait=0.002):
+        if max_batch_size < 1:
+            raise Exception('Max batch size must be > 0.')
+
+        self.pipeline = pipeline
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+
+        # one thread runs the batches in order, the event loop keeps accepting requests meanwhile
+        # and those pile up into the next batch
+        self._executor = concurrent.futures.ThreadPoolExecutor(1)
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+
+
+    async def submit(self, tree):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((tree, future))
+
+        # a batch goes when it is full or when its first tree has waited max_wait seconds
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer == None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+
+    def _flush(self):
+        if self._timer != None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch = self._pending
+        self._pending = []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+
+    async def _run(self, batch):
+        try:
+            results = await self.evaluate([tree for tree, future in batch])
+        except Exception as e:
+            for tree, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (tree, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+    async def evaluate(self, trees):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self.pipeline.processChunk, trees)
+
+
+    def close(self):
+        self._executor.shutdown()
+
+
+class Component_Ratio_Service(object):
+
+    def __init__(self, crm=None, host='127.0.0.1', port=8080, max_batch_size=256, max_wait=0.002, chunk_size=1000):
+        self.pipeline = Tree_List_Pipeline(crm, chunk_size)
+        self.batcher = Micro_Batcher(self.pipeline, max_batch_size, max_wait)
+
+        # bulk chunks run on a thread of their own, a long /trees upload never queues ahead of /tree batches
+        self._bulkExecutor = concurrent.futures.ThreadPoolExecutor(1)
+        self.host = host
+        self.port = port
+        self.server = None
+
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handleConnection, self.host, self.port)
+
+        # port 0 picks a free port, the one bound is written back
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.server
+
+
+    async def serve(self):
+        if self.server == None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+
+    def run(self):
+        try:
+            asyncio.run(self.serve())
+        finally:
+            self.close()
+
+
+    def close(self):
+        self.batcher.close()
+        self._bulkExecutor.shutdown()
+        self.pipeline.close()
+
+
+    async def _readRequest(self, reader):
+        requestLine = await reader.readline()
+        if not requestLine:
+            return None
+
+        parts = requestLine.decode('latin-1').split()
+        if len(parts) != 3:
+            raise Exception('Malformed request line.')
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in [b'\r\n', b'\n', b'']:
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        return parts[0].upper(), parts[1].split('?')[0], headers
+
+
+    def _isChunked(self, headers):
+        return headers.get('transfer-encoding', '').lower() == 'chunked'
+
+
+    async def _readChunks(self, reader, headers):
+
+        # yields the raw body in pieces for both Content-Length and chunked uploads, _route answers
+        # requests with neither before a body is read
+        if self._isChunked(headers):
+            while True:
+                size = int((await reader.readline()).split(b';')[0].strip(), 16)
+                if size == 0:
+                    while (await reader.readline()) not in [b'\r\n', b'\n', b'']:
+                        pass
+                    return
+                yield await reader.readexactly(size)
+                await reader.readexactly(2)
+
+        else:
+            remaining = int(headers['content-length'])
+            while remaining > 0:
+                data = await reader.read(min(remaining, 65536))
+                if not data:
+                    raise asyncio.IncompleteReadError(b'', remaining)
+                remaining -= len(data)
+                yield data
+
+
+    async def _readBody(self, reader, headers, limit):
+        body = bytearray()
+        async for data in self._readChunks(reader, headers):
+            body.extend(data)
+            if len(body) > limit:
+                return None
+        return bytes(body)
+
+
+    async def _readLines(self, reader, headers):
+        buffer = b''
+        async for data in self._readChunks(reader, headers):
+            buffer += data
+            lines = buffer.split(b'\n')
+            buffer = lines.pop()
+            for line in lines:
+                yield line
+        if buffer:
+            yield buffer
+
+
+    def _writeHead(self, writer, status, contentType, length=None, keepAlive=True):
+        head = ['HTTP/1.1 {0} {1}'.format(status, STATUS_TEXT[status]),
+                'Content-Type: {0}'.format(contentType),
+                'Connection: {0}'.format('keep-alive' if keepAlive else 'close')]
+        if length == None:
+            head.append('Transfer-Encoding: chunked')
+        else:
+            head.append('Content-Length: {0}'.format(length))
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1'))
+
+
+    async def _sendJson(self, writer, status, payload, keepAlive=True):
+        body = json.dumps(payload).encode('utf-8')
+        self._writeHead(writer, status, 'application/json', len(body), keepAlive)
+        writer.write(body)
+        await writer.drain()
+
+
+    async def _handleConnection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await self._readRequest(reader)
+                except Exception as e:
+                    await self._sendJson(writer, 400, {'error': str(e)}, False)
+                    break
+
+                if request == None:
+                    break
+
+                method, path, headers = request
+                keepAlive = headers.get('connection', '').lower() != 'close'
+                keepAlive = await self._route(method, path, headers, reader, writer) and keepAlive
+                if not keepAlive:
+                    break
+
+        # a dropped connection or a garbled body ends the connection, there is no way to answer it
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+
+        finally:
+            writer.close()
+
+
+    async def _route(self, method, path, headers, reader, writer):
+
+        # returns False when the connection can not be reused, e.g. an unread request body
+        hasBody = 'content-length' in headers or self._isChunked(headers)
+
+        if path == '/health':
+            if method != 'GET':
+                await self._sendJson(writer, 405, {'error': 'Use GET.'}, not hasBody)
+                return not hasBody
+            await self._sendJson(writer, 200, {'status': 'ok'})
+            return True
+
+        if path not in ['/tree', '/trees']:
+            await self._sendJson(writer, 404, {'error': 'Unknown path {0}.'.format(path)}, not hasBody)
+            return not hasBody
+
+        if method != 'POST':
+            await self._sendJson(writer, 405, {'error': 'Use POST.'}, not hasBody)
+            return not hasBody
+
+        if not hasBody:
+            await self._sendJson(writer, 411, {'error': 'A Content-Length or chunked body is required.'})
+            return True
+
+        if path == '/tree':
+            return await self._handleTree(headers, reader, writer)
+        return await self._handleTrees(headers, reader, writer)
+
+
+    async def _handleTree(self, headers, reader, writer):
+        body = await self._readBody(reader, headers, MAX_TREE_BODY)
+        if body == None:
+            await self._sendJson(writer, 413, {'error': 'Send tree lists to /trees.'}, False)
+            return False
+
+        try:
+            record = json.loads(body)
+        except ValueError as e:
+            await self._sendJson(writer, 400, {'error': 'Invalid JSON: {0}'.format(e)})
+            return True
+
+        if not isinstance(record, dict):
+            await self._sendJson(writer, 400, {'error': 'The body must be one JSON tree object.'})
+            return True
+
+        try:
+            tree = self.pipeline._parseTree(record)
+        except ValueError as e:
+            await self._sendJson(writer, 400, {'error': 'Invalid tree: {0}'.format(e)})
+            return True
+
+        # concurrent single tree requests are gathered into one pipeline chunk
+        try:
+            result = await self.batcher.submit(tree)
+        except Exception as e:
+            await self._sendJson(writer, 500, {'error': str(e)})
+            return True
+
+        await self._sendJson(writer, 200, result)
+        return True
+
+
+    async def _writeResults(self, writer, results):
+        data = ''.join(json.dumps(result) + '\n' for result in results).encode('utf-8')
+        writer.write('{0:x}\r\n'.format(len(data)).encode('latin-1') + data + b'\r\n')
+        await writer.drain()
+
+
+    async def _handleTrees(self, headers, reader, writer):
+
+        # NDJSON in and out, one chunk of trees in memory at a time and results streamed in input order
+        self._writeHead(writer, 200, 'application/x-ndjson')
+
+        chunk = []
+        lineNumber = 0
+        async for line in self._readLines(reader, headers):
+            lineNumber += 1
+            line = line.strip()
+            if not line:
+                continue
+
+            # a bad line gets an error row in its place, the rest of the list still runs
+            try:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError('expected a JSON object')
+            except ValueError as e:
+                chunk.append({'line': lineNumber, 'error': 'Invalid JSON: {0}'.format(e)})
+            else:
+                try:
+                    chunk.append(self.pipeline._parseTree(record))
+                except ValueError as e:
+                    chunk.append({'line': lineNumber, 'error': 'Invalid tree: {0}'.format(e)})
+
+            if len(chunk) == self.pipeline.chunk_size:
+                await self._writeResults(writer, await self._evaluateChunk(chunk))
+                chunk = []
+
+        if chunk:
+            await self._writeResults(writer, await self._evaluateChunk(chunk))
+
+        writer.write(b'0\r\n\r\n')
+        await writer.drain()
+        return True
+
+
+    async def _evaluateChunk(self, chunk):
+        trees = [tree for tree in chunk if 'line' not in tree]
+        results = []
+        if trees:
+            results = await asyncio.get_running_loop().run_in_executor(self._bulkExecutor, self.pipeline.processChunk, trees)
+        results = iter(results)
+        return [tree if 'line' in tree else next(results) for tree in chunk]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serves gross volume and Jenkins biomass over HTTP/JSON.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--db', default=None, help='coefficients database, the bundled one by default')
+    parser.add_argument('--snapshot', default=None, help='coefficient snapshot to use instead of the database')
+    parser.add_argument('--max-batch-size', type=int, default=256, help='most single tree requests run together')
+    parser.add_argument('--max-wait-ms', type=float, default=2.0, help='longest a request waits for its batch to fill')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='trees per chunk on the bulk endpoint')
+    args = parser.parse_args(argv)
+
+    crm = Component_Ratio_Method(args.db, snapshot_path=args.snapshot)
+    service = Component_Ratio_Service(crm, args.host, args.port, args.max_batch_size, args.max_wait_ms / 1000.0,
+                                      args.chunk_size)
+    print('Serving on http://{0}:{1}'.format(args.host, args.port))
+    service.run()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
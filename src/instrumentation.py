@@ -0,0 +1,210 @@
+import functools, random, re, threading, time
+
+# Component_Ratio_Method methods timed while instrumentation is on, the gross volume equations are added to these
+INSTRUMENTED_METHODS = ('getVOLCFGRS', 'getVOLCFGRSBatch', 'getJenkinsBiomassBatch', 'getStumpBiomassBatch', 'getComponentRatioBatch',
+                        '_getSpeciesData', '_loadSpeciesCache', '_loadSpecies', '_getGrossVolSpeciesCodeAndCoeff',
+                        '_getGrossVolConfigSpeciesCode', '_getGrossVolCoeff', '_loadGrossVolTable',
+                        '_getGrossVolBatchTable', '_calcTotalAGBioMassJenkins', '_calcJenkinsComponentsLbs',
+                        '_calcStumpBiomassLbs', '_calcTopBiomassJenkinsLbs', '_calcComponentRatioBiomass')
+
+# _volTable4Row6 -> Table 4 Row 6, _volTable4Row6Batch -> Table 4 Row 6 batch
+EQUATION_METHOD = re.compile(r'_volTable(\d+)Row(\d+)(Batch)?$')
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+# latencies kept per method for the quantiles, later calls replace kept ones at random so the sample stays uniform
+SAMPLE_SIZE = 4096
+
+# database queries made outside every instrumented method
+OTHER = 'other'
+
+
+class Latency_Stats(object):
+
+    __slots__ = ('calls', 'seconds', 'queries', 'query_seconds', 'samples')
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.samples = []
+
+
+    def addCall(self, seconds):
+        self.calls += 1
+        self.seconds += seconds
+        if len(self.samples) < SAMPLE_SIZE:
+            self.samples.append(seconds)
+        else:
+            idx = random.randrange(self.calls)
+            if idx < SAMPLE_SIZE:
+                self.samples[idx] = seconds
+
+
+    def quantiles(self):
+        samples = sorted(self.samples)
+        if not samples:
+            return dict((quantile, None) for quantile in QUANTILES)
+        return dict((quantile, samples[min(int(quantile * len(samples)), len(samples) - 1)]) for quantile in QUANTILES)
+
+
+    def asDict(self):
+        stats = {
+            'calls': self.calls,
+            'seconds': self.seconds,
+            'queries': self.queries,
+            'query_seconds': self.query_seconds
+        }
+        for quantile, seconds in self.quantiles().items():
+            stats['p{0:g}'.format(quantile * 100)] = seconds
+        return stats
+
+
+class Instrumentation(object):
+
+    def __init__(self, crm):
+        self.crm = crm
+        self.methods = {}
+        self.equations = {}
+        self._lock = threading.Lock()
+
+        # name of the instrumented method running on each thread, database queries are charged to it
+        self._local = threading.local()
+
+        self._installed = []
+
+
+    def _stats(self, table, name):
+        stats = table.get(name)
+        if stats == None:
+            stats = table[name] = Latency_Stats()
+        return stats
+
+
+    def _timed(self, function, table, name):
+
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            outer = getattr(self._local, 'method', None)
+            self._local.method = name
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                self._local.method = outer
+                with self._lock:
+                    self._stats(table, name).addCall(elapsed)
+
+        return timed
+
+
+    def _counted(self, function):
+
+        @functools.wraps(function)
+        def counted(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    stats = self._stats(self.methods, getattr(self._local, 'method', None) or OTHER)
+                    stats.queries += 1
+                    stats.query_seconds += elapsed
+
+        return counted
+
+
+    def install(self):
+
+        # the wrappers are instance attributes over the class methods, removing them leaves nothing behind
+        if self._installed:
+            return
+
+        for name in INSTRUMENTED_METHODS:
+            self._install(self.crm, name, self._timed(getattr(self.crm, name), self.methods, name))
+
+        for name in dir(type(self.crm)):
+            match = EQUATION_METHOD.match(name)
+            if match != None:
+                label = 'Table {0} Row {1}'.format(*match.groups()[:2]) + (' batch' if match.group(3) else '')
+                self._install(self.crm, name, self._timed(getattr(self.crm, name), self.equations, label))
+
+        if self.crm.database != None:
+            for name in ['fetchAll', 'fetchOne']:
+                self._install(self.crm.database, name, self._counted(getattr(self.crm.database, name)))
+
+        self._rebindEquations()
+
+
+    def _install(self, target, name, wrapper):
+        setattr(target, name, wrapper)
+        self._installed.append((target, name))
+
+
+    def uninstall(self):
+        for target, name in self._installed:
+            delattr(target, name)
+        self._installed = []
+        self._rebindEquations()
+
+
+    def _rebindEquations(self):
+
+        # the dispatch tables hold the equation methods resolved so far, they are pointed at the current attribute
+        for key, (equation, label) in self.crm._grossVolDispatch.items():
+            self.crm._grossVolDispatch[key] = (getattr(self.crm, equation.__name__), label)
+
+        for batchTable in self.crm._grossVolBatchTables.values():
+            equations = batchTable[-1]
+            for idx, (equation, label) in enumerate(equations):
+                equations[idx] = (getattr(self.crm, equation.__name__), label)
+
+
+    def reset(self):
+        with self._lock:
+            self.methods = {}
+            self.equations = {}
+
+
+    def asDict(self):
+        with self._lock:
+            return {
+                'methods': dict((name, stats.asDict()) for name, stats in self.methods.items()),
+                'equations': dict((label, stats.asDict()) for label, stats in self.equations.items())
+            }
+
+
+    def toPrometheus(self, prefix='crm'):
+        stats = self.asDict()
+        lines = []
+
+        for kind, label in [('method', 'method'), ('equation', 'equation')]:
+            name = '{0}_{1}_seconds'.format(prefix, kind)
+            lines.append('# HELP {0} Latency of Component_Ratio_Method {1}s.'.format(name, kind))
+            lines.append('# TYPE {0} summary'.format(name))
+            for key, values in sorted(stats[kind + 's'].items()):
+                if values['calls'] == 0:
+                    continue
+                value = _escapeLabel(key)
+                for quantile in QUANTILES:
+                    lines.append('{0}{{{1}="{2}",quantile="{3:g}"}} {4!r}'.format(
+                                     name, label, value, quantile, values['p{0:g}'.format(quantile * 100)]))
+                lines.append('{0}_sum{{{1}="{2}"}} {3!r}'.format(name, label, value, values['seconds']))
+                lines.append('{0}_count{{{1}="{2}"}} {3}'.format(name, label, value, values['calls']))
+
+        for name, column, helpText in [('db_queries_total', 'queries', 'Coefficient database queries per method.'),
+                                       ('db_query_seconds_total', 'query_seconds', 'Time in coefficient database queries per method.')]:
+            name = '{0}_{1}'.format(prefix, name)
+            lines.append('# HELP {0} {1}'.format(name, helpText))
+            lines.append('# TYPE {0} counter'.format(name))
+            for method, values in sorted(stats['methods'].items()):
+                lines.append('{0}{{method="{1}"}} {2!r}'.format(name, _escapeLabel(method), values[column]))
+
+        return '\n'.join(lines) + '\n'
+
+
+def _escapeLabel(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -0,0 +1,136 @@
+import hashlib, sqlite3
+
+from tree_list import RESULT_COLUMNS
+
+# tree inputs that decide a result, together with the coefficient fingerprint and the crm's validate flag
+KEY_COLUMNS = ('species_cd', 'region', 'dbh', 'height', 'site_index', 'basal_area', 'drc', 'bole_hgt', 'stem_count')
+
+# bump when the stored columns change, a cache file from another version is emptied on open
+CACHE_VERSION = 3
+
+# SQLite limits the number of ? in one statement
+LOOKUP_BATCH = 500
+
+
+class Result_Cache(object):
+
+    def __init__(self, path, fingerprint=None, max_entries=1000000):
+        if max_entries < 1:
+            raise Exception('Max entries must be > 0.')
+
+        self.path = path
+
+        # Component_Ratio_Method.getCoefficientFingerprint, filled in by the pipeline the cache is given to when None
+        self.fingerprint = fingerprint
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self.connect = sqlite3.connect(path)
+        self.connect.execute('PRAGMA journal_mode=WAL')
+        self.connect.execute('PRAGMA synchronous=NORMAL')
+
+        if self.connect.execute('PRAGMA user_version').fetchone()[0] != CACHE_VERSION:
+            self.connect.execute('DROP TABLE IF EXISTS results')
+            self.connect.execute('PRAGMA user_version = {0}'.format(CACHE_VERSION))
+
+        # one column per result so hits come back without decoding
+        self.connect.execute('CREATE TABLE IF NOT EXISTS results (key BLOB PRIMARY KEY, last_used INTEGER NOT NULL, '
+                             '{0}) WITHOUT ROWID'.format(', '.join(RESULT_COLUMNS)))
+        self.connect.execute('CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)')
+        self.connect.commit()
+
+        # last_used is a counter rather than a clock, entries with the lowest values are evicted first
+        self._count, lastUsed = self.connect.execute('SELECT COUNT(*), MAX(last_used) FROM results').fetchone()
+        self._clock = lastUsed if lastUsed != None else 0
+
+        # hits are moved up at most once while the cache is open, later hits of the same tree are free
+        self._sessionStart = self._clock + 1
+
+        self._selectSql = 'SELECT key, last_used, {0} FROM results WHERE key IN '.format(', '.join(RESULT_COLUMNS))
+        self._insertSql = 'INSERT OR IGNORE INTO results (key, last_used, {0}) VALUES ({1})'.format(
+                              ', '.join(RESULT_COLUMNS), ', '.join('?' * (len(RESULT_COLUMNS) + 2)))
+
+
+    def close(self):
+        self.connect.close()
+
+
+    def key(self, tree, validate=True):
+        if self.fingerprint == None:
+            raise Exception('The result cache has no coefficient fingerprint, give it to a pipeline first.')
+
+        # repr keeps ints, floats and text apart so 131 and 131.0 never share a result, results computed
+        # without the per call checks are kept apart from checked ones since their errors can differ
+        normalized = repr((self.fingerprint, bool(validate)) + tuple([tree.get(column) for column in KEY_COLUMNS]))
+        return hashlib.blake2b(normalized.encode('utf-8'), digest_size=16).digest()
+
+
+    def getMany(self, trees, validate=True):
+
+        # result columns for every tree, None where the tree has not been seen with these coefficients
+        keys = [self.key(tree, validate) for tree in trees]
+        uniqueKeys = list(set(keys))
+        found = {}
+        stale = []
+
+        for start in range(0, len(uniqueKeys), LOOKUP_BATCH):
+            batch = uniqueKeys[start:start + LOOKUP_BATCH]
+            placeholders = '({0})'.format(', '.join('?' * len(batch)))
+            for row in self.connect.execute(self._selectSql + placeholders, batch):
+                found[row[0]] = dict(zip(RESULT_COLUMNS, row[2:]))
+                if row[1] < self._sessionStart:
+                    stale.append(row[0])
+
+        # hits last used before this session move to the back of the eviction order
+        if stale:
+            self._clock += 1
+            for start in range(0, len(stale), LOOKUP_BATCH):
+                batch = stale[start:start + LOOKUP_BATCH]
+                self.connect.execute('UPDATE results SET last_used = ? WHERE key IN ({0})'.format(
+                                         ', '.join('?' * len(batch))), [self._clock] + batch)
+            self.connect.commit()
+
+        results = [found.get(key) for key in keys]
+        hits = len(results) - results.count(None)
+        self.hits += hits
+        self.misses += len(results) - hits
+        return results
+
+
+    def putMany(self, results, validate=True):
+        rows = {}
+        for result in results:
+            rows[self.key(result, validate)] = [result.get(column) for column in RESULT_COLUMNS]
+        if not rows:
+            return
+
+        # other processes may share the file, so the count and the clock are read back under the write lock
+        # instead of trusting this instance's own, the new rows are stamped after every row already stored
+        self.connect.execute('BEGIN IMMEDIATE')
+        count, lastUsed = self.connect.execute('SELECT COUNT(*), MAX(last_used) FROM results').fetchone()
+        self._clock = max(self._clock, lastUsed if lastUsed != None else 0) + 1
+
+        before = self.connect.total_changes
+        self.connect.executemany(self._insertSql, [[key, self._clock] + values for key, values in rows.items()])
+        count += self.connect.total_changes - before
+
+        # trims to 90% of the bound so eviction runs once per many chunks instead of on every one,
+        # the rows just written are never among the ones evicted
+        if count > self.max_entries:
+            evict = count - int(self.max_entries * 0.9)
+            cursor = self.connect.execute('DELETE FROM results WHERE key IN (SELECT key FROM results '
+                                          'WHERE last_used < ? ORDER BY last_used LIMIT ?)', (self._clock, evict))
+            count -= cursor.rowcount
+
+        self._count = count
+        self.connect.commit()
+
+
+    def getStats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': self._count,
+            'max_entries': self.max_entries
+        }
@@ -0,0 +1,154 @@
+import csv, numbers
+
+# tree results summed per group, each weighted by the tree's TPA expansion factor
+AGGREGATE_METRICS = ('volcfgrs', 'total_ag', 'bole', 'stump', 'top', 'foliage')
+
+# group_by name resolved from the species table instead of a tree column
+SPECIES_GROUP = 'species_group'
+
+
+class Stand_Aggregator(object):
+
+    def __init__(self, group_by=('plot',), crm=None, plot_column=None, tpa_column='tpa', metrics=AGGREGATE_METRICS):
+        if SPECIES_GROUP in group_by and crm == None:
+            raise Exception('A Component_Ratio_Method is needed to group by species group.')
+
+        self.group_by = tuple(group_by)
+        self.crm = crm
+        self.tpa_column = tpa_column
+        self.metrics = tuple(metrics)
+
+        # with plot_column set the per acre values are averaged over the plots in each group,
+        # for stand totals from plot level expansion factors
+        self.plot_column = plot_column
+
+        # group key -> running totals, only one entry per group is ever held
+        self._groups = {}
+
+
+    def _groupKey(self, result):
+        key = []
+        for column in self.group_by:
+            if column == SPECIES_GROUP:
+                try:
+                    key.append(self.crm._getSpeciesData(result.get('species_cd')).jenkins_spgrpcd)
+                except Exception:
+                    key.append(None)
+            else:
+                key.append(result.get(column))
+        return tuple(key)
+
+
+    def _newGroup(self):
+        return {
+            'trees': 0,
+            'skipped': 0,
+            'tpa': 0.0,
+            'sums': [0.0] * len(self.metrics),
+            'missing': [0] * len(self.metrics),
+            'plots': set()
+        }
+
+
+    def add(self, result):
+        key = self._groupKey(result)
+        group = self._groups.get(key)
+        if group == None:
+            group = self._groups[key] = self._newGroup()
+
+        group['trees'] += 1
+        if self.plot_column != None:
+            group['plots'].add(result.get(self.plot_column))
+
+        # trees that failed or have no expansion factor can not be scaled to an acre
+        tpa = result.get(self.tpa_column)
+        if result.get('error') != None or not isinstance(tpa, numbers.Number):
+            group['skipped'] += 1
+            return
+
+        group['tpa'] += tpa
+        sums = group['sums']
+        missing = group['missing']
+        for idx, metric in enumerate(self.metrics):
+            value = result.get(metric)
+            if value == None:
+                missing[idx] += 1
+            else:
+                sums[idx] += value * tpa
+
+
+    def consume(self, results):
+        for result in results:
+            self.add(result)
+
+
+    def passThrough(self, results):
+
+        # aggregates while handing every result on, e.g. to a per tree writer
+        for result in results:
+            self.add(result)
+            yield result
+
+
+    def merge(self, other):
+
+        # combines the totals of an aggregator that ran over another part of the same inventory
+        if other.group_by != self.group_by or other.metrics != self.metrics:
+            raise Exception('Only aggregators with the same groups and metrics can be merged.')
+        if other.plot_column != self.plot_column or other.tpa_column != self.tpa_column:
+            raise Exception('Only aggregators with the same plot and TPA columns can be merged.')
+
+        for key, theirs in other._groups.items():
+            group = self._groups.get(key)
+            if group == None:
+                group = self._groups[key] = self._newGroup()
+
+            group['trees'] += theirs['trees']
+            group['skipped'] += theirs['skipped']
+            group['tpa'] += theirs['tpa']
+            group['plots'].update(theirs['plots'])
+            for idx in range(len(self.metrics)):
+                group['sums'][idx] += theirs['sums'][idx]
+                group['missing'][idx] += theirs['missing'][idx]
+
+        return self
+
+
+    def rows(self):
+        rows = []
+        for key, group in self._groups.items():
+            row = dict(zip(self.group_by, key))
+            row['trees'] = group['trees']
+            row['skipped'] = group['skipped']
+
+            plots = len(group['plots']) if self.plot_column != None else 1
+            if self.plot_column != None:
+                row['plots'] = plots
+
+            row['tpa'] = group['tpa'] / plots
+            for idx, metric in enumerate(self.metrics):
+                row[metric + '_per_acre'] = group['sums'][idx] / plots
+                row[metric + '_missing'] = group['missing'][idx]
+
+            rows.append(row)
+
+        return rows
+
+
+    def columns(self):
+        columns = list(self.group_by) + ['trees', 'skipped']
+        if self.plot_column != None:
+            columns.append('plots')
+        columns.append('tpa')
+        for metric in self.metrics:
+            columns.extend([metric + '_per_acre', metric + '_missing'])
+        return columns
+
+
+    def writeCsv(self, outputPath):
+        rows = self.rows()
+        with open(outputPath, 'w', newline='') as csvFile:
+            writer = csv.DictWriter(csvFile, fieldnames=self.columns())
+            writer.writeheader()
+            writer.writerows(rows)
+        return len(rows)
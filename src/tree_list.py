@@ -0,0 +1,497 @@
+import collections, concurrent.futures, csv, multiprocessing, numbers, os
+
+import crm_kernels
+from component_ratio_method import Component_Ratio_Method, treeErrors
+
+# input columns read from a tree list, stem_count and the plot, condition and tpa columns used
+# by stand_aggregation are optional
+TREE_COLUMNS = ('species_cd', 'region', 'dbh', 'height', 'site_index',
+                'basal_area', 'drc', 'bole_hgt', 'stem_count', 'plot', 'condition', 'tpa')
+
+# columns added to every tree in the output, stump, top and the _crm columns are scaled by the component ratio
+# adjustment factor and left empty when the tree has no gross volume
+RESULT_COLUMNS = ('volcfgrs', 'total_ag', 'stem', 'bark', 'bole', 'foliage', 'root', 'stump', 'top',
+                  'adjustment_factor', 'bole_crm', 'foliage_crm', 'total_ag_crm', 'error')
+
+INTEGER_COLUMNS = ('species_cd', 'stem_count')
+TEXT_COLUMNS = ('region', 'plot', 'condition', 'error')
+
+
+class Tree_List_Pipeline(object):
+
+    def __init__(self, crm=None, chunk_size=10000, result_cache=None):
+        if chunk_size < 1:
+            raise Exception('Chunk size must be > 0.')
+
+        # a crm made here is closed with the pipeline, one passed in belongs to the caller
+        self.crm = crm if crm != None else Component_Ratio_Method()
+        self._ownsCrm = crm == None
+        self.chunk_size = chunk_size
+
+        # optional result_cache.Result_Cache, trees already computed with the same coefficients are not redone,
+        # its fingerprint comes from the coefficients this pipeline reads so results from others are never served
+        self.result_cache = result_cache
+        if result_cache != None:
+            fingerprint = self.crm.getCoefficientFingerprint()
+            if result_cache.fingerprint == None:
+                result_cache.fingerprint = fingerprint
+            elif result_cache.fingerprint != fingerprint:
+                raise Exception('The result cache was opened for other coefficients than the pipeline uses.')
+
+
+    def close(self):
+        if self._ownsCrm:
+            self.crm.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+
+    def _isParquet(self, path):
+        return os.path.splitext(path)[1].lower() in ['.parquet', '.pq']
+
+
+    def _requirePyarrow(self):
+        try:
+            import pyarrow, pyarrow.parquet
+        except ImportError:
+            raise Exception('pyarrow is required to read or write Parquet files.')
+        return pyarrow, pyarrow.parquet
+
+
+    def _parseValue(self, column, value):
+
+        # csv gives strings, blank cells are missing values
+        if isinstance(value, str):
+            value = value.strip()
+            if value == '':
+                return None
+            if column in INTEGER_COLUMNS:
+                return self._parseInteger(column, self._parseFloat(column, value))
+            if column not in TEXT_COLUMNS:
+                return self._parseFloat(column, value)
+            return value
+
+        # plot and condition ids often come in as numbers from Parquet or JSON
+        if value != None and column in TEXT_COLUMNS:
+            return str(value)
+
+        # 101.0 from a float column is species 101, 101.7 is a bad row rather than species 101
+        if isinstance(value, float) and column in INTEGER_COLUMNS:
+            return self._parseInteger(column, value)
+
+        return value
+
+
+    def _parseFloat(self, column, value):
+        try:
+            return float(value)
+        except ValueError:
+            raise ValueError('{0} must be a number, got {1!r}.'.format(column, value))
+
+
+    def _parseInteger(self, column, value):
+        if not value.is_integer():
+            raise ValueError('{0} must be an integer, got {1!r}.'.format(column, value))
+        return int(value)
+
+
+    def _parseTree(self, record):
+        return dict((column, self._parseValue(column, record.get(column))) for column in TREE_COLUMNS)
+
+
+    def _parseRecord(self, record, columns):
+
+        # the columns that parse are kept, the others are left empty and named in the row's error
+        values = {}
+        errors = []
+        for column in columns:
+            try:
+                values[column] = self._parseValue(column, record.get(column))
+            except ValueError as e:
+                values[column] = None
+                errors.append(str(e))
+
+        return values, errors
+
+
+    def _readTree(self, record):
+
+        # a row of a file that does not parse is written out with its error instead of stopping the run
+        tree, errors = self._parseRecord(record, TREE_COLUMNS)
+        if errors:
+            tree['error'] = '; '.join(errors)
+        return tree
+
+
+    def _readCsvChunks(self, path):
+        with open(path, newline='') as csvFile:
+            chunk = []
+            for record in csv.DictReader(csvFile):
+                chunk.append(self._readTree(record))
+                if len(chunk) == self.chunk_size:
+                    yield chunk
+                    chunk = []
+
+            if chunk:
+                yield chunk
+
+
+    def _readParquetChunks(self, path):
+        pyarrow, parquet = self._requirePyarrow()
+        parquetFile = parquet.ParquetFile(path)
+        columns = [column for column in TREE_COLUMNS if column in parquetFile.schema_arrow.names]
+
+        for batch in parquetFile.iter_batches(batch_size=self.chunk_size, columns=columns):
+            yield [self._readTree(record) for record in batch.to_pylist()]
+
+
+    def readChunks(self, path):
+        if self._isParquet(path):
+            return self._readParquetChunks(path)
+        return self._readCsvChunks(path)
+
+
+    def _parseResult(self, record):
+        result, errors = self._parseRecord(record, TREE_COLUMNS + RESULT_COLUMNS)
+        if errors:
+            result['error'] = '; '.join(errors)
+        return result
+
+
+    def _readResultChunks(self, path):
+
+        # a file written by run, read back with its result columns
+        if self._isParquet(path):
+            pyarrow, parquet = self._requirePyarrow()
+            for batch in parquet.ParquetFile(path).iter_batches(batch_size=self.chunk_size):
+                yield [self._parseResult(record) for record in batch.to_pylist()]
+            return
+
+        with open(path, newline='') as csvFile:
+            chunk = []
+            for record in csv.DictReader(csvFile):
+                chunk.append(self._parseResult(record))
+                if len(chunk) == self.chunk_size:
+                    yield chunk
+                    chunk = []
+
+            if chunk:
+                yield chunk
+
+
+    def _emptyResult(self, tree):
+        result = dict(tree)
+        for column in RESULT_COLUMNS:
+            result[column] = None
+        return result
+
+
+    def processTree(self, tree):
+        result = self._emptyResult(tree)
+
+        crm = self.crm
+        try:
+            species = crm._getSpeciesData(tree['species_cd'])
+            dbh = tree['dbh']
+
+            result['volcfgrs'] = crm.getVOLCFGRS(species, tree['region'],
+                                                 dbh=dbh,
+                                                 height=tree['height'],
+                                                 basal_area=tree['basal_area'],
+                                                 site_index=tree['site_index'],
+                                                 stem_count=tree['stem_count'],
+                                                 drc=tree['drc'],
+                                                 bole_hgt=tree['bole_hgt'])
+
+            components = crm._calcJenkinsComponentsLbs(species, dbh)
+            result.update(components._asdict())
+
+            if isinstance(result['volcfgrs'], numbers.Number):
+                result.update(crm._calcComponentRatioBiomass(species, dbh, result['volcfgrs'], components)._asdict())
+
+        # a bad tree is reported in its row instead of stopping the whole file
+        except Exception as e:
+            result['error'] = str(e)
+
+        return result
+
+
+    def processChunk(self, trees):
+
+        # trees the reader could not parse already carry their error and are passed through in place
+        if any('error' in tree for tree in trees):
+            computed = iter(self._processParsedChunk([tree for tree in trees if 'error' not in tree]))
+            return [dict(self._emptyResult(tree), error=tree['error']) if 'error' in tree else next(computed)
+                    for tree in trees]
+
+        return self._processParsedChunk(trees)
+
+
+    def _processParsedChunk(self, trees):
+        if self.result_cache == None:
+            return self._computeChunk(trees)
+
+        # only the trees the cache has not seen are computed, results keep their input order
+        cached = self.result_cache.getMany(trees, self.crm.validate)
+        computed = iter(self._computeChunk([tree for tree, result in zip(trees, cached) if result == None]))
+
+        results = []
+        fresh = []
+        for tree, cachedResult in zip(trees, cached):
+            if cachedResult == None:
+                result = next(computed)
+                fresh.append(result)
+            else:
+                result = self._emptyResult(tree)
+                result.update(cachedResult)
+            results.append(result)
+
+        self.result_cache.putMany(fresh, self.crm.validate)
+        return results
+
+
+    def _computeChunk(self, trees):
+        if self.crm.validate:
+            return [self.processTree(tree) for tree in trees]
+
+        # the chunk is validated once so the calculations can run without their per call checks
+        failures = {}
+        for failure in self.crm.validateTrees(trees):
+            failures[failure['row']] = '; '.join(failure['errors'])
+
+        results = []
+        for row, tree in enumerate(trees):
+            if row in failures:
+                result = self._emptyResult(tree)
+                result['error'] = failures[row]
+            else:
+                result = self.processTree(tree)
+            results.append(result)
+
+        return results
+
+
+    def _chunk(self, trees):
+        chunk = []
+        for tree in trees:
+            chunk.append(tree)
+            if len(chunk) == self.chunk_size:
+                yield chunk
+                chunk = []
+
+        if chunk:
+            yield chunk
+
+
+    def _processChunks(self, chunks):
+        for chunk in chunks:
+            yield self.processChunk(chunk)
+
+
+    def process(self, trees):
+
+        # streams results for any iterable of tree dicts, one chunk in memory at a time
+        for results in self._processChunks(self._chunk(trees)):
+            for result in results:
+                yield result
+
+
+    def _parquetSchema(self, pyarrow):
+        fields = []
+        for column in TREE_COLUMNS + RESULT_COLUMNS:
+            if column in INTEGER_COLUMNS:
+                fields.append((column, pyarrow.int64()))
+            elif column in TEXT_COLUMNS:
+                fields.append((column, pyarrow.string()))
+            else:
+                fields.append((column, pyarrow.float64()))
+        return pyarrow.schema(fields)
+
+
+    def _writeResults(self, outputPath, resultChunks):
+        count = 0
+
+        if self._isParquet(outputPath):
+            pyarrow, parquet = self._requirePyarrow()
+            schema = self._parquetSchema(pyarrow)
+            with parquet.ParquetWriter(outputPath, schema) as writer:
+                for results in resultChunks:
+                    writer.write_table(pyarrow.Table.from_pylist(results, schema=schema))
+                    count += len(results)
+
+        else:
+            with open(outputPath, 'w', newline='') as csvFile:
+                writer = csv.DictWriter(csvFile, fieldnames=TREE_COLUMNS + RESULT_COLUMNS)
+                writer.writeheader()
+                for results in resultChunks:
+                    writer.writerows(results)
+                    count += len(results)
+
+        return count
+
+
+    def run(self, inputPath, outputPath):
+        return self._writeResults(outputPath, self._processChunks(self.readChunks(inputPath)))
+
+
+    def recompute(self, resultsPath, outputPath, diff):
+
+        # rewrites a stored result file for the new coefficients of a coefficient_diff.Coefficient_Diff,
+        # only the trees it affects are computed again and every other row is copied as it was
+        if self.crm.getCoefficientFingerprint() != diff.newFingerprint:
+            raise Exception('The pipeline must use the new coefficients of the diff.')
+
+        stored = collections.deque()
+        recomputed = [0]
+
+        def affectedChunks():
+            for results in self._readResultChunks(resultsPath):
+                rows = [row for row, result in enumerate(results) if diff.affectsTree(result)]
+                stored.append((results, rows))
+                recomputed[0] += len(rows)
+                yield [dict((column, results[row][column]) for column in TREE_COLUMNS) for row in rows]
+
+        def mergedChunks():
+            for fresh in self._processChunks(affectedChunks()):
+                results, rows = stored.popleft()
+                for row, result in zip(rows, fresh):
+                    results[row] = result
+                yield results
+
+        count = self._writeResults(outputPath, mergedChunks())
+        return count, recomputed[0]
+
+
+    def aggregate(self, inputPath, aggregator):
+
+        # tree results go straight into the aggregator's grouped sums, no per tree table is kept
+        for results in self._processChunks(self.readChunks(inputPath)):
+            aggregator.consume(results)
+        return aggregator
+
+
+# pipeline owned by each worker process, built by _initWorker
+_workerPipeline = None
+
+
+def _initWorker(chunk_size, region_ids, validate, snapshot_path):
+    global _workerPipeline
+
+    # every worker opens its own database connection and loads its own coefficient caches,
+    # with a snapshot the workers map the same file and share its pages instead
+    crm = Component_Ratio_Method(validate=validate, snapshot_path=snapshot_path)
+    crm.preloadCoefficients(region_ids)
+    _workerPipeline = Tree_List_Pipeline(crm, chunk_size)
+
+
+def _processChunkInWorker(trees):
+    return _workerPipeline.processChunk(trees)
+
+
+class Parallel_Tree_List_Pipeline(Tree_List_Pipeline):
+
+    def __init__(self, processes=None, chunk_size=10000, region_ids=None, validate=True, snapshot_path=None):
+
+        # the parent's instance opens nothing until asked, it only names the coefficients the workers load
+        super().__init__(Component_Ratio_Method(validate=validate, snapshot_path=snapshot_path), chunk_size)
+        self._ownsCrm = True
+        self.processes = processes if processes != None else os.cpu_count()
+        self.region_ids = region_ids
+        self.validate = validate
+        self.snapshot_path = snapshot_path
+
+        # started on the first chunk and kept until close, so the workers load the coefficients once
+        self._pool = None
+
+
+    def _getPool(self):
+        if self._pool == None:
+            initArgs = (self.chunk_size, self.region_ids, self.validate, self.snapshot_path)
+            self._pool = multiprocessing.Pool(self.processes, _initWorker, initArgs)
+        return self._pool
+
+
+    def close(self):
+        if self._pool != None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+        super().close()
+
+
+    def _processChunks(self, chunks):
+
+        # keeps a bounded number of chunks in flight so memory stays tied to the chunk size,
+        # results are collected oldest first which keeps them in input order
+        pool = self._getPool()
+        pending = collections.deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(_processChunkInWorker, (chunk,)))
+            if len(pending) > self.processes * 2:
+                yield pending.popleft().get()
+
+        while pending:
+            yield pending.popleft().get()
+
+
+    def processChunk(self, trees):
+        return next(self._processChunks([trees]))
+
+
+class Threaded_Tree_List_Pipeline(Tree_List_Pipeline):
+
+    def __init__(self, crm=None, threads=None, chunk_size=10000, region_ids=None):
+        if threads != None and threads < 1:
+            raise Exception('Threads must be > 0.')
+
+        super().__init__(crm, chunk_size)
+        self.threads = threads if threads != None else os.cpu_count()
+
+        # the threads only read these, the Component_Ratio_Method and its database are not touched while they run
+        self.tables = crm_kernels.Coefficient_Tables(self.crm, region_ids)
+
+        self._executor = concurrent.futures.ThreadPoolExecutor(self.threads)
+
+
+    def close(self):
+        self._executor.shutdown()
+        super().close()
+
+
+    def _computeTrees(self, trees):
+
+        # every tree is checked the way validateTrees does, then run through the stateless kernels
+        results = []
+        for tree in trees:
+            result = self._emptyResult(tree)
+            errors = treeErrors(self.tables, tree)
+            if errors:
+                result['error'] = '; '.join(errors)
+            else:
+                try:
+                    result.update(crm_kernels.treeResults(self.tables, tree))
+                except Exception as e:
+                    result['error'] = str(e)
+            results.append(result)
+
+        return results
+
+
+    def _computeChunk(self, trees):
+
+        # a chunk is split into one slice per thread and put back together in input order,
+        # on free threaded builds the slices run in parallel
+        bounds = [len(trees) * idx // self.threads for idx in range(self.threads + 1)]
+        futures = [self._executor.submit(self._computeTrees, trees[start:stop])
+                   for start, stop in zip(bounds, bounds[1:]) if stop > start]
+
+        results = []
+        for future in futures:
+            results.extend(future.result())
+        return results
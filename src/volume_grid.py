@@ -0,0 +1,347 @@
+import collections, numbers
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from component_ratio_method import Component_Ratio_Method
+
+# start, stop and step of the grid axes, DBH in inches and height in feet
+DEFAULT_DBH_GRID = (1.0, 60.0, 0.25)
+DEFAULT_HEIGHT_GRID = (5.0, 150.0, 1.0)
+
+# target |approximate - exact| / |exact|. When a grid is built every cell is checked against half of it at the
+# cell centre and the middle of its four edges, a cell that misses at any of them or has a corner without a volume
+# is answered by the exact equation. This is an estimate rather than a bound, a branch of an equation that starts
+# strictly between the check points (e.g. dbh^2 * height <= b1 in Table 3 Row 2) goes unseen
+DEFAULT_MAX_RELATIVE_ERROR = 1e-3
+
+# most grids kept, the least recently used is dropped when another is built
+DEFAULT_MAX_GRIDS = 256
+
+# measurements besides DBH and height, in the order Volume_Grid takes them
+GRID_KEY_MEASUREMENTS = ('basal_area', 'site_index', 'stem_count', 'drc', 'bole_hgt')
+
+# the measurements besides DBH and height each equation reads, a grid is keyed on these alone. Only equations
+# reading nothing else are approximated in getVOLCFGRSBatch, the others would need a grid per tree for
+# continuous inputs such as site_index or bole_hgt. Equations not listed have no formula and are never approximated
+GRID_EQUATION_MEASUREMENTS = {
+    'Table 1 Row 1': ('site_index',),
+    'Table 1 Row 2': ('basal_area', 'site_index'),
+    'Table 1 Row 3': ('site_index', 'drc'),
+    'Table 1 Row 4': ('site_index',),
+    'Table 1 Row 5': ('bole_hgt',),
+    'Table 2 Row 1': (),
+    'Table 2 Row 2': ('drc',),
+    'Table 2 Row 3': ('drc',),
+    'Table 2 Row 4': (),
+    'Table 2 Row 5': (),
+    'Table 3 Row 1': (),
+    'Table 3 Row 2': (),
+    'Table 3 Row 3': (),
+    'Table 3 Row 4': (),
+    'Table 3 Row 5': (),
+    'Table 3 Row 6': (),
+    'Table 3 Row 7': ('drc',),
+    'Table 3 Row 8': (),
+    'Table 3 Row 9': (),
+    'Table 3 Row 10': ('stem_count', 'drc'),
+    'Table 3 Row 11': ('drc',),
+    'Table 3 Row 12': ('stem_count', 'drc'),
+    'Table 4 Row 1': (),
+    'Table 4 Row 2': (),
+    'Table 4 Row 3': (),
+    'Table 4 Row 4': (),
+    'Table 4 Row 5': ('stem_count', 'drc'),
+    'Table 4 Row 6': ()
+}
+
+
+class Volume_Grid(object):
+
+    # exact gross volumes of one species in one region on a DBH x height lattice, read back by bilinear interpolation
+    def __init__(self, crm, species_cd, region_id, measurements, dbh_grid, height_grid, max_relative_error):
+        self.dbhStart, dbhStop, self.dbhStep = dbh_grid
+        self.heightStart, heightStop, self.heightStep = height_grid
+        self.dbhNodes = int(round((dbhStop - self.dbhStart) / self.dbhStep)) + 1
+        self.heightNodes = int(round((heightStop - self.heightStart) / self.heightStep)) + 1
+        if self.dbhNodes < 2 or self.heightNodes < 2:
+            raise Exception('A volume grid needs at least two points on each axis.')
+
+        self.crm = crm
+        self.species_cd = species_cd
+        self.region_id = region_id
+        self.measurements = measurements
+
+        dbhs = self.dbhStart + self.dbhStep * np.arange(self.dbhNodes)
+        heights = self.heightStart + self.heightStep * np.arange(self.heightNodes)
+        dbhMiddles = dbhs[:-1] + self.dbhStep / 2.0
+        heightMiddles = heights[:-1] + self.heightStep / 2.0
+
+        nodes = self._exact(dbhs, heights)
+        v00 = nodes[:-1, :-1]
+        v10 = nodes[1:, :-1]
+        v01 = nodes[:-1, 1:]
+        v11 = nodes[1:, 1:]
+
+        dbhEdges = self._exact(dbhMiddles, heights)
+        heightEdges = self._exact(dbhs, heightMiddles)
+        checks = [(self._exact(dbhMiddles, heightMiddles), (v00 + v10 + v01 + v11) / 4.0),
+                  (dbhEdges[:, :-1], (v00 + v10) / 2.0),
+                  (dbhEdges[:, 1:], (v01 + v11) / 2.0),
+                  (heightEdges[:-1, :], (v00 + v01) / 2.0),
+                  (heightEdges[1:, :], (v10 + v11) / 2.0)]
+
+        usable = np.isfinite(v00) & np.isfinite(v10) & np.isfinite(v01) & np.isfinite(v11)
+        with np.errstate(invalid='ignore'):
+            for exact, approximate in checks:
+                usable &= np.isfinite(exact) & (np.abs(approximate - exact) <= max_relative_error * 0.5 * np.abs(exact))
+
+        # per cell v00 + b * fx + c * fy + d * fx * fy, one row per cell with NaN in the cells left to the exact equation
+        cells = np.column_stack([v00.reshape(-1), (v10 - v00).reshape(-1), (v01 - v00).reshape(-1),
+                                 (v11 - v10 - v01 + v00).reshape(-1)])
+        cells[~usable.reshape(-1)] = np.nan
+        self.cells = cells
+        self.usableCells = int(usable.sum())
+
+
+    def _exact(self, dbhs, heights):
+        dbhMesh, heightMesh = np.meshgrid(dbhs, heights, indexing='ij')
+        count = dbhMesh.size
+
+        # grid points are not trees, they are left out of the equation trace
+        trace = self.crm.equationTrace
+        self.crm.equationTrace = None
+        try:
+            volumes = self.crm.getVOLCFGRSBatch(np.full(count, self.species_cd), self.region_id,
+                                                dbhMesh.reshape(-1), heightMesh.reshape(-1),
+                                                *self.measurements)
+        finally:
+            self.crm.equationTrace = trace
+
+        return volumes.reshape(dbhMesh.shape)
+
+
+    def interpolate(self, dbh, height):
+
+        # None when the point is off the grid or in a cell that failed its check
+        x = (dbh - self.dbhStart) / self.dbhStep
+        y = (height - self.heightStart) / self.heightStep
+        if not (0.0 <= x <= self.dbhNodes - 1 and 0.0 <= y <= self.heightNodes - 1):
+            return None
+
+        i = min(int(x), self.dbhNodes - 2)
+        j = min(int(y), self.heightNodes - 2)
+        a, b, c, d = self.cells[i * (self.heightNodes - 1) + j].tolist()
+        if a != a:
+            return None
+
+        fx = x - i
+        fy = y - j
+        return a + b * fx + c * fy + d * fx * fy
+
+
+    def interpolateBatch(self, dbhs, heights):
+
+        # interpolated volumes and a mask of the trees the grid can not answer
+        x = (dbhs - self.dbhStart) / self.dbhStep
+        y = (heights - self.heightStart) / self.heightStep
+        inside = (x >= 0.0) & (x <= self.dbhNodes - 1) & (y >= 0.0) & (y <= self.heightNodes - 1)
+
+        i = np.minimum(np.where(inside, x, 0.0).astype(np.int64), self.dbhNodes - 2)
+        j = np.minimum(np.where(inside, y, 0.0).astype(np.int64), self.heightNodes - 2)
+        fx = x - i
+        fy = y - j
+
+        a, b, c, d = self.cells[i * (self.heightNodes - 1) + j].T
+        volumes = a + b * fx + c * fy + d * fx * fy
+        answered = inside & np.isfinite(volumes)
+
+        return np.where(answered, volumes, np.nan), ~answered
+
+
+    def getVOLCFGRS(self, dbh, height):
+        volume = None
+        if isinstance(dbh, numbers.Number) and isinstance(height, numbers.Number):
+            volume = self.interpolate(dbh, height)
+        if volume != None:
+            return volume
+
+        basal_area, site_index, stem_count, drc, bole_hgt = self.measurements
+        return self.crm.getVOLCFGRS(self.crm._getSpeciesData(self.species_cd), self.region_id,
+                                    dbh=dbh,
+                                    height=height,
+                                    basal_area=basal_area,
+                                    site_index=site_index,
+                                    stem_count=stem_count,
+                                    drc=drc,
+                                    bole_hgt=bole_hgt)
+
+
+    def getVOLCFGRSBatch(self, dbhs, heights):
+        dbhs = np.asarray(dbhs, dtype=np.float64).reshape(-1)
+        heights = np.asarray(heights, dtype=np.float64).reshape(-1)
+        if dbhs.shape != heights.shape:
+            raise Exception('DBH and height must be the same length.')
+
+        with np.errstate(invalid='ignore'):
+            volcfgrs, needExact = self.interpolateBatch(dbhs, heights)
+
+        exactRows = np.nonzero(needExact)[0]
+        if exactRows.size:
+            volcfgrs[exactRows] = self.crm.getVOLCFGRSBatch(np.full(exactRows.size, self.species_cd), self.region_id,
+                                                            dbhs[exactRows], heights[exactRows], *self.measurements)
+        return volcfgrs
+
+
+class Volume_Approximator(object):
+
+    def __init__(self, crm=None, dbh_grid=DEFAULT_DBH_GRID, height_grid=DEFAULT_HEIGHT_GRID,
+                 max_relative_error=DEFAULT_MAX_RELATIVE_ERROR, max_grids=DEFAULT_MAX_GRIDS):
+        if np == None:
+            raise Exception('NumPy is required for volume grids.')
+        if max_relative_error <= 0:
+            raise Exception('Max relative error must be > 0.')
+        if max_grids < 1:
+            raise Exception('Max grids must be > 0.')
+
+        self.crm = crm if crm != None else Component_Ratio_Method()
+        self.dbh_grid = tuple(dbh_grid)
+        self.height_grid = tuple(height_grid)
+        self.max_relative_error = max_relative_error
+        self.max_grids = max_grids
+
+        # (rgn_config_id, species_cd) and the measurements its equation reads -> Volume_Grid, built on first use
+        # and kept in least recently used order
+        self._grids = collections.OrderedDict()
+        self.approximated = 0
+        self.exact = 0
+
+
+    def getVolumeCurve(self, species_cd, region_id,
+                       basal_area=None,
+                       site_index=None,
+                       stem_count=None,
+                       drc=None,
+                       bole_hgt=None):
+
+        # the grid of one species and set of measurements, the fastest way to sweep DBH and height when the rest is fixed
+        return self._getGrid(species_cd, region_id, (basal_area, site_index, stem_count, drc, bole_hgt))
+
+
+    def _getEquationMeasurements(self, species_cd, region_id):
+
+        # the measurements besides DBH and height the species' equation in the region reads, None when it
+        # has no equation there or one without a formula
+        try:
+            adjGrossVolSpeciesId, b = self.crm._getGrossVolSpeciesCodeAndCoeff(species_cd, region_id)
+            entry = self.crm._grossVolDispatch.get((region_id, adjGrossVolSpeciesId))
+            if entry == None:
+                entry = self.crm._getGrossVolDispatchEntry(region_id, adjGrossVolSpeciesId)
+        except Exception:
+            return None
+
+        return GRID_EQUATION_MEASUREMENTS.get(entry[1])
+
+
+    def _getGrid(self, species_cd, region_id, measurements):
+
+        # measurements the equation does not read are left out of the key and the grid, an equation without a
+        # formula keeps them all
+        used = self._getEquationMeasurements(species_cd, region_id)
+        if used != None:
+            measurements = tuple(value if column in used else None
+                                 for column, value in zip(GRID_KEY_MEASUREMENTS, measurements))
+
+        key = (region_id, species_cd) + measurements
+        grid = self._grids.get(key)
+        if grid != None:
+            self._grids.move_to_end(key)
+            return grid
+
+        grid = Volume_Grid(self.crm, species_cd, region_id, measurements,
+                           self.dbh_grid, self.height_grid, self.max_relative_error)
+        self._grids[key] = grid
+        if len(self._grids) > self.max_grids:
+            self._grids.popitem(last=False)
+        return grid
+
+
+    def getVOLCFGRSBatch(self, species_cds, region_ids,
+                         dbh=None,
+                         height=None,
+                         basal_area=None,
+                         site_index=None,
+                         stem_count=None,
+                         drc=None,
+                         bole_hgt=None):
+        crm = self.crm
+
+        # NaN where Component_Ratio_Method.getVOLCFGRSBatch gives NaN, otherwise interpolated where the species'
+        # equation reads only DBH and height and the grid cell passed its check, exact everywhere else
+        species_cds = np.asarray(species_cds, dtype=np.int64).reshape(-1)
+        count = species_cds.size
+        region_ids = np.asarray(region_ids, dtype=str)
+        if region_ids.ndim == 0:
+            region_ids = np.full(count, str(region_ids))
+        region_ids = region_ids.reshape(-1)
+        if region_ids.size != count:
+            raise Exception('Region ids must be the same length as the species codes.')
+
+        measurements = tuple(crm._batchColumn(values, count)
+                             for values in (dbh, height, basal_area, site_index, stem_count, drc, bole_hgt))
+        dbhs, heights = measurements[:2]
+
+        volcfgrs = np.full(count, np.nan)
+        needExact = np.ones(count, dtype=bool)
+
+        # trees are grouped by species and region, each column is numbered on its own and the numbers are combined
+        # into one integer key
+        keys = np.zeros(count, dtype=np.int64)
+        for column in [species_cds, region_ids]:
+            if count == 0 or np.all(column == column[0]):
+                continue
+            values, codes = np.unique(column, return_inverse=True)
+
+            # renumbered after every column so the key never outgrows the number of trees squared
+            keys = np.unique(keys * values.size + codes.reshape(-1), return_inverse=True)[1].reshape(-1)
+
+        groupKeys, firstRows, groupRows = np.unique(keys, return_index=True, return_inverse=True)
+        groupRows = groupRows.reshape(-1)
+        order = np.argsort(groupRows, kind='stable')
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(groupRows, minlength=groupKeys.size))])
+
+        with np.errstate(all='ignore'):
+            for groupIdx, first in enumerate(firstRows.tolist()):
+                species_cd = int(species_cds[first])
+                region_id = str(region_ids[first])
+                if self._getEquationMeasurements(species_cd, region_id) != ():
+                    continue
+
+                rows = order[bounds[groupIdx]:bounds[groupIdx + 1]]
+                grid = self._getGrid(species_cd, region_id, (None,) * len(GRID_KEY_MEASUREMENTS))
+                volcfgrs[rows], needExact[rows] = grid.interpolateBatch(dbhs[rows], heights[rows])
+
+        exactRows = np.nonzero(needExact)[0]
+        if exactRows.size:
+            volcfgrs[exactRows] = crm.getVOLCFGRSBatch(species_cds[exactRows], region_ids[exactRows],
+                                                       *(column[exactRows] for column in measurements))
+
+        self.exact += exactRows.size
+        self.approximated += count - exactRows.size
+        return volcfgrs
+
+
+    def getStats(self):
+        cells = sum(len(grid.cells) for grid in self._grids.values())
+        usable = sum(grid.usableCells for grid in self._grids.values())
+        return {
+            'grids': len(self._grids),
+            'usable_cells': usable,
+            'exact_cells': cells - usable,
+            'approximated': self.approximated,
+            'exact': self.exact,
+            'max_grids': self.max_grids,
+            'max_relative_error': self.max_relative_error
+        }
@@ -0,0 +1,6 @@
+import os, sys
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(TESTS_DIR, 'fixtures')
+
+sys.path.insert(0, os.path.join(TESTS_DIR, '..', 'src'))
@@ -0,0 +1,87 @@
+import argparse, contextlib, importlib, io, itertools, json, os, sqlite3, sys
+
+# records getVOLCFGRS of a source tree, e.g. a git worktree of the baseline, for test_gross_volume.py:
+#   python record_gross_volume.py BASELINE_SRC FIXED_SRC gross_volume_baseline.json
+# BASELINE_SRC printed each Table/Row label, which is kept as the case label. Where it failed with a TypeError
+# and FIXED_SRC, the commit that fixed those rows, does not, the fixed value is recorded and the case listed in fixed
+
+# measurements tried on every case, dbh x the other columns
+DBHS = (3.0, 8.0, 25.0)
+MEASUREMENTS = ({'height': 60.0, 'site_index': 65.0, 'basal_area': 120.0, 'stem_count': 1, 'drc': 6.0, 'bole_hgt': 30.0},
+                {'height': None, 'site_index': 65.0, 'basal_area': None, 'stem_count': 2, 'drc': 6.0, 'bole_hgt': None},
+                {'height': 60.0, 'site_index': None, 'basal_area': 120.0, 'stem_count': 2, 'drc': None, 'bole_hgt': None},
+                {'height': 120.0, 'site_index': 100.0, 'basal_area': 250.0, 'stem_count': 1, 'drc': 20.0, 'bole_hgt': 50.0})
+
+# species and regions that take the error paths
+EXTRA_CASES = [(58, 'S26LCA'), (58, 'XX'), (99999, 'S33')]
+
+
+def selectCases(db_path):
+
+    # one species per distinct region, gross volume species code and coefficient row, plus config rows without coefficients
+    connection = sqlite3.connect(db_path)
+    columns = ', '.join('b{0}'.format(idx) for idx in range(20))
+    cases = connection.execute('SELECT MIN(species_cd), rgn_config_id FROM vw_gross_vol_coeff '
+                               'GROUP BY rgn_config_id, gross_cf_spcd, coeff_tbl_name, stem_count, stem_size, {0}'.format(columns)).fetchall()
+    cases += connection.execute('SELECT MIN(species_cd), rgn_config_id FROM config c WHERE NOT EXISTS '
+                                '(SELECT 1 FROM vw_gross_vol_coeff v WHERE v.species_cd = c.species_cd AND v.rgn_config_id = c.rgn_config_id) '
+                                'GROUP BY rgn_config_id, gross_cf_spcd').fetchall()
+    connection.close()
+    return sorted(set(cases)) + EXTRA_CASES
+
+
+def loadCrm(src):
+    sys.path.insert(0, src)
+    try:
+        module = importlib.import_module('component_ratio_method')
+        crm = module.Component_Ratio_Method()
+    finally:
+        sys.path.remove(src)
+        for name in list(sys.modules):
+            if getattr(sys.modules[name], '__file__', None) and sys.modules[name].__file__.startswith(os.path.abspath(src)):
+                del sys.modules[name]
+    return crm
+
+
+def evaluate(crm, species_cd, region_id, dbh, measurements):
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        try:
+            value = crm.getVOLCFGRS(crm._getSpeciesData(species_cd), region_id, dbh=dbh, **measurements)
+        except Exception as e:
+            value = '{0}: {1}'.format(type(e).__name__, e)
+    return ' '.join(output.getvalue().split()) or None, value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Records gross volumes for the regression test.')
+    parser.add_argument('baseline_src')
+    parser.add_argument('fixed_src')
+    parser.add_argument('output')
+    args = parser.parse_args(argv)
+
+    baseline = loadCrm(os.path.abspath(args.baseline_src))
+    fixed = loadCrm(os.path.abspath(args.fixed_src))
+
+    inputs = [dict(measurements, dbh=dbh) for dbh, measurements in itertools.product(DBHS, MEASUREMENTS)]
+    cases = []
+    fixedCases = []
+    for species_cd, region_id in selectCases(baseline.db):
+        for inputIdx, measurements in enumerate(inputs):
+            measurements = dict(measurements)
+            dbh = measurements.pop('dbh')
+            label, value = evaluate(baseline, species_cd, region_id, dbh, measurements)
+            if isinstance(value, str) and value.startswith('TypeError'):
+                fixedValue = evaluate(fixed, species_cd, region_id, dbh, measurements)[1]
+                if fixedValue != value:
+                    fixedCases.append(len(cases))
+                    value = fixedValue
+            cases.append([species_cd, region_id, inputIdx, label, value])
+
+    with open(args.output, 'w') as outputFile:
+        json.dump({'inputs': inputs, 'cases': cases, 'fixed': fixedCases}, outputFile, separators=(',', ':'))
+        outputFile.write('\n')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
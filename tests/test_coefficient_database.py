@@ -0,0 +1,31 @@
+import os
+
+import pytest
+
+from coefficient_database import Coefficient_Database
+
+DB_PATH = os.path.join(os.path.dirname(__file__), '..', 'src', 'coefficients.db')
+
+
+def test_close_closes_connections_in_use():
+    database = Coefficient_Database(DB_PATH, pool_size=2)
+    with database.connection() as busy:
+        database.fetchOne('SELECT 1')
+        database.close()
+
+        # the idle one is closed at once, the busy one still works until it is handed back
+        assert database._idle == [] and database._opened == 1
+        assert busy.execute('SELECT 1').fetchone() == (1,)
+
+    assert database._opened == 0
+    with pytest.raises(Exception):
+        busy.execute('SELECT 1')
+
+
+def test_connection_after_close_raises():
+    database = Coefficient_Database(DB_PATH)
+    database.fetchOne('SELECT 1')
+    database.close()
+    with pytest.raises(ReferenceError, match='closed'):
+        database.fetchOne('SELECT 1')
+    assert database._opened == 0
@@ -0,0 +1,111 @@
+import os, shutil, sqlite3, struct
+
+import pytest
+
+from coefficient_snapshot import HEADER, SNAPSHOT_VERSION, Coefficient_Snapshot, exportSnapshot
+from component_ratio_method import SPECIES_COLUMNS, SPECIES_FLOAT_COLUMNS, Component_Ratio_Method, coefficientFingerprint
+
+DB_PATH = os.path.join(os.path.dirname(__file__), '..', 'src', 'coefficients.db')
+
+
+@pytest.fixture(scope='module')
+def exported(tmp_path_factory):
+
+    # the bundled database with NULLs put in a text, an integer and a float column
+    directory = tmp_path_factory.mktemp('snapshot')
+    db_path = str(directory / 'coefficients.db')
+    shutil.copyfile(DB_PATH, db_path)
+    with sqlite3.connect(db_path) as connect:
+        connect.execute('UPDATE species SET common_name = NULL, jenkins_spgrpcd = NULL, raile_stump_dib_b2 = NULL '
+                        'WHERE species_cd = 131')
+    return db_path, exportSnapshot(str(directory / 'coeff.snap'), db_path)
+
+
+def test_round_trip(exported):
+    db_path, path = exported
+    crm = Component_Ratio_Method(db_path)
+    snapshot = Coefficient_Snapshot(path, db_path)
+    try:
+        rows = crm.database.fetchAll('SELECT {0} FROM species ORDER BY species_cd'.format(
+                                         ', '.join(SPECIES_COLUMNS + SPECIES_FLOAT_COLUMNS)))
+        assert snapshot.speciesCodes() == [row[0] for row in rows]
+        assert [row[1] for row in rows].count(None) == 1
+        for row in rows:
+            assert snapshot.readSpeciesRow(row[0]) == tuple(row), row[0]
+        assert snapshot.readSpecies() == [snapshot.readSpeciesRow(row[0]) for row in rows]
+        assert snapshot.readSpeciesRow(99999) == None
+
+        regions = crm.preloadCoefficients()
+        assert sorted(snapshot.regionIds()) == sorted(regions)
+        nulls = 0
+        for region_id in regions:
+            table = snapshot.readGrossVolTable(region_id)
+            expected = crm._grossVolTables[region_id]
+            assert list(table) == sorted(expected) and len(table) == len(expected), region_id
+            for species_cd, (gross_cf_spcd, coefficients) in expected.items():
+                assert table[species_cd] == (gross_cf_spcd, coefficients), (region_id, species_cd)
+                nulls += coefficients == None or None in coefficients
+        assert nulls > 0
+        assert len(snapshot.readGrossVolTable('S00')) == 0
+        assert snapshot.sourceFingerprint == crm.getCoefficientFingerprint()
+    finally:
+        snapshot.close()
+        crm.close()
+
+
+def test_snapshot_matches_database_results(exported):
+    db_path, path = exported
+    fromDatabase = Component_Ratio_Method(db_path)
+    fromSnapshot = Component_Ratio_Method(snapshot_path=path)
+    try:
+        for species_cd, region_id in [(131, 'S33'), (316, 'S24'), (202, 'S22LID')]:
+            results = []
+            for crm in [fromDatabase, fromSnapshot]:
+                species = crm._getSpeciesData(species_cd)
+                results.append((crm.getVOLCFGRS(species, region_id, dbh=12.0, height=70.0, bole_hgt=30.0),
+                                crm._calcJenkinsComponentsLbs(species, 12.0)))
+            assert results[0] == results[1]
+        assert fromSnapshot.speciesErrors == fromDatabase.speciesErrors
+    finally:
+        fromDatabase.close()
+        fromSnapshot.close()
+
+
+def test_wrong_version_is_refused(exported, tmp_path):
+    db_path, path = exported
+    with open(path, 'rb') as snapshotFile:
+        data = bytearray(snapshotFile.read())
+
+    # the version follows the 8 byte magic
+    oldPath = str(tmp_path / 'old.snap')
+    struct.pack_into('<I', data, 8, SNAPSHOT_VERSION - 1)
+    with open(oldPath, 'wb') as snapshotFile:
+        snapshotFile.write(data)
+    with pytest.raises(Exception, match='Snapshot version {0} is not supported'.format(SNAPSHOT_VERSION - 1)):
+        Coefficient_Snapshot(oldPath)
+
+    notSnapshot = str(tmp_path / 'not.snap')
+    with open(notSnapshot, 'wb') as snapshotFile:
+        snapshotFile.write(b'\x00' * HEADER.size)
+    with pytest.raises(Exception, match='is not a coefficient snapshot'):
+        Coefficient_Snapshot(notSnapshot)
+
+
+def test_stale_snapshot_is_refused(exported, tmp_path):
+    db_path, path = exported
+    changedPath = str(tmp_path / 'changed.db')
+    shutil.copyfile(db_path, changedPath)
+    with sqlite3.connect(changedPath) as connect:
+        connect.execute('UPDATE species SET wood_spgr_greenvol_drywt = wood_spgr_greenvol_drywt * 1.1 WHERE species_cd = 316')
+
+    # the database the snapshot came from has since changed, opening the two together is refused
+    with pytest.raises(Exception, match='was not exported from'):
+        Coefficient_Snapshot(path, changedPath)
+    with pytest.raises(Exception, match='export the snapshot again'):
+        Component_Ratio_Method(changedPath, snapshot_path=path)
+
+    crm = Component_Ratio_Method(db_path, snapshot_path=path)
+    try:
+        assert crm.database == None and crm.getCoefficientFingerprint() == coefficientFingerprint(db_path)
+    finally:
+        crm.close()
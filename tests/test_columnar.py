@@ -0,0 +1,115 @@
+import csv, random
+
+import numpy as np
+import pytest
+
+from columnar import COLUMNAR_RESULTS, Columnar_Calculator
+from component_ratio_method import Component_Ratio_Method
+from tree_list import Tree_List_Pipeline
+
+pyarrow = pytest.importorskip('pyarrow')
+
+INPUT_COLUMNS = ['species_cd', 'region', 'dbh', 'height', 'site_index', 'basal_area', 'drc', 'bole_hgt', 'stem_count']
+
+
+@pytest.fixture(scope='module')
+def crm():
+    crm = Component_Ratio_Method()
+    yield crm
+    crm.close()
+
+
+def _trees(crm):
+
+    # good trees across a few regions, then nulls and trees the pipeline reports an error for
+    rng = random.Random(5)
+    pairs = [(species_cd, region_id) for region_id in ['S33', 'S22LID', 'S24']
+             for species_cd in sorted(crm._loadGrossVolTable(region_id))[:30]]
+    trees = []
+    for idx in range(600):
+        species_cd, region_id = rng.choice(pairs)
+        trees.append({'species_cd': species_cd, 'region': region_id, 'dbh': round(rng.uniform(1.0, 40.0), 1),
+                      'height': rng.choice([float(rng.randint(10, 120)), None]), 'site_index': rng.choice([80.0, None]),
+                      'basal_area': 120.0, 'drc': rng.choice([None, 4.0]), 'bole_hgt': rng.choice([None, 20.0]),
+                      'stem_count': rng.choice([None, 1])})
+    good = dict(trees[0])
+    trees[10:10] = [dict(good, species_cd=None), dict(good, species_cd=99999), dict(good, region=None),
+                    dict(good, dbh=None), dict(good, dbh=-2.0), dict(good, height=None, site_index=None)]
+    return trees
+
+
+def _pipelineResults(crm, trees, tmp_path):
+
+    # the same trees through a CSV file and the row pipeline, read back as run wrote them
+    treesPath = str(tmp_path / 'trees.csv')
+    with open(treesPath, 'w', newline='') as csvFile:
+        writer = csv.DictWriter(csvFile, INPUT_COLUMNS)
+        writer.writeheader()
+        writer.writerows(dict((column, '' if value == None else value) for column, value in tree.items()) for tree in trees)
+
+    outputPath = str(tmp_path / 'results.csv')
+    pipeline = Tree_List_Pipeline(crm, chunk_size=250)
+    pipeline.run(treesPath, outputPath)
+    return [result for chunk in pipeline._readResultChunks(outputPath) for result in chunk]
+
+
+def test_round_trip_matches_csv_pipeline(crm, tmp_path):
+    trees = _trees(crm)
+    table = pyarrow.Table.from_pylist(trees)
+    table = pyarrow.Table.from_batches(table.to_batches(max_chunksize=200))
+
+    output = Columnar_Calculator(crm).computeTable(table)
+    assert output.num_rows == len(trees) and output.column_names == list(COLUMNAR_RESULTS)
+    assert [batch.num_rows for batch in output.to_batches()] == [batch.num_rows for batch in table.to_batches()]
+    assert all(output.schema.field(column).type == pyarrow.float64() for column in COLUMNAR_RESULTS)
+
+    columns = dict((column, output.column(column).to_pylist()) for column in COLUMNAR_RESULTS)
+    expected = _pipelineResults(crm, trees, tmp_path)
+    errors = 0
+    for row, (tree, result) in enumerate(zip(trees, expected)):
+        if result['error'] != None:
+            errors += 1
+
+            # the pipeline stops at a missing volume, the columns keep the Jenkins biomass of a valid tree
+            # and leave only the volume and component ratio columns null
+            if crm.validateTrees([tree]) == []:
+                result.update(crm._calcJenkinsComponentsLbs(crm._getSpeciesData(tree['species_cd']), tree['dbh'])._asdict())
+
+        for column in COLUMNAR_RESULTS:
+            if result[column] == None:
+                assert columns[column][row] == None, (row, column)
+            else:
+                assert columns[column][row] == pytest.approx(result[column], rel=1e-9), (row, column)
+
+    assert errors > 5 and output.column('total_ag').null_count == 4
+
+
+def test_validity_bitmap(crm):
+    trees = _trees(crm)
+    calculator = Columnar_Calculator(crm)
+    arrays = calculator.computeArrays(pyarrow.RecordBatch.from_pylist(trees))
+    batch = calculator.computeRecordBatch(pyarrow.RecordBatch.from_pylist(trees))
+
+    for column in COLUMNAR_RESULTS:
+        array = batch.column(column)
+        missing = np.isnan(arrays[column])
+        assert array.null_count == int(missing.sum()) > 0, column
+
+        # bit i of the little endian validity bitmap is set where row i has a value
+        validity, data = array.buffers()
+        bits = np.unpackbits(np.frombuffer(validity, dtype=np.uint8), bitorder='little')[:len(array)]
+        np.testing.assert_array_equal(bits.astype(bool), ~missing, err_msg=column)
+        np.testing.assert_array_equal(array.is_null().to_numpy(zero_copy_only=False), missing, err_msg=column)
+        np.testing.assert_array_equal(np.frombuffer(data, dtype=np.float64)[~missing], arrays[column][~missing])
+
+
+def test_output_is_not_copied(crm):
+    calculator = Columnar_Calculator(crm)
+    values = np.array([1.0, np.nan, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0, np.nan])
+    array = calculator._arrowColumn(pyarrow, values)
+    assert array.buffers()[1].address == values.ctypes.data
+    assert array.to_pylist() == [1.0, None, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0, None]
+
+    # a column without nulls carries no bitmap at all
+    full = calculator._arrowColumn(pyarrow, values[:1])
+    assert full.buffers()[0] == None and full.null_count == 0
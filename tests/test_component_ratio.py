@@ -0,0 +1,190 @@
+import math, os, shutil, sqlite3
+
+import numpy as np
+import pytest
+
+from component_ratio_method import Component_Ratio_Method
+
+DB_PATH = os.path.join(os.path.dirname(__file__), '..', 'src', 'coefficients.db')
+
+
+@pytest.fixture(scope='module')
+def crm():
+    crm = Component_Ratio_Method()
+    yield crm
+    crm.close()
+
+
+def _speciesRow(species_cd):
+    with sqlite3.connect(DB_PATH) as connect:
+        connect.row_factory = sqlite3.Row
+        return dict(connect.execute('SELECT * FROM species WHERE species_cd = ?', (species_cd,)).fetchone())
+
+
+def _raileStump(a, b):
+
+    # Raile (1982) stump volume in cubic inches per dbh^2 from 0 to 1 ft, over 576 for cubic feet
+    def integral(height):
+        return (a - b) ** 2 * height + 11 * b * (a - b) * math.log(height + 1) - 30.25 / (height + 1) * b ** 2
+    return math.pi * (integral(1.0) - integral(0.0)) / 576.0
+
+
+def _byHand(species_cd, dbh, volcfgrs):
+    row = _speciesRow(species_cd)
+    dbhCm = dbh * 2.54
+    total = math.exp(row['jenkins_total_b1'] + row['jenkins_total_b2'] * math.log(dbhCm)) * 2.2046
+    stem = total * math.exp(row['jenkins_stem_wood_ratio_b1'] + row['jenkins_stem_wood_ratio_b2'] / dbhCm)
+    bark = total * math.exp(row['jenkins_stem_bark_ratio_b1'] + row['jenkins_stem_bark_ratio_b2'] / dbhCm)
+    foliage = total * math.exp(row['jenkins_foliage_ratio_b1'] + row['jenkins_foliage_ratio_b2'] / dbhCm)
+
+    wood = row['wood_spgr_greenvol_drywt']
+    barkGravity = row['bark_spgr_greenvol_drywt']
+    outside = dbh ** 2 * _raileStump(1.0, row['raile_stump_dob_b1'])
+    inside = dbh ** 2 * _raileStump(row['raile_stump_dib_b1'], row['raile_stump_dib_b2'])
+    stump = (inside * wood + (outside - inside) * barkGravity) * 62.4
+
+    boleCrm = volcfgrs * (wood + barkGravity * row['bark_vol_pct'] / 100.0) * 62.4
+    factor = boleCrm / (stem + bark)
+    return {
+        'adjustment_factor': factor,
+        'bole_crm': boleCrm,
+        'stump': stump * factor,
+        'top': (total - stem - bark - foliage - stump) * factor,
+        'foliage_crm': foliage * factor,
+        'total_ag_crm': total * factor
+    }
+
+
+@pytest.mark.parametrize('species_cd, region_id, dbh, height', [(131, 'S33', 10.0, 60.0), (316, 'S33', 14.0, 70.0),
+                                                                (202, 'S22LID', 22.0, 110.0)])
+def test_component_ratio_by_hand(crm, species_cd, region_id, dbh, height):
+    species = crm._getSpeciesData(species_cd)
+    volcfgrs = crm.getVOLCFGRS(species, region_id, dbh=dbh, height=height)
+    expected = _byHand(species_cd, dbh, volcfgrs)
+
+    actual = crm._calcComponentRatioBiomass(species, dbh, volcfgrs)._asdict()
+    assert actual == pytest.approx(expected, rel=1e-12)
+    assert crm._calcStumpBiomassLbs(species, dbh, expected['adjustment_factor']) == pytest.approx(expected['stump'], rel=1e-12)
+    assert crm._calcTopBiomassJenkinsLbs(species, dbh, expected['adjustment_factor']) == pytest.approx(expected['top'], rel=1e-12)
+
+
+def test_loblolly_pine_values(crm):
+
+    # species 131 at 10 in. and 60 ft in S33, worked through _byHand and pinned here
+    species = crm._getSpeciesData(131)
+    result = crm._calcComponentRatioBiomass(species, 10.0, crm.getVOLCFGRS(species, 'S33', dbh=10.0, height=60.0))
+    assert result.adjustment_factor == pytest.approx(1.2432065792438434, rel=1e-12)
+    assert result.bole_crm == pytest.approx(433.637333049024, rel=1e-12)
+    assert result.stump == pytest.approx(28.887093528357724, rel=1e-12)
+    assert result.top == pytest.approx(73.95429061219004, rel=1e-12)
+    assert result.foliage_crm == pytest.approx(35.40223443106195, rel=1e-12)
+    assert result.total_ag_crm == pytest.approx(571.8809516206337, rel=1e-12)
+
+
+def _hasSpecies(crm, species_cd):
+    try:
+        crm._getSpeciesData(species_cd)
+    except Exception:
+        return False
+    return True
+
+
+def test_batch_matches_scalar(crm):
+    rng = np.random.default_rng(3)
+    pairs = [(species_cd, region_id) for region_id in ['S33', 'S22LID', 'S24', 'S23LMI']
+             for species_cd in sorted(crm._loadGrossVolTable(region_id))[:40]]
+    pairs = [pair for pair in pairs if _hasSpecies(crm, pair[0])]
+    picks = rng.integers(0, len(pairs), 2000)
+    species_cds = [pairs[idx][0] for idx in picks]
+    region_ids = [pairs[idx][1] for idx in picks]
+    dbhs = rng.uniform(1.0, 40.0, 2000)
+    heights = rng.uniform(10.0, 120.0, 2000)
+
+    batch = crm.getComponentRatioBatch(species_cds, region_ids, dbh=dbhs, height=heights, site_index=70.0, basal_area=120.0,
+                                       bole_hgt=30.0)
+    compared = 0
+    for idx, (species_cd, region_id, dbh, height) in enumerate(zip(species_cds, region_ids, dbhs.tolist(), heights.tolist())):
+        species = crm._getSpeciesData(species_cd)
+        jenkins = crm._calcJenkinsComponentsLbs(species, dbh)._asdict()
+        for column, value in jenkins.items():
+            assert batch[column][idx] == pytest.approx(value, rel=1e-12), (species_cd, column)
+
+        try:
+            volcfgrs = crm.getVOLCFGRS(species, region_id, dbh=dbh, height=height, site_index=70.0, basal_area=120.0,
+                                       bole_hgt=30.0)
+            expected = crm._calcComponentRatioBiomass(species, dbh, volcfgrs)._asdict()
+        except Exception:
+            volcfgrs = None
+        if volcfgrs == None:
+            assert np.isnan(batch['volcfgrs'][idx]) and np.isnan(batch['adjustment_factor'][idx])
+            continue
+
+        compared += 1
+        assert batch['volcfgrs'][idx] == pytest.approx(volcfgrs, rel=1e-12)
+        for column, value in expected.items():
+            assert batch[column][idx] == pytest.approx(value, rel=1e-9, nan_ok=True), (species_cd, region_id, column)
+
+    assert compared > 1000
+    stumps = crm.getStumpBiomassBatch(species_cds, dbhs, batch['adjustment_factor'])
+    np.testing.assert_allclose(stumps, batch['stump'], rtol=1e-12)
+
+
+@pytest.fixture
+def nullRootCrm(tmp_path):
+    path = str(tmp_path / 'coefficients.db')
+    shutil.copyfile(DB_PATH, path)
+    with sqlite3.connect(path) as connect:
+        connect.execute('UPDATE species SET jenkins_root_ratio_b1 = NULL WHERE species_cd = 131')
+        connect.execute('UPDATE species SET jenkins_root_ratio_b2 = NULL WHERE species_cd = 316')
+    crm = Component_Ratio_Method(path)
+    yield crm
+    crm.close()
+
+
+def test_root_ratio_names_its_coefficients(nullRootCrm):
+    with pytest.raises(Exception, match='^Jenkins Root Ratio B1 must be a number.$'):
+        nullRootCrm._calcRootRatio(nullRootCrm._getSpeciesData(131), 10.0)
+    with pytest.raises(Exception, match='^Jenkins Root Ratio B2 must be a number.$'):
+        nullRootCrm._calcRootRatio(nullRootCrm._getSpeciesData(316), 10.0)
+
+
+def test_validate_trees(nullRootCrm):
+    trees = [{'species_cd': 202, 'dbh': 10.0, 'height': 60.0},
+             {'species_cd': 131, 'dbh': 10.0},
+             {'species_cd': 202, 'dbh': -1.0, 'height': 'tall'},
+             {'species_cd': 99999, 'dbh': None},
+             {'species_cd': 316.0, 'dbh': 10.0}]
+
+    failures = nullRootCrm.validateTrees(trees)
+    assert [failure['row'] for failure in failures] == [1, 2, 3, 4]
+    assert failures[0] == {'row': 1, 'species_cd': 131, 'errors': ['Jenkins Root Ratio B1 must be a number.']}
+    assert failures[1]['errors'] == ['DBH must be > 0.', 'Height must be a number.']
+    assert failures[2]['errors'] == ['Species not found in database.', 'DBH must be a number.']
+    assert failures[3]['errors'] == ['Species code must be an integer.']
+
+
+def test_validate_false_skips_checks(monkeypatch):
+    checked = Component_Ratio_Method()
+    unchecked = Component_Ratio_Method(validate=False)
+    try:
+        species = checked._getSpeciesData(131)
+        expected = checked._calcComponentRatioBiomass(species, 10.0, checked.getVOLCFGRS(species, 'S33', dbh=10.0, height=60.0))
+
+        # none of the per call checks may run, the results stay the same
+        def check(*args):
+            raise AssertionError('checked {0}'.format(args[0]))
+        monkeypatch.setattr(unchecked, '_isNumber', check)
+        monkeypatch.setattr(unchecked, '_isPositiveNumber', check)
+
+        species = unchecked._getSpeciesData(131)
+        volcfgrs = unchecked.getVOLCFGRS(species, 'S33', dbh=10.0, height=60.0)
+        assert unchecked._calcComponentRatioBiomass(species, 10.0, volcfgrs) == expected
+        assert unchecked._calcRootBiomassJenkinsLbs(species, 10.0) == checked._calcRootBiomassJenkinsLbs(species, 10.0)
+        assert unchecked._calcStumpBiomassLbs(species, 10.0, expected.adjustment_factor) == pytest.approx(expected.stump)
+
+        monkeypatch.setattr(checked, '_isPositiveNumber', check)
+        with pytest.raises(AssertionError, match='checked DBH'):
+            checked._calcRootRatio(species, 10.0)
+    finally:
+        checked.close()
+        unchecked.close()
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from component_ratio_method import Component_Ratio_Method
+from crm_kernels import Coefficient_Tables
+
+
+@pytest.fixture(scope='module')
+def tables():
+    crm = Component_Ratio_Method()
+    yield Coefficient_Tables(crm, ['S33'])
+    crm.close()
+
+
+def test_tables_are_read_only(tables):
+    with pytest.raises(Exception, match='read only'):
+        tables.species = {}
+    with pytest.raises(TypeError):
+        tables.species[131] = None
+    with pytest.raises(TypeError):
+        tables.grossVolume[('S33', 131)] = None
+    with pytest.raises(ValueError):
+        tables.jenkinsCoefficients[0, 0] = 0.0
+    with pytest.raises(ValueError):
+        tables.jenkinsSpeciesCodes[0] = 0
+
+
+def test_species_records_are_read_only(tables):
+    species = tables.species[131]
+    with pytest.raises(Exception, match='read only'):
+        species.jenkins_total_b1 = 0.0
+    with pytest.raises(Exception, match='read only'):
+        species.species_cd = 0
+    assert species.species_cd == 131
+
+
+def test_records_are_copies(tables):
+
+    # changing the crm's own record afterwards leaves the tables as they were
+    crm = Component_Ratio_Method()
+    try:
+        copied = Coefficient_Tables(crm, ['S33'])
+        crm._getSpeciesData(131).jenkins_total_b1 = 0.0
+        assert copied.species[131].jenkins_total_b1 == tables.species[131].jenkins_total_b1 != 0.0
+    finally:
+        crm.close()
+
+
+def test_tables_close_their_own_crm(monkeypatch):
+    closed = []
+    close = Component_Ratio_Method.close
+    monkeypatch.setattr(Component_Ratio_Method, 'close', lambda crm: closed.append(crm) or close(crm))
+    tables = Coefficient_Tables(region_ids=['S33'])
+    assert len(closed) == 1 and np.isfinite(tables.jenkinsCoefficients).any()
@@ -0,0 +1,117 @@
+import asyncio, concurrent.futures, http.client, json, threading, time
+
+import pytest
+
+from crm_service import Component_Ratio_Service
+
+TREE = {'species_cd': 131, 'region': 'S33', 'dbh': 10.0, 'height': 60.0}
+
+
+@pytest.fixture
+def service():
+
+    # the server runs on its own event loop thread, the tests talk to it over HTTP
+    service = Component_Ratio_Service(port=0, max_batch_size=64, max_wait=0.05, chunk_size=100)
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(service.start())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield service
+
+    async def stop():
+        service.server.close()
+        await service.server.wait_closed()
+
+    asyncio.run_coroutine_threadsafe(stop(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+    service.close()
+
+
+def _post(service, path, body, chunked=False):
+    connection = http.client.HTTPConnection('127.0.0.1', service.port, timeout=30)
+    try:
+        connection.request('POST', path, body, encode_chunked=chunked,
+                           headers={'Transfer-Encoding': 'chunked'} if chunked else {})
+        response = connection.getresponse()
+        return response.status, response.read().decode('utf-8')
+    finally:
+        connection.close()
+
+
+def _expected(service, tree):
+    return service.pipeline.processTree(service.pipeline._parseTree(tree))
+
+
+def test_tree(service):
+    status, body = _post(service, '/tree', json.dumps(TREE))
+    assert status == 200
+    assert json.loads(body) == _expected(service, TREE)
+
+
+@pytest.mark.parametrize('body, error', [('not json', 'Invalid JSON'),
+                                         ('[1, 2]', 'one JSON tree object'),
+                                         (json.dumps(dict(TREE, species_cd=131.5)), 'Invalid tree: species_cd must be an integer')])
+def test_tree_rejects_bad_bodies(service, body, error):
+    status, body = _post(service, '/tree', body)
+    assert status == 400 and error in json.loads(body)['error']
+
+
+def test_trees_with_bad_lines(service):
+    trees = [dict(TREE, dbh=5.0 + idx) for idx in range(250)]
+    lines = [json.dumps(tree) for tree in trees]
+    lines.insert(3, '{bad')
+    lines.insert(150, json.dumps(dict(TREE, dbh='abc')))
+
+    # sent chunked so the request body and the response both end with their terminating chunk
+    status, body = _post(service, '/trees', (line.encode('utf-8') + b'\n' for line in lines), chunked=True)
+    assert status == 200
+
+    results = [json.loads(line) for line in body.splitlines()]
+    assert len(results) == 252
+    assert results[3]['line'] == 4 and results[3]['error'].startswith('Invalid JSON')
+    assert results[150] == {'line': 151, 'error': "Invalid tree: dbh must be a number, got 'abc'."}
+    expected = service.pipeline.processChunk([service.pipeline._parseTree(tree) for tree in trees])
+    assert [result for result in results if 'line' not in result] == expected
+
+
+def test_concurrent_trees_are_batched(service):
+    batches = []
+    processChunk = service.pipeline.processChunk
+
+    def recordBatch(trees):
+        batches.append(len(trees))
+        return processChunk(trees)
+
+    service.pipeline.processChunk = recordBatch
+    trees = [dict(TREE, dbh=5.0 + idx) for idx in range(48)]
+    with concurrent.futures.ThreadPoolExecutor(len(trees)) as executor:
+        responses = list(executor.map(lambda tree: _post(service, '/tree', json.dumps(tree)), trees))
+
+    assert [json.loads(body) for status, body in responses] == [_expected(service, tree) for tree in trees]
+    assert sum(batches) == len(trees) and len(batches) < len(trees)
+
+
+def test_bulk_upload_does_not_hold_up_single_trees(service):
+    started = threading.Event()
+    processChunk = service.pipeline.processChunk
+
+    # a bulk chunk that takes a second, single tree batches must still be answered meanwhile
+    def slowChunk(trees):
+        if len(trees) == service.pipeline.chunk_size:
+            started.set()
+            time.sleep(1.0)
+        return processChunk(trees)
+
+    service.pipeline.processChunk = slowChunk
+    lines = ''.join(json.dumps(TREE) + '\n' for idx in range(service.pipeline.chunk_size))
+    with concurrent.futures.ThreadPoolExecutor(1) as executor:
+        bulk = executor.submit(_post, service, '/trees', lines)
+        assert started.wait(10)
+
+        start = time.perf_counter()
+        status, body = _post(service, '/tree', json.dumps(TREE))
+        assert status == 200 and time.perf_counter() - start < 0.5
+        assert not bulk.done()
+        assert bulk.result()[0] == 200
@@ -0,0 +1,91 @@
+import collections, json, os, re
+
+import pytest
+
+from component_ratio_method import Component_Ratio_Method
+
+# recorded by fixtures/record_gross_volume.py from the code before getVOLCFGRS was split into one method per
+# Table/Row, one species per distinct region, gross volume species code and coefficient row
+with open(os.path.join(os.path.dirname(__file__), 'fixtures', 'gross_volume_baseline.json')) as fixtureFile:
+    BASELINE = json.load(fixtureFile)
+
+# the label is the Table/Row the old code printed, it printed none for Table 1 Row 5 and before any equation ran
+CASES_BY_LABEL = collections.defaultdict(list)
+for idx, case in enumerate(BASELINE['cases']):
+    CASES_BY_LABEL[case[3] or 'unlabelled'].append(idx)
+
+FIXED_CASES = set(BASELINE['fixed'])
+
+
+@pytest.fixture(scope='module')
+def crm():
+    crm = Component_Ratio_Method()
+    crm.enableEquationTrace()
+    yield crm
+    crm.close()
+
+
+def _evaluate(crm, species_cd, region_id, inputs):
+    crm.equationTrace.clear()
+    inputs = dict(inputs)
+    try:
+        value = crm.getVOLCFGRS(crm._getSpeciesData(species_cd), region_id, **inputs)
+    except Exception as e:
+        value = '{0}: {1}'.format(type(e).__name__, e)
+    labels = list(crm.equationTrace)
+    return (labels[0] if labels else None), value
+
+
+@pytest.mark.parametrize('label', sorted(CASES_BY_LABEL))
+def test_matches_baseline(crm, label):
+    for idx in CASES_BY_LABEL[label]:
+        species_cd, region_id, inputIdx, expectedLabel, expected = BASELINE['cases'][idx]
+        actualLabel, actual = _evaluate(crm, species_cd, region_id, BASELINE['inputs'][inputIdx])
+
+        case = (species_cd, region_id, BASELINE['inputs'][inputIdx])
+        if expectedLabel != None:
+            assert actualLabel == expectedLabel, case
+        if isinstance(expected, float):
+            assert actual == pytest.approx(expected, rel=1e-12, abs=1e-12), case
+        else:
+            assert actual == expected, case
+
+
+def test_fixed_rows_return_volumes(crm):
+
+    # Table 1 Row 2 and the else branch of Table 3 Row 4 raised a TypeError on None before the split
+    assert set(BASELINE['cases'][idx][3] for idx in FIXED_CASES) == {'Table 1 Row 2', 'Table 3 Row 4'}
+    for idx in FIXED_CASES:
+        species_cd, region_id, inputIdx, label, expected = BASELINE['cases'][idx]
+        assert isinstance(expected, float)
+        assert _evaluate(crm, species_cd, region_id, BASELINE['inputs'][inputIdx])[1] == pytest.approx(expected, rel=1e-12)
+
+
+def test_table3_row6_small_trees():
+
+    # no config row reaches Table 3 Row 6, it compared None with 0 for trees of 5 in. or less before checking for None
+    b = (1.5, 0.002)
+    assert Component_Ratio_Method._volTable3Row6(b, 122, 4.0, 40.0, None, None, None, None, None) == None
+    assert Component_Ratio_Method._volTable3Row6(b, 122, 10.0, 40.0, None, None, None, None, None) == pytest.approx(1.5 + 0.002 * 100.0 * 40.0)
+    assert Component_Ratio_Method._volTable3Row6((-5.0, 0.0), 122, 10.0, 40.0, None, None, None, None, None) == 0.1
+    with pytest.raises(Exception, match='DBH and height are needed.'):
+        Component_Ratio_Method._volTable3Row6(b, 122, 10.0, None, None, None, None, None, None)
+
+
+def test_dict_species_records(crm):
+
+    # species rows read into dicts, the way they were before Species_Record, are still accepted
+    for species_cd, region_id, inputIdx, label, expected in BASELINE['cases'][::25]:
+        inputs = BASELINE['inputs'][inputIdx]
+        try:
+            species = crm._getSpeciesData(species_cd)
+        except Exception:
+            continue
+        try:
+            record = crm.getVOLCFGRS(species, region_id, **inputs)
+        except Exception as e:
+            with pytest.raises(type(e), match=re.escape(str(e))):
+                crm.getVOLCFGRS(species._asdict(), region_id, **inputs)
+        else:
+            assert crm.getVOLCFGRS(species._asdict(), region_id, **inputs) == record
+            assert crm.getVOLCFGRS({'species_cd': species_cd}, region_id, **inputs) == record
@@ -0,0 +1,122 @@
+import collections, math, types
+
+import numpy as np
+import pytest
+
+from component_ratio_method import Component_Ratio_Method
+
+# diameters on both sides of the breaks the equations branch on, missing measurements are passed to the batch
+# as None and as NaN, to getVOLCFGRS always as None
+DBHS = [0.5, 1.0, 3.0, 5.0, 5.5, 6.0, 8.0, 9.0, 10.5, 11.0, 20.5, 21.0, 25.0, 60.0, 70.0, float('nan')]
+MEASUREMENTS = [
+    {'height': 60.0, 'site_index': 65.0, 'basal_area': 120.0, 'stem_count': 1, 'drc': 6.0, 'bole_hgt': 30.0},
+    {'height': None, 'site_index': 65.0, 'basal_area': None, 'stem_count': 2, 'drc': 6.0, 'bole_hgt': None},
+    {'height': 60.0, 'site_index': None, 'basal_area': 120.0, 'stem_count': 2, 'drc': None, 'bole_hgt': None},
+    {'height': 120.0, 'site_index': 100.0, 'basal_area': 250.0, 'stem_count': 1, 'drc': 20.0, 'bole_hgt': 50.0},
+    {'height': float('nan'), 'site_index': None, 'basal_area': None, 'stem_count': None, 'drc': None, 'bole_hgt': float('nan')}
+]
+COLUMNS = ['dbh', 'height', 'basal_area', 'site_index', 'stem_count', 'drc', 'bole_hgt']
+
+
+def _missing(value):
+    return value == None or (isinstance(value, float) and math.isnan(value))
+
+
+def _trees(crm):
+
+    # one species per region, gross volume species code and coefficient row, crossed with every input
+    trees = collections.defaultdict(list)
+    for region_id in crm.preloadCoefficients():
+        speciesIds, adjGrossVolSpeciesIds, coefficients, equationIdxs, equations = crm._getGrossVolBatchTable(region_id)
+        seen = set()
+        for idx in range(speciesIds.size):
+            key = (int(adjGrossVolSpeciesIds[idx]), tuple(coefficients[idx].tolist()))
+            if key in seen:
+                continue
+            seen.add(key)
+            label = equations[equationIdxs[idx]][1]
+            for dbh in DBHS:
+                for measurements in MEASUREMENTS:
+                    trees[label].append(dict(measurements, species_cd=int(speciesIds[idx]), region=region_id, dbh=dbh))
+    return trees
+
+
+def _expected(crm, tree):
+
+    # getVOLCFGRS only reads species_cd, some codes with volume coefficients have no species row
+    species = types.SimpleNamespace(species_cd=tree['species_cd'])
+    inputs = dict((column, None if _missing(tree[column]) else tree[column]) for column in COLUMNS)
+    try:
+        volume = crm.getVOLCFGRS(species, tree['region'], **inputs)
+    except Exception:
+        return float('nan')
+    return float('nan') if volume == None or not math.isfinite(volume) else volume
+
+
+def _compare(crm, trees):
+    actual = crm.getVOLCFGRSBatch([tree['species_cd'] for tree in trees], [tree['region'] for tree in trees],
+                                  **dict((column, [tree[column] for tree in trees]) for column in COLUMNS))
+    assert actual.shape == (len(trees),)
+    for tree, value in zip(trees, actual.tolist()):
+        assert value == pytest.approx(_expected(crm, tree), rel=1e-9, abs=1e-9, nan_ok=True), tree
+
+
+@pytest.fixture(scope='module')
+def crm():
+    crm = Component_Ratio_Method()
+    yield crm
+    crm.close()
+
+
+@pytest.fixture(scope='module')
+def trees(crm):
+    return _trees(crm)
+
+
+def test_every_kernel_is_covered(crm, trees):
+    for label, labelTrees in trees.items():
+        speciesIds, adjGrossVolSpeciesIds, coefficients, equationIdxs, equations = crm._getGrossVolBatchTable(labelTrees[0]['region'])
+        equation = next(entry[0] for entry in equations if entry[1] == label)
+        assert hasattr(crm, equation.__name__ + 'Batch'), label
+
+
+def test_batch_matches_scalar(crm, trees):
+    for label in sorted(trees):
+        _compare(crm, trees[label])
+
+
+def test_per_tree_fallback_matches_scalar(trees):
+
+    # with the array kernels hidden every equation runs through _evaluateGrossVolEquationPerTree
+    crm = Component_Ratio_Method()
+    try:
+        for name in dir(Component_Ratio_Method):
+            if name.startswith('_vol') and name.endswith('Batch'):
+                setattr(crm, name, None)
+        _compare(crm, [tree for label in sorted(trees) for tree in trees[label][::7]])
+    finally:
+        crm.close()
+
+
+@pytest.mark.parametrize('region_id, adjGrossVolSpeciesId, label', [('S26LCA', 102, 'Table 4 Row 7'),
+                                                                     ('S26LWOR', 211, 'Table 4 Row 12'),
+                                                                     ('S26LEWA', 990, 'Table 4 Row 18')])
+def test_rows_without_formula_are_undefined(trees, region_id, adjGrossVolSpeciesId, label):
+
+    # no region in the bundled database reaches Table 4, the rows without a formula are put in its dispatch by hand
+    crm = Component_Ratio_Method()
+    try:
+        entry = crm._getGrossVolDispatchEntry(region_id, adjGrossVolSpeciesId)
+        assert entry == (crm._volUndefined, label)
+
+        regionTrees = trees['Table 1 Row 1'][:len(DBHS) * len(MEASUREMENTS)]
+        tableRegion = regionTrees[0]['region']
+        tableSpeciesId, b = crm._getGrossVolSpeciesCodeAndCoeff(regionTrees[0]['species_cd'], tableRegion)
+        crm._grossVolDispatch[(tableRegion, tableSpeciesId)] = entry
+
+        crm.enableEquationTrace()
+        _compare(crm, regionTrees)
+        assert np.isnan(crm.getVOLCFGRSBatch([tree['species_cd'] for tree in regionTrees], tableRegion, dbh=10.0, height=60.0)).all()
+        assert list(crm.getEquationTrace()) == [label]
+    finally:
+        crm.close()
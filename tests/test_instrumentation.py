@@ -0,0 +1,117 @@
+import random, re
+
+import pytest
+
+from component_ratio_method import Component_Ratio_Method
+from instrumentation import INSTRUMENTED_METHODS, QUANTILES, SAMPLE_SIZE, Latency_Stats
+
+SAMPLE_LINE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{((?:[a-zA-Z_]\w*="(?:[^"\\]|\\.)*",?)*)\})? (\S+)$')
+
+
+@pytest.fixture
+def crm():
+    crm = Component_Ratio_Method()
+    yield crm
+    crm.close()
+
+
+def _work(crm):
+    species = crm._getSpeciesData(131)
+    volcfgrs = crm.getVOLCFGRS(species, 'S33', dbh=10.0, height=60.0)
+    batch = crm.getVOLCFGRSBatch([131, 316], 'S33', dbh=[10.0, 14.0], height=[60.0, 70.0])
+    return volcfgrs, batch.tolist(), crm._calcComponentRatioBiomass(species, 10.0, volcfgrs)
+
+
+def test_install_and_uninstall(crm):
+    expected = _work(crm)
+    dispatchKey = next(iter(crm._grossVolDispatch))
+    names = INSTRUMENTED_METHODS + ('_volTable2Row1', '_volTable2Row1Batch')
+    originals = dict((name, getattr(crm, name)) for name in names)
+
+    instrumentation = crm.enableInstrumentation()
+    for name in names:
+        assert name in vars(crm) and getattr(crm, name).__wrapped__ == originals[name], name
+    assert 'fetchAll' in vars(crm.database) and 'fetchOne' in vars(crm.database)
+    assert crm._grossVolDispatch[dispatchKey][0] is vars(crm)[crm._grossVolDispatch[dispatchKey][0].__name__]
+
+    assert _work(crm) == expected
+    stats = crm.getInstrumentation()
+    assert stats['methods']['getVOLCFGRS']['calls'] == 1 and stats['methods']['getVOLCFGRSBatch']['calls'] == 1
+    assert stats['equations']['Table 2 Row 1']['calls'] == 1 and stats['equations']['Table 2 Row 1 batch']['calls'] == 1
+
+    # nothing the wrappers put on the instance survives, the dispatch tables point at the class methods again
+    crm.disableInstrumentation()
+    assert not [name for name in vars(crm) if name in INSTRUMENTED_METHODS or name.startswith('_volTable')]
+    assert 'fetchAll' not in vars(crm.database) and 'fetchOne' not in vars(crm.database)
+    for equation, label in list(crm._grossVolDispatch.values()) + [entry for table in crm._grossVolBatchTables.values()
+                                                                   for entry in table[-1]]:
+        assert not hasattr(equation, '__wrapped__'), label
+    assert _work(crm) == expected
+    assert instrumentation.asDict() == stats and crm.getInstrumentation() == {}
+
+
+def test_queries_are_charged_to_the_running_method(crm):
+    crm.invalidateSpeciesCache()
+    crm.enableInstrumentation()
+    crm._getSpeciesData(131)
+    methods = crm.getInstrumentation()['methods']
+    assert sum(stats['queries'] for stats in methods.values()) > 0
+    assert methods.get('other', {'queries': 0})['queries'] == 0
+
+
+def test_reservoir_is_bounded():
+    random.seed(7)
+    stats = Latency_Stats()
+    count = SAMPLE_SIZE * 5
+    for idx in range(count):
+        stats.addCall(float(idx))
+
+    assert stats.calls == count and stats.seconds == sum(range(count))
+    assert len(stats.samples) == SAMPLE_SIZE
+
+    # a uniform sample of 0 .. count - 1 puts each quantile close to quantile * count
+    for quantile, seconds in stats.quantiles().items():
+        assert seconds == pytest.approx(quantile * count, rel=0.05), quantile
+    assert Latency_Stats().quantiles() == dict((quantile, None) for quantile in QUANTILES)
+
+
+def test_prometheus_text(crm):
+    instrumentation = crm.enableInstrumentation()
+    _work(crm)
+    instrumentation._stats(instrumentation.methods, 'odd "name"\\').addCall(0.25)
+    text = instrumentation.toPrometheus()
+    assert text.endswith('\n')
+
+    types = {}
+    samples = []
+    for line in text.splitlines():
+        if line.startswith('# HELP '):
+            assert len(line.split(' ', 3)) == 4
+        elif line.startswith('# TYPE '):
+            name, kind = line.split(' ')[2:]
+            assert kind in ['summary', 'counter'] and name not in types
+            types[name] = kind
+        else:
+            match = SAMPLE_LINE.match(line)
+            assert match != None, line
+            float(match.group(4))
+            samples.append((match.group(1), dict(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', match.group(3) or ''))))
+
+    assert types == {'crm_method_seconds': 'summary', 'crm_equation_seconds': 'summary',
+                     'crm_db_queries_total': 'counter', 'crm_db_query_seconds_total': 'counter'}
+    for name, labels in samples:
+        assert re.sub('_(sum|count)$', '', name) in types, name
+
+    # every summary series has its quantiles, _sum and _count
+    for kind, label in [('method', 'method'), ('equation', 'equation')]:
+        name = 'crm_{0}_seconds'.format(kind)
+        series = set(labels[label] for sample, labels in samples if sample == name)
+        assert series
+        for value in series:
+            assert sorted(float(labels['quantile']) for sample, labels in samples
+                          if sample == name and labels[label] == value) == list(QUANTILES)
+            assert [sample for sample, labels in samples if labels.get(label) == value and 'quantile' not in labels
+                    and sample.startswith(name)] == [name + '_sum', name + '_count']
+
+    assert 'crm_method_seconds_count{method="odd \\"name\\"\\\\"} 1\n' in text
+    assert ('crm_equation_seconds', {'equation': 'Table 2 Row 1', 'quantile': '0.99'}) in samples
@@ -0,0 +1,101 @@
+import os, shutil, sqlite3
+
+import pytest
+
+from component_ratio_method import Component_Ratio_Method
+from result_cache import Result_Cache
+from tree_list import Tree_List_Pipeline
+
+DB_PATH = os.path.join(os.path.dirname(__file__), '..', 'src', 'coefficients.db')
+
+TREES = [{'species_cd': 131, 'region': 'S33', 'dbh': 10.0, 'height': 60.0},
+         {'species_cd': 131, 'region': 'S33', 'dbh': 14.0, 'height': 70.0},
+         {'species_cd': 316, 'region': 'S33', 'dbh': 8.0, 'height': 40.0}]
+
+
+def _process(db_path, cachePath, validate=True):
+    crm = Component_Ratio_Method(db_path, validate=validate)
+    cache = Result_Cache(cachePath)
+    try:
+        pipeline = Tree_List_Pipeline(crm, result_cache=cache)
+        assert cache.fingerprint == crm.getCoefficientFingerprint()
+        results = pipeline.processChunk([pipeline._parseTree(tree) for tree in TREES])
+        return results, cache.getStats()
+    finally:
+        cache.close()
+        crm.close()
+
+
+def test_changed_coefficients_miss(tmp_path):
+    changedPath = str(tmp_path / 'changed.db')
+    shutil.copyfile(DB_PATH, changedPath)
+    with sqlite3.connect(changedPath) as connect:
+        connect.execute('UPDATE species SET wood_spgr_greenvol_drywt = wood_spgr_greenvol_drywt * 1.1 WHERE species_cd = 131')
+
+    cachePath = str(tmp_path / 'cache.db')
+    results, stats = _process(DB_PATH, cachePath)
+    assert stats['hits'] == 0 and stats['misses'] == len(TREES)
+
+    # the same coefficients hit, changed ones miss and compute their own results
+    assert _process(DB_PATH, cachePath) == (results, dict(stats, hits=len(TREES), misses=0))
+    changedResults, changedStats = _process(changedPath, cachePath)
+    assert changedStats['hits'] == 0 and changedStats['misses'] == len(TREES)
+    assert changedResults[0] != results[0]
+    assert changedResults[2] == results[2]
+
+
+def test_fingerprint_mismatch_raises(tmp_path):
+    cache = Result_Cache(str(tmp_path / 'cache.db'), 'other coefficients')
+    crm = Component_Ratio_Method()
+    try:
+        with pytest.raises(Exception, match='other coefficients'):
+            Tree_List_Pipeline(crm, result_cache=cache)
+    finally:
+        cache.close()
+        crm.close()
+
+
+def test_validate_is_part_of_the_key(tmp_path):
+    cachePath = str(tmp_path / 'cache.db')
+    results, stats = _process(DB_PATH, cachePath)
+
+    # results computed without the per call checks are cached apart from the checked ones
+    uncheckedResults, uncheckedStats = _process(DB_PATH, cachePath, validate=False)
+    assert uncheckedStats['hits'] == 0 and uncheckedStats['misses'] == len(TREES)
+    assert uncheckedResults == results
+    assert _process(DB_PATH, cachePath, validate=False)[1]['hits'] == len(TREES)
+    assert _process(DB_PATH, cachePath)[1]['hits'] == len(TREES)
+
+
+def _results(dbhs):
+    return [{'species_cd': 131, 'region': 'S33', 'dbh': dbh, 'height': 60.0, 'volcfgrs': dbh * 2.0} for dbh in dbhs]
+
+
+def test_eviction_with_a_shared_file(tmp_path):
+    cachePath = str(tmp_path / 'cache.db')
+    first = Result_Cache(cachePath, 'coefficients', max_entries=10)
+    second = Result_Cache(cachePath, 'coefficients', max_entries=10)
+    try:
+        second.putMany(_results(range(0, 4)))
+        second.putMany(_results(range(4, 8)))
+
+        # the first cache saw none of those rows, its writes still count them and are never the ones evicted
+        first.putMany(_results(range(8, 13)))
+        assert first.getStats()['size'] == 9
+        assert [result['volcfgrs'] for result in first.getMany(_results(range(8, 13)))] == [16.0, 18.0, 20.0, 22.0, 24.0]
+        assert first.getMany(_results(range(0, 4))) == [None] * 4
+        assert None not in first.getMany(_results(range(4, 8)))
+    finally:
+        first.close()
+        second.close()
+
+
+def test_a_large_write_keeps_its_rows(tmp_path):
+    cache = Result_Cache(str(tmp_path / 'cache.db'), 'coefficients', max_entries=10)
+    try:
+        cache.putMany(_results(range(0, 5)))
+        cache.putMany(_results(range(5, 25)))
+        assert cache.getStats()['size'] == 20
+        assert None not in cache.getMany(_results(range(5, 25)))
+    finally:
+        cache.close()
@@ -0,0 +1,64 @@
+import pytest
+
+from stand_aggregation import Stand_Aggregator
+
+METRICS = ('volcfgrs', 'total_ag')
+RESULTS = [
+    {'stand': 1, 'plot': 1, 'tpa': 6.0, 'volcfgrs': 10.0, 'total_ag': 500.0, 'error': None},
+    {'stand': 1, 'plot': 1, 'tpa': 24.0, 'volcfgrs': 2.0, 'total_ag': 100.0, 'error': None},
+    {'stand': 1, 'plot': 2, 'tpa': 6.0, 'volcfgrs': 20.0, 'total_ag': None, 'error': None},
+    {'stand': 1, 'plot': 2, 'tpa': 6.0, 'volcfgrs': None, 'total_ag': None, 'error': 'Unknown species'},
+    {'stand': 2, 'plot': 3, 'tpa': 'x', 'volcfgrs': 5.0, 'total_ag': 250.0, 'error': None},
+    {'stand': 2, 'plot': 3, 'tpa': 12.0, 'volcfgrs': 5.0, 'total_ag': 250.0, 'error': None}
+]
+
+
+def _rows(aggregator):
+    return dict((row['stand'], row) for row in aggregator.rows())
+
+
+def test_tpa_weighting():
+    aggregator = Stand_Aggregator(group_by=('stand',), metrics=METRICS)
+    aggregator.consume(RESULTS)
+    rows = _rows(aggregator)
+
+    # each value counts TPA times, failed trees and trees without a numeric TPA are skipped
+    assert rows[1]['trees'] == 4 and rows[1]['skipped'] == 1
+    assert rows[1]['tpa'] == 36.0
+    assert rows[1]['volcfgrs_per_acre'] == 6.0 * 10.0 + 24.0 * 2.0 + 6.0 * 20.0
+    assert rows[1]['total_ag_per_acre'] == 6.0 * 500.0 + 24.0 * 100.0 and rows[1]['total_ag_missing'] == 1
+    assert rows[2]['skipped'] == 1 and rows[2]['volcfgrs_per_acre'] == 60.0
+
+
+def test_per_stand_totals():
+    aggregator = Stand_Aggregator(group_by=('stand',), plot_column='plot', metrics=METRICS)
+    aggregator.consume(RESULTS)
+    rows = _rows(aggregator)
+
+    # plot level expansion factors give a stand's per acre values as the mean over its plots
+    assert rows[1]['plots'] == 2 and rows[2]['plots'] == 1
+    assert rows[1]['tpa'] == 18.0
+    assert rows[1]['volcfgrs_per_acre'] == pytest.approx((60.0 + 48.0 + 120.0) / 2)
+    assert rows[2]['total_ag_per_acre'] == 3000.0
+    assert aggregator.columns() == ['stand', 'trees', 'skipped', 'plots', 'tpa', 'volcfgrs_per_acre', 'volcfgrs_missing',
+                                    'total_ag_per_acre', 'total_ag_missing']
+
+
+def test_merge_matches_one_pass():
+    whole = Stand_Aggregator(group_by=('stand',), plot_column='plot', metrics=METRICS)
+    whole.consume(RESULTS)
+
+    first = Stand_Aggregator(group_by=('stand',), plot_column='plot', metrics=METRICS)
+    second = Stand_Aggregator(group_by=('stand',), plot_column='plot', metrics=METRICS)
+    first.consume(RESULTS[::2])
+    second.consume(RESULTS[1::2])
+    assert _rows(first.merge(second)) == _rows(whole)
+
+
+@pytest.mark.parametrize('options', [{'group_by': ('plot',)}, {'metrics': ('volcfgrs',)},
+                                     {'plot_column': None}, {'tpa_column': 'expansion'}])
+def test_merge_rejects_other_settings(options):
+    settings = dict(group_by=('stand',), plot_column='plot', tpa_column='tpa', metrics=METRICS)
+    aggregator = Stand_Aggregator(**settings)
+    with pytest.raises(Exception, match='can be merged'):
+        aggregator.merge(Stand_Aggregator(**dict(settings, **options)))
@@ -0,0 +1,136 @@
+import csv, math, os, random, shutil, sqlite3
+
+import pytest
+
+from coefficient_diff import Coefficient_Diff
+from coefficient_snapshot import exportSnapshot
+from component_ratio_method import Component_Ratio_Method
+from stand_aggregation import Stand_Aggregator
+from tree_list import Parallel_Tree_List_Pipeline, RESULT_COLUMNS, Threaded_Tree_List_Pipeline, Tree_List_Pipeline
+
+DB_PATH = os.path.join(os.path.dirname(__file__), '..', 'src', 'coefficients.db')
+
+
+@pytest.fixture(scope='module')
+def pipeline():
+    pipeline = Tree_List_Pipeline()
+    yield pipeline
+    pipeline.close()
+
+
+def test_parse_integer_columns(pipeline):
+    tree = pipeline._parseTree({'species_cd': '131', 'stem_count': '2.0', 'dbh': '12.5'})
+    assert tree['species_cd'] == 131 and type(tree['species_cd']) == int
+    assert tree['stem_count'] == 2 and type(tree['stem_count']) == int
+    assert pipeline._parseTree({'species_cd': 131.0})['species_cd'] == 131
+
+
+@pytest.mark.parametrize('record', [{'species_cd': '101.7'}, {'stem_count': '2.5'}, {'species_cd': 101.7}])
+def test_parse_rejects_fractional_integers(pipeline, record):
+    with pytest.raises(ValueError, match='must be an integer'):
+        pipeline._parseTree(record)
+
+
+def _writeTrees(path, rows):
+    with open(path, 'w', newline='') as csvFile:
+        csvFile.write('species_cd,region,dbh,height,plot,tpa\n')
+        csvFile.writelines(row + '\n' for row in rows)
+
+
+@pytest.mark.parametrize('output', ['out.csv', 'out.parquet'])
+def test_run_writes_rows_that_do_not_parse(pipeline, tmp_path, output):
+    trees = str(tmp_path / 'trees.csv')
+    _writeTrees(trees, ['131,S33,10,60,1,6', '101.7,S33,10,60,1,6', 'abc,S33,12,60,1,6', '131,S33,x,60,1,6', '316,S33,8,40,2,6'])
+
+    outputPath = str(tmp_path / output)
+    assert Tree_List_Pipeline(pipeline.crm, chunk_size=2).run(trees, outputPath) == 5
+    results = list(pipeline._readResultChunks(outputPath))
+    results = [result for chunk in results for result in chunk]
+
+    assert [result['species_cd'] for result in results] == [131, None, None, 131, 316]
+    assert results[1]['error'] == 'species_cd must be an integer, got 101.7.'
+    assert results[2]['error'] == "species_cd must be a number, got 'abc'."
+    assert results[3]['error'] == "dbh must be a number, got 'x'." and results[3]['height'] == 60.0
+    for result in results[1:4]:
+        assert all(result[column] == None for column in RESULT_COLUMNS if column != 'error')
+
+    expected = pipeline.processChunk([pipeline._parseTree({'species_cd': '131', 'region': 'S33', 'dbh': '10', 'height': '60',
+                                                           'plot': '1', 'tpa': '6'})])[0]
+    assert results[0]['error'] == None and results[0]['volcfgrs'] == pytest.approx(expected['volcfgrs'])
+    assert results[4]['error'] == None and results[4]['volcfgrs'] > 0
+
+
+def test_aggregate_skips_rows_that_do_not_parse(pipeline, tmp_path):
+    trees = str(tmp_path / 'trees.csv')
+    _writeTrees(trees, ['131,S33,10,60,1,6', 'abc,S33,12,60,1,6'])
+    rows = pipeline.aggregate(trees, Stand_Aggregator()).rows()
+    assert len(rows) == 1 and rows[0]['trees'] == 2 and rows[0]['skipped'] == 1
+
+
+def test_recompute_checks_snapshot_coefficients(tmp_path):
+    newPath = str(tmp_path / 'new.db')
+    shutil.copyfile(DB_PATH, newPath)
+    with sqlite3.connect(newPath) as connect:
+        connect.execute('UPDATE species SET wood_spgr_greenvol_drywt = wood_spgr_greenvol_drywt * 1.1 WHERE species_cd = 131')
+    diff = Coefficient_Diff(DB_PATH, newPath)
+
+    trees = str(tmp_path / 'trees.csv')
+    with open(trees, 'w', newline='') as csvFile:
+        writer = csv.DictWriter(csvFile, ['species_cd', 'region', 'dbh', 'height'])
+        writer.writeheader()
+        writer.writerows([{'species_cd': 131, 'region': 'S33', 'dbh': 10.0, 'height': 60.0},
+                          {'species_cd': 316, 'region': 'S33', 'dbh': 8.0, 'height': 40.0}])
+    results = str(tmp_path / 'results.csv')
+    oldCrm = Component_Ratio_Method()
+    Tree_List_Pipeline(oldCrm).run(trees, results)
+    oldCrm.close()
+
+    # a snapshot carries the fingerprint of the database it came from, the parallel workers' included
+    oldSnapshot = exportSnapshot(str(tmp_path / 'old.snap'))
+    newSnapshot = exportSnapshot(str(tmp_path / 'new.snap'), newPath)
+    for snapshot, matches in [(oldSnapshot, False), (newSnapshot, True)]:
+        for pipeline in [Tree_List_Pipeline(Component_Ratio_Method(snapshot_path=snapshot)),
+                         Parallel_Tree_List_Pipeline(1, snapshot_path=snapshot)]:
+            with pipeline:
+                if matches:
+                    assert pipeline.recompute(results, str(tmp_path / 'out.csv'), diff) == (2, 1)
+                else:
+                    with pytest.raises(Exception, match='new coefficients'):
+                        pipeline.recompute(results, str(tmp_path / 'out.csv'), diff)
+            pipeline.crm.close()
+
+
+@pytest.mark.parametrize('makePipeline', [lambda crm: Tree_List_Pipeline(crm), lambda crm: Threaded_Tree_List_Pipeline(crm, threads=2)])
+def test_close_only_closes_its_own_crm(makePipeline):
+    crm = Component_Ratio_Method()
+    try:
+        with makePipeline(crm):
+            pass
+        assert not crm.database._closed
+
+        with makePipeline(None) as pipeline:
+            pass
+        assert pipeline.crm.database._closed
+    finally:
+        crm.close()
+
+
+def test_threaded_matches_serial(pipeline):
+    rng = random.Random(3)
+    species = [131, 316, 202, 833, 802, 122, 99999]
+    regions = ['S33', 'S22LID', 'S24', 'S23LMI']
+    trees = [{'species_cd': rng.choice(species), 'region': rng.choice(regions), 'dbh': round(rng.uniform(0.5, 60.0), 1),
+              'height': rng.choice([rng.randint(3, 150), None]), 'site_index': rng.choice([80.0, None]),
+              'basal_area': 120.0, 'drc': rng.choice([None, 4.0, 12.5]), 'bole_hgt': rng.choice([None, 20.0]),
+              'stem_count': rng.choice([None, 1, 3])} for idx in range(3000)]
+
+    expected = pipeline.processChunk(trees)
+    with Threaded_Tree_List_Pipeline(pipeline.crm, threads=3, chunk_size=500) as threaded:
+        actual = threaded.processChunk(trees)
+
+    assert len(actual) == len(expected)
+    assert any(result['error'] == None for result in expected) and any(result['error'] != None for result in expected)
+    for tree, a, b in zip(trees, expected, actual):
+        assert a.keys() == b.keys()
+        for column in a:
+            assert a[column] == b[column] or (isinstance(a[column], float) and math.isnan(a[column]) and math.isnan(b[column])), (tree, column)
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from component_ratio_method import Component_Ratio_Method
+from volume_grid import GRID_EQUATION_MEASUREMENTS, GRID_KEY_MEASUREMENTS, Volume_Approximator
+
+MEASUREMENTS = {'basal_area': 120.0, 'site_index': 65.0, 'stem_count': 1.0, 'drc': 6.0, 'bole_hgt': 30.0}
+CHANGED = {'basal_area': 250.0, 'site_index': 100.0, 'stem_count': 3.0, 'drc': 20.0, 'bole_hgt': 50.0}
+
+
+@pytest.fixture(scope='module')
+def crm():
+    crm = Component_Ratio_Method()
+    yield crm
+    crm.close()
+
+
+def _speciesByLabel(crm):
+    species = {}
+    for region_id in crm.preloadCoefficients():
+        speciesIds, adjGrossVolSpeciesIds, coefficients, equationIdxs, equations = crm._getGrossVolBatchTable(region_id)
+        for idx in range(speciesIds.size):
+            species.setdefault(equations[equationIdxs[idx]][1], []).append((int(speciesIds[idx]), region_id))
+    return species
+
+
+def test_equation_measurements(crm):
+
+    # changing a measurement the table leaves out of an equation never changes its volumes
+    rng = np.random.default_rng(1)
+    dbhs = rng.uniform(1.0, 60.0, 200)
+    heights = rng.uniform(5.0, 150.0, 200)
+    for label, species in _speciesByLabel(crm).items():
+        for species_cd, region_id in species[:5]:
+            unused = dict((column, CHANGED[column] if column not in GRID_EQUATION_MEASUREMENTS[label] else value)
+                          for column, value in MEASUREMENTS.items())
+            expected = crm.getVOLCFGRSBatch(np.full(200, species_cd), region_id, dbhs, heights, **MEASUREMENTS)
+            actual = crm.getVOLCFGRSBatch(np.full(200, species_cd), region_id, dbhs, heights, **unused)
+            np.testing.assert_array_equal(actual, expected, err_msg=label)
+
+
+def test_only_dbh_and_height_equations_are_approximated(crm):
+    rng = np.random.default_rng(2)
+    approximator = Volume_Approximator(crm)
+    for label, species in sorted(_speciesByLabel(crm).items()):
+        species_cd, region_id = species[0]
+        count = 2000
+        columns = dict((column, rng.uniform(1.0, 100.0, count)) for column in GRID_KEY_MEASUREMENTS)
+        dbhs = rng.uniform(1.0, 60.0, count)
+        heights = rng.uniform(5.0, 150.0, count)
+
+        exact = crm.getVOLCFGRSBatch(np.full(count, species_cd), region_id, dbhs, heights, **columns)
+        before = approximator.getStats()
+        approximate = approximator.getVOLCFGRSBatch(np.full(count, species_cd), region_id, dbhs, heights, **columns)
+        after = approximator.getStats()
+
+        np.testing.assert_array_equal(np.isnan(approximate), np.isnan(exact), err_msg=label)
+        if GRID_EQUATION_MEASUREMENTS[label] != ():
+            np.testing.assert_array_equal(approximate, exact, err_msg=label)
+            assert after['grids'] == before['grids'] and after['approximated'] == before['approximated'], label
+        else:
+
+            # one grid whatever the other measurements are, the error is checked at sample points so this is a loose bound
+            finite = np.isfinite(exact)
+            assert after['grids'] == before['grids'] + 1, label
+            assert np.all(np.abs(approximate[finite] - exact[finite]) <= 1e-2 * np.abs(exact[finite])), label
+
+
+def test_grids_are_bounded(crm):
+    approximator = Volume_Approximator(crm, max_grids=3)
+    species = [pair for label, pairs in sorted(_speciesByLabel(crm).items()) if GRID_EQUATION_MEASUREMENTS[label] == ()
+               for pair in pairs[:2]]
+    for species_cd, region_id in species:
+        approximator.getVOLCFGRSBatch([species_cd], region_id, dbh=10.0, height=60.0)
+    assert approximator.getStats()['grids'] == 3
+    assert list(approximator._grids)[-1][:2] == (species[-1][1], species[-1][0])
+
+
+def test_volume_curve_keyed_on_used_measurements(crm):
+    approximator = Volume_Approximator(crm)
+    species = _speciesByLabel(crm)
+    species_cd, region_id = species['Table 3 Row 1'][0]
+    assert approximator.getVolumeCurve(species_cd, region_id, site_index=50.0) is approximator.getVolumeCurve(species_cd, region_id, site_index=90.0)
+
+    species_cd, region_id = species['Table 1 Row 5'][0]
+    curve = approximator.getVolumeCurve(species_cd, region_id, site_index=50.0, bole_hgt=30.0)
+    assert curve is approximator.getVolumeCurve(species_cd, region_id, site_index=90.0, bole_hgt=30.0)
+    assert curve is not approximator.getVolumeCurve(species_cd, region_id, bole_hgt=40.0)